@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { ProgressSnapshot, getProgress } from "../lib/api";
+import { ProgressSnapshot, getProgress, subscribeProgress } from "../lib/api";
 
 const emptyProgress: ProgressSnapshot = {
   total: 0,
@@ -9,6 +9,8 @@ const emptyProgress: ProgressSnapshot = {
   running: false,
 };
 
+// Prefers the pushed /progress/stream; falls back to polling /progress every
+// intervalMs if the stream can't be opened or drops.
 export function useProgress(active = true, intervalMs = 1000) {
   const [progress, setProgress] = useState<ProgressSnapshot>(emptyProgress);
 
@@ -20,6 +22,7 @@ export function useProgress(active = true, intervalMs = 1000) {
 
     let cancelled = false;
     let timerId: number | null = null;
+    let closeStream: (() => void) | null = null;
 
     async function poll() {
       try {
@@ -33,11 +36,32 @@ export function useProgress(active = true, intervalMs = 1000) {
       }
     }
 
-    poll();
-    timerId = window.setInterval(poll, intervalMs);
+    function startPolling() {
+      if (cancelled || timerId !== null) return;
+      poll();
+      timerId = window.setInterval(poll, intervalMs);
+    }
+
+    if (typeof EventSource === "undefined") {
+      startPolling();
+    } else {
+      closeStream = subscribeProgress(
+        (snapshot) => {
+          if (!cancelled) setProgress(snapshot);
+        },
+        () => {
+          if (cancelled) return;
+          console.warn("Progress stream failed, falling back to polling");
+          closeStream?.();
+          closeStream = null;
+          startPolling();
+        },
+      );
+    }
 
     return () => {
       cancelled = true;
+      closeStream?.();
       if (timerId !== null) {
         clearInterval(timerId);
       }
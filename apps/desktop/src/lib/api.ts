@@ -10,11 +10,25 @@ export interface ApiError extends Error {
 export interface ProgressSnapshot {
   kind?: string;
   total: number;
+  discovered?: number;
+  discovery_complete?: boolean;
   done: number;
   status: "idle" | "running" | "done" | "cancelled" | "error";
   note?: string;
   error?: string;
   running?: boolean;
+  rate?: number; // messages per second over the last few seconds
+  eta_seconds?: number | null;
+  job_id?: number | null; // the latest started ingest job, which the fields above describe
+  jobs?: IngestJobSummary[]; // every job still queued or running
+}
+
+export interface IngestJobSummary {
+  job_id: number;
+  kind: string;
+  path: string;
+  state: "queued" | "running";
+  done: number;
 }
 
 export interface StatsSummary {
@@ -24,6 +38,7 @@ export interface StatsSummary {
   junk: number;
   unique_senders: number;
   latest_ts?: number | null;
+  pending_bodies?: number; // headers stored, body and search still being filled in
 }
 
 export interface EmailSummary {
@@ -34,6 +49,11 @@ export interface EmailSummary {
   snippet?: string | null;
 }
 
+export interface EmailPage {
+  emails: EmailSummary[];
+  next_cursor: string | null;
+}
+
 interface RequestOptions extends RequestInit {
   method?: HttpMethod;
 }
@@ -54,6 +74,8 @@ export interface SenderInsight {
   stats: SenderInsightStats;
   senders: SenderInsightSender[];
   emails: EmailSummary[];
+  next_cursor?: string | null;
+  senders_next_cursor?: string | null;
 }
 
 export interface RecipientInsightStats {
@@ -72,6 +94,8 @@ export interface RecipientInsight {
   stats: RecipientInsightStats;
   recipients: RecipientInsightRecipient[];
   emails: EmailSummary[];
+  next_cursor?: string | null;
+  recipients_next_cursor?: string | null;
 }
 
 async function request<T>(endpoint: string, init: RequestOptions = {}): Promise<T> {
@@ -106,10 +130,11 @@ export async function initDB(): Promise<void> {
   await request("/db/init", { method: "POST" });
 }
 
-export async function startIngest(path: string): Promise<void> {
+export async function startIngest(path: string, source: "emlx" | "mbox" = "emlx"): Promise<void> {
   await request("/ingest/start", {
     method: "POST",
-    body: JSON.stringify({ source: "emlx", path }),
+    // headers land first so the dashboard fills in while bodies are indexed
+    body: JSON.stringify({ source, path, headers_first: true }),
   });
 }
 
@@ -121,13 +146,29 @@ export async function getProgress(): Promise<ProgressSnapshot> {
   return request<ProgressSnapshot>("/progress", { method: "GET" });
 }
 
+// Server-sent progress snapshots; returns a function that closes the stream.
+export function subscribeProgress(
+  onSnapshot: (snapshot: ProgressSnapshot) => void,
+  onError: (event: Event) => void,
+): () => void {
+  const source = new EventSource(`${API_BASE}/progress/stream`);
+  source.addEventListener("progress", (event) => {
+    onSnapshot(JSON.parse((event as MessageEvent<string>).data) as ProgressSnapshot);
+  });
+  source.onerror = onError;
+  return () => source.close();
+}
+
 export async function getStats(): Promise<StatsSummary> {
   return request<StatsSummary>("/stats", { method: "GET" });
 }
 
-export async function getEmails(limit = 10): Promise<EmailSummary[]> {
+export async function getEmails(limit = 10, cursor?: string | null): Promise<EmailPage> {
   const query = new URLSearchParams({ limit: String(limit) });
-  return request<EmailSummary[]>(`/emails?${query.toString()}`, { method: "GET" });
+  if (cursor) {
+    query.set("cursor", cursor);
+  }
+  return request<EmailPage>(`/emails?${query.toString()}`, { method: "GET" });
 }
 
 export async function getFirstTimeSenderInsights(limit = 50): Promise<SenderInsight> {
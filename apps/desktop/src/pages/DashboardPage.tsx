@@ -1289,7 +1289,7 @@ export default function DashboardPage() {
         const [fetchedStats, fetchedEmails] = await Promise.all([getStats(), getEmails(10)]);
         if (!cancelled) {
           setStats(fetchedStats);
-          setEmails(fetchedEmails);
+          setEmails(fetchedEmails.emails);
           setError(null);
         }
       } catch (err) {
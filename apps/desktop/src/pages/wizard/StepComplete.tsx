@@ -25,7 +25,7 @@ export default function StepComplete({ stats, emails, onLoaded }: StepCompletePr
       try {
         const [fetchedStats, fetchedEmails] = await Promise.all([getStats(), getEmails(10)]);
         if (!cancelled) {
-          onLoaded(fetchedStats, fetchedEmails);
+          onLoaded(fetchedStats, fetchedEmails.emails);
           setLoading(false);
         }
       } catch (err) {
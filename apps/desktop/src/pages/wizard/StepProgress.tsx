@@ -25,6 +25,9 @@ export default function StepProgress({ onProgress, onComplete, onError }: StepPr
     }
   }, [progress, onProgress, onComplete, onError]);
 
+  const scanning = progress.discovery_complete === false;
+  const rate = progress.running && progress.rate ? Math.round(progress.rate) : 0;
+  const eta = progress.running && progress.eta_seconds != null ? Math.ceil(progress.eta_seconds) : null;
   const pct = progress.total > 0 ? (progress.done / progress.total) * 100 : progress.running ? 5 : 0;
 
   return (
@@ -35,7 +38,10 @@ export default function StepProgress({ onProgress, onComplete, onError }: StepPr
         {progress.note || (progress.running ? "Parsing messages…" : "Preparing to ingest…")}
       </p>
       <p className="wizard-muted">
-        Processed {progress.done} of {progress.total || "—"} messages
+        Processed {progress.done} of {progress.total || "—"}
+        {scanning ? "+ messages (still scanning folders…)" : " messages"}
+        {rate > 0 ? ` · ${rate} msgs/s` : ""}
+        {eta !== null ? ` · about ${eta}s left` : ""}
       </p>
     </div>
   );
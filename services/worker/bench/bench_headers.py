@@ -0,0 +1,163 @@
+# services/worker/bench/bench_headers.py
+"""
+Time the per-message header work of message_to_row (Date, From, To, Cc,
+Subject): the previous inline helpers against ingest/headers.py, on a
+synthetic corpus (bench/corpus.py) plus any .emlx / mbox given.
+
+    python -m bench.bench_headers --messages 20000
+    python -m bench.bench_headers --messages 5000 --fanout 60      # wide To/Cc lists
+    python -m bench.bench_headers ~/Library/Mail/V10
+
+Results are compared too. Dates may differ where the header names a zone
+such as "EST", which dateutil ignored and email.utils applies; exits 1 on any
+other mismatch.
+"""
+import argparse
+from email import policy
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from email.utils import getaddresses, parseaddr
+import mailbox
+import os
+import sys
+import time
+from time import perf_counter
+import warnings
+
+from dateutil import parser as dateparse
+
+from ingest import headers
+from .corpus import CorpusSpec, messages
+
+
+# --- the helpers ingest/emlx.py used before ingest/headers.py -----------------
+
+def _legacy_to_ms(dt):
+    if not dt: return int(time.time() * 1000)
+    try: return int(dateparse.parse(dt).timestamp() * 1000)
+    except Exception: return int(time.time() * 1000)
+
+
+def _legacy_decode_header(value):
+    if not value:
+        return ""
+    try:
+        return str(make_header(decode_header(str(value))))
+    except Exception:
+        return str(value)
+
+
+def _legacy_first_address(header_values):
+    header_strings = [headers.header_to_str(h) for h in header_values]
+    for name, addr in getaddresses(header_strings):
+        clean_addr = addr.strip()
+        if clean_addr:
+            return _legacy_decode_header(name), clean_addr
+    if header_strings:
+        parsed_name, parsed_addr = parseaddr(header_strings[0])
+        parsed_addr = parsed_addr.strip()
+        if parsed_addr:
+            return _legacy_decode_header(parsed_name), parsed_addr
+        return ("", header_strings[0].strip())
+    return ("", "")
+
+
+def _legacy_address_list(header_values):
+    header_strings = [headers.header_to_str(h) for h in header_values]
+    seen = []
+    for _, addr in getaddresses(header_strings):
+        clean = addr.strip()
+        if clean and clean not in seen:
+            seen.append(clean)
+    if not seen and header_strings:
+        fallback = header_strings[0].strip()
+        if fallback:
+            seen.append(fallback)
+    return seen
+
+# ------------------------------------------------------------------------------
+
+
+def _legacy(msg):
+    return (
+        _legacy_to_ms(str(msg.get("Date") or "")),
+        _legacy_first_address(msg.get_all("From", [])),
+        _legacy_address_list(msg.get_all("To", [])),
+        _legacy_address_list(msg.get_all("Cc", [])),
+        _legacy_decode_header(msg.get("Subject")),
+    )
+
+
+def _current(msg):
+    return (
+        headers.date_to_ms(str(msg.get("Date") or "")),
+        headers.first_address(msg.get_all("From", [])),
+        headers.address_list(msg.get_all("To", [])),
+        headers.address_list(msg.get_all("Cc", [])),
+        headers.decode_header(msg.get("Subject")),
+    )
+
+
+def _named_zone(date) -> bool:
+    words = str(date or "").split("(")[0].split()
+    return bool(words) and words[-1].isalpha() and words[-1].upper() not in ("GMT", "UT", "UTC", "Z")
+
+
+def _load(paths: list[str]):
+    parse = BytesHeaderParser(policy=policy.compat32).parsebytes
+    for root in paths:
+        files = [root] if os.path.isfile(root) else (
+            os.path.join(d, name) for d, _, names in os.walk(root) for name in sorted(names)
+        )
+        for path in files:
+            if path.endswith(".emlx"):
+                with open(path, "rb") as fh:
+                    raw = fh.read()
+                first, _, rest = raw.partition(b"\n")
+                yield parse(rest[:int(first)] if first.strip().isdigit() else raw)
+            elif path.endswith(".mbox") or os.path.basename(path) == "mbox":
+                for entry in mailbox.mbox(path, create=False):
+                    yield parse(entry.as_bytes())
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--messages", type=int, default=20_000, help="synthetic messages (0 for none)")
+    parser.add_argument("--fanout", type=float, default=CorpusSpec().fanout)
+    args = parser.parse_args(argv)
+
+    parse = BytesHeaderParser(policy=policy.compat32).parsebytes
+    spec = CorpusSpec(messages=args.messages, fanout=args.fanout, attach_rate=0)
+    msgs = [parse(raw) for raw, _ in messages(spec)] + list(_load(args.paths))
+    if not msgs:
+        print("no messages")
+        return 1
+
+    warnings.simplefilter("ignore")  # dateutil's UnknownTimezoneWarning, once per message
+    results, times = {}, {}
+    for name, fn in (("legacy", _legacy), ("current", _current)):
+        started = perf_counter()
+        results[name] = [fn(msg) for msg in msgs]
+        times[name] = perf_counter() - started
+
+    mismatches = 0
+    for msg, old, new in zip(msgs, results["legacy"], results["current"]):
+        if old[1:] != new[1:] or (old[0] != new[0] and not _named_zone(msg.get("Date"))):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"mismatch:\n  legacy:  {old!r:.200}\n  current: {new!r:.200}")
+
+    recipients = sum(len(r[2]) + len(r[3]) for r in results["current"]) / len(msgs)
+    print(f"{len(msgs)} messages, {recipients:.1f} recipients each on average")
+    for name, seconds in times.items():
+        print(f"  {name:<8} {seconds / len(msgs) * 1e6:8.1f} us/message")
+    print(f"  speedup {times['legacy'] / times['current']:.1f}x, {mismatches} mismatch(es)")
+    info = headers.cache_info()
+    print(f"  caches: names {info['names']['hits']}/{info['names']['hits'] + info['names']['misses']} hits, "
+          f"addresses {info['addresses']['hits']}/{info['addresses']['hits'] + info['addresses']['misses']} hits")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
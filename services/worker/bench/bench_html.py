@@ -0,0 +1,101 @@
+# services/worker/bench/bench_html.py
+"""
+Check the streaming html.parser extractor against the BeautifulSoup one and
+time both, on every text/html part found under the given paths.
+
+    python -m bench.bench_html ~/Library/Mail/V10      # .emlx / .eml / .html / mbox
+    python -m bench.bench_html                         # built-in samples only
+
+Outputs are compared after collapsing whitespace; exits 1 on any mismatch.
+Unknown entities such as "&foo;" are a known difference: html.parser keeps
+them verbatim, as browsers do, while BeautifulSoup drops the ";".
+"""
+from email import policy
+from email.parser import BytesParser
+import mailbox
+import os
+import sys
+from time import perf_counter
+
+from utils.text import HTML_TEXT_CAP, html_to_text
+
+SAMPLES = [
+    "<p>Hello <b>world</b>&nbsp;&amp; friends</p>",
+    "<html><head><title>Weekly digest</title><style>td{color:red}</style></head>"
+    "<body><table><tr><td>Item&nbsp;1</td><td>$9.99</td></tr></table>"
+    "<script>window.track('open')</script><!-- tracking pixel --><img src=x>"
+    "<a href='https://example.com/unsubscribe'>Unsubscribe</a></body></html>",
+    "<div>unclosed <span>tags <p>everywhere",
+    "<p>caf&eacute; &#8212; na&#239;ve &lt;tag&gt; text</p>",
+    "<template><p>hidden</p></template><p>shown</p><script>unterminated",
+    "<p>" + "Lorem ipsum dolor sit amet. " * 20_000 + "</p>",
+]
+
+
+def _html_parts(msg):
+    for part in msg.walk():
+        if part.get_content_type() != "text/html":
+            continue
+        payload = part.get_payload(decode=True)
+        if payload:
+            yield payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+
+
+def _load(path: str):
+    parse = BytesParser(policy=policy.compat32).parsebytes
+    if path.endswith((".html", ".htm")):
+        with open(path, encoding="utf-8", errors="replace") as fh:
+            yield fh.read()
+    elif path.endswith((".emlx", ".eml")):
+        with open(path, "rb") as fh:
+            raw = fh.read()
+        first, _, rest = raw.partition(b"\n")
+        if first.strip().isdigit():
+            raw = rest[:int(first.strip())]
+        yield from _html_parts(parse(raw))
+    elif path.endswith(".mbox") or os.path.basename(path) == "mbox":
+        for msg in mailbox.mbox(path, factory=None, create=False):
+            yield from _html_parts(msg)
+
+
+def corpus(paths: list[str]) -> list[str]:
+    docs = list(SAMPLES)
+    for root in paths:
+        if os.path.isfile(root):
+            docs.extend(_load(root))
+            continue
+        for dirpath, _, files in os.walk(root):
+            for name in files:
+                docs.extend(_load(os.path.join(dirpath, name)))
+    return docs
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def main(argv: list[str]) -> int:
+    docs = corpus(argv)
+    total_bytes = sum(len(d) for d in docs)
+    times = {"bs4": 0.0, "stdlib": 0.0}
+    mismatches = 0
+    for i, doc in enumerate(docs):
+        outputs = {}
+        for name in times:
+            start = perf_counter()
+            outputs[name] = html_to_text(doc, extractor=name)
+            times[name] += perf_counter() - start
+        expected = _normalize(outputs["bs4"])[:HTML_TEXT_CAP]
+        if outputs["stdlib"] != expected:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"mismatch in part {i}:\n  bs4:    {expected[:160]!r}\n  stdlib: {outputs['stdlib'][:160]!r}")
+    print(f"{len(docs)} html parts, {total_bytes / 1e6:.1f}M chars")
+    for name, seconds in times.items():
+        print(f"  {name:<7} {seconds * 1000:9.1f} ms  {total_bytes / seconds / 1e6:7.1f} M chars/s")
+    print(f"  speedup {times['bs4'] / times['stdlib']:.1f}x, {mismatches} mismatch(es)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
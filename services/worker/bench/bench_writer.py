@@ -0,0 +1,127 @@
+# services/worker/bench/bench_writer.py
+"""
+Compare emails insert throughput: the old per-row INSERT + SELECT path,
+writing each row's side tables (body store, FTS, recipients, threads,
+sender_stats, daily_volume) one row at a time, against the batched
+EmailWriter at a few batch sizes.
+
+    python -m bench.bench_writer --rows 20000 --batch-sizes 100,500,2000
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from db.aggregates import add_senders
+from db.bodies import store_bodies
+import db.connection as dbconn
+from db.rollups import add_volume
+from db.threads import ThreadInput, thread_emails
+from ingest.writer import EMAIL_COLUMNS, EmailRow, EmailWriter, insert_attachments
+
+SCHEMA = Path(__file__).resolve().parent.parent / "db" / "schema.sql"
+
+
+def _fresh_db(tmp: Path, name: str):
+    # the writer connection is cached per process; drop it so it reopens on the new file
+    dbconn.close_all()
+    dbconn.DB_PATH = tmp / f"{name}.db"
+    con = dbconn.connect(write=True)
+    con.executescript(SCHEMA.read_text(encoding="utf-8"))
+    con.close()
+
+
+def _rows(count: int) -> list[EmailRow]:
+    rows = []
+    for i in range(count):
+        body = f"message body {i} " + "lorem ipsum dolor sit amet " * 20
+        rows.append(EmailRow(
+            source="bench",
+            source_uid=f"bench/{i}.emlx",
+            message_id=f"<{i}@bench>",
+            date_ts=1_700_000_000_000 + i * 1000,
+            from_name=f"Sender {i % 300}",
+            from_email=f"sender{i % 300}@example.com",
+            date_ms=1_700_000_000_000 + i * 1000,
+            from_norm=f"sender{i % 300}@example.com",
+            to_json=json.dumps([f"rcpt{i % 17}@example.com"]),
+            cc_json="[]",
+            subject=f"Subject {i}",
+            snippet=body[:200],
+            body_text=body,
+            body_hash=f"{i:064x}",
+            size_bytes=len(body),
+            has_attach=0,
+            recipient_count=1,
+            in_reply_to=f"<{i - 1}@bench>" if i % 3 else "",  # every third message starts a thread
+            recipients=((f"rcpt{i % 17}@example.com", "to"),),
+        ))
+    return rows
+
+
+def _legacy(rows: list[EmailRow], commit_every: int = 500) -> float:
+    con = dbconn.connect(write=True)
+    cur = con.cursor()
+    insert_sql = (
+        f"INSERT OR IGNORE INTO emails ({', '.join(EMAIL_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in EMAIL_COLUMNS)})"
+    )
+    started = time.perf_counter()
+    cur.execute("BEGIN")
+    for idx, row in enumerate(rows, start=1):
+        cur.execute(insert_sql, tuple(getattr(row, col) for col in EMAIL_COLUMNS))
+        if cur.rowcount > 0:
+            cur.execute("SELECT id FROM emails WHERE source=? AND source_uid=?", (row.source, row.source_uid))
+            rid = cur.fetchone()[0]
+            # the same side tables EmailWriter fills, a row at a time
+            store_bodies(cur, [(row.body_hash, row.body_text)])
+            cur.execute("INSERT INTO emails_fts(rowid, subject, body_text) VALUES(?,?,?)",
+                        (rid, row.subject, row.body_text))
+            cur.executemany("INSERT OR IGNORE INTO email_recipients(email_id, address, kind) VALUES(?,?,?)",
+                            [(rid, address, kind) for address, kind in row.recipients])
+            insert_attachments(cur, [(rid, row.attachments)])
+            thread_emails(cur, [ThreadInput(rid, row.message_id, row.in_reply_to, row.ref_ids)])
+            add_senders(cur, [(row.from_email, row.date_ms)])
+            add_volume(cur, [(row.from_norm, row.date_ms, row.size_bytes)])
+        if idx % commit_every == 0:
+            con.commit()
+            cur.execute("BEGIN")
+    con.commit()
+    elapsed = time.perf_counter() - started
+    con.close()
+    return elapsed
+
+
+def _batched(rows: list[EmailRow], batch_size: int) -> float:
+    writer = EmailWriter(batch_size=batch_size)
+    started = time.perf_counter()
+    for row in rows:
+        writer.write(row)
+    writer.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--batch-sizes", default="100,500,2000")
+    args = parser.parse_args()
+
+    rows = _rows(args.rows)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        _fresh_db(tmp_path, "legacy")
+        results.append(("per-row", _legacy(rows)))
+        for size in (int(s) for s in args.batch_sizes.split(",") if s.strip()):
+            _fresh_db(tmp_path, f"batch{size}")
+            results.append((f"batch={size}", _batched(rows, size)))
+
+    baseline = results[0][1]
+    for name, elapsed in results:
+        print(f"{name:>12}  {len(rows) / elapsed:10.0f} rows/s  {baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+# services/worker/bench/corpus.py
+"""
+Write a deterministic synthetic mail corpus: Apple Mail .emlx files or one mbox.
+The same spec and seed always give byte-identical files.
+
+    python -m bench.corpus /tmp/corpus-10k --messages 10k
+    python -m bench.corpus /tmp/corpus-1m --messages 1M --html-share 0.6 --attach-rate 0.05
+    python -m bench.corpus /tmp/corpus.mbox --messages 100k --format mbox
+
+Senders follow a Zipf distribution (--sender-skew is the exponent, 0 = uniform),
+so a few addresses send most of the mail and a long tail sends once or twice.
+Recipient counts are geometric with mean --fanout, plus the odd large list.
+A corpus.json with the spec is written next to the messages (mbox: beside it).
+"""
+import argparse
+import base64
+from bisect import bisect
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import itertools
+import json
+import os
+import random
+from typing import Iterator, NamedTuple
+
+MAILBOX_SIZE = 5_000  # .emlx files per Mailbox<n>.mbox/Messages folder
+START = datetime(2015, 1, 1, tzinfo=timezone.utc)
+MAX_RECIPIENTS = 400
+RECENT_FOR_REPLIES = 500  # replies pick a parent among this many latest messages
+
+_WORDS = (
+    "meeting project invoice report update review schedule budget contract "
+    "deadline proposal travel team customer release design feedback order "
+    "payment account support question summary agenda notes draft plan quarter "
+    "launch access offer event policy shipment request approval status lorem "
+    "ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor"
+).split()
+_NAMES = "Alice Bob Carol Dave Erin Frank Grace Heidi Ivan Judy Mallory Niaj Olivia Peggy Rupert Sybil Trent Victor Walter".split()
+_DOMAINS = ("example.com", "example.org", "mail.example.net", "corp.example", "news.example.com")
+_ATTACHMENT_TYPES = (
+    ("application", "pdf", "pdf"),
+    ("image", "png", "png"),
+    ("image", "jpeg", "jpg"),
+    ("application", "vnd.openxmlformats-officedocument.wordprocessingml.document", "docx"),
+    ("application", "zip", "zip"),
+    ("text", "csv", "csv"),
+)
+
+
+class CorpusSpec(NamedTuple):
+    messages: int = 10_000
+    format: str = "emlx"  # "emlx" or "mbox"
+    html_share: float = 0.4  # messages with a text/html part (half of them html only)
+    attach_rate: float = 0.08  # messages with at least one attachment
+    duplicate_rate: float = 0.2  # attachments that repeat an earlier payload
+    fanout: float = 3.0  # mean To+Cc recipients
+    senders: int = 2_000
+    sender_skew: float = 1.1  # Zipf exponent
+    reply_rate: float = 0.3  # messages answering an earlier one
+    mean_attachment_kb: int = 40
+    seed: int = 1
+
+
+def parse_count(text: str) -> int:
+    """ "10k" -> 10000, "1M" -> 1000000, "2500" -> 2500."""
+    text = str(text).strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def _address(i: int) -> tuple[str, str]:
+    name = f"{_NAMES[i % len(_NAMES)]} {_NAMES[(i // len(_NAMES)) % len(_NAMES)]}"
+    return name, f"{name.split()[0].lower()}.{i}@{_DOMAINS[i % len(_DOMAINS)]}"
+
+
+def _zipf_cdf(count: int, skew: float) -> list[float]:
+    weights = list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+    return [w / weights[-1] for w in weights]
+
+
+def _encode_header(text: str) -> str:
+    if text.isascii():
+        return text
+    return f"=?utf-8?b?{base64.b64encode(text.encode()).decode()}?="
+
+
+class _Generator:
+    def __init__(self, spec: CorpusSpec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self.sender_cdf = _zipf_cdf(max(1, spec.senders), spec.sender_skew)
+        self.contacts = max(50, spec.senders * 2)
+        self.recent: list[tuple[str, str, str]] = []  # (message id, references, subject)
+        self.payloads: list[bytes] = []
+        self.when = START
+
+    def _sender(self) -> int:
+        return min(bisect(self.sender_cdf, self.rng.random()), len(self.sender_cdf) - 1)
+
+    def _recipients(self) -> list[int]:
+        rng = self.rng
+        if rng.random() < 0.01:
+            count = rng.randint(50, MAX_RECIPIENTS)  # a mailing list blast
+        else:
+            p = 1 / max(1.0, self.spec.fanout)
+            count = 1
+            while count < MAX_RECIPIENTS and rng.random() > p:
+                count += 1
+        return rng.sample(range(self.contacts), min(count, self.contacts))
+
+    def _sentence(self, words: int) -> str:
+        text = " ".join(self.rng.choices(_WORDS, k=words))
+        return text[0].upper() + text[1:] + "."
+
+    def _paragraphs(self) -> list[str]:
+        count = max(1, int(self.rng.lognormvariate(0.8, 0.7)))
+        return [" ".join(self._sentence(self.rng.randint(6, 18)) for _ in range(self.rng.randint(1, 5))) for _ in range(count)]
+
+    def _html(self, paragraphs: list[str]) -> str:
+        rows = "".join(f"<tr><td>{w}</td><td>${self.rng.randint(1, 999)}.00</td></tr>" for w in self.rng.choices(_WORDS, k=3))
+        body = "".join(f"<p>{p}</p>" for p in paragraphs)
+        return (
+            "<html><head><style>p{margin:0} td{padding:4px}</style></head><body>"
+            f"{body}<table>{rows}</table>"
+            "<script>window.track&&track('open')</script><img src=\"https://example.com/p.gif\">"
+            "<a href=\"https://example.com/unsubscribe\">Unsubscribe</a></body></html>"
+        )
+
+    def _attachment(self) -> tuple[str, str, bytes]:
+        rng = self.rng
+        major, minor, ext = rng.choice(_ATTACHMENT_TYPES)
+        if self.payloads and rng.random() < self.spec.duplicate_rate:
+            data = rng.choice(self.payloads)
+        else:
+            size = max(64, int(rng.expovariate(1 / (self.spec.mean_attachment_kb * 1024))))
+            data = rng.randbytes(size)
+            if len(self.payloads) < 256:
+                self.payloads.append(data)
+        return f"{major}/{minor}", f"{rng.choice(_WORDS)}-{rng.randint(1, 99)}.{ext}", data
+
+    def message(self, i: int) -> bytes:
+        rng, spec = self.rng, self.spec
+        self.when += timedelta(seconds=rng.expovariate(1 / 900))
+        sender_name, sender = _address(self._sender())
+        recipients = [_address(r) for r in self._recipients()]
+        cc_split = len(recipients) if rng.random() < 0.7 else max(1, len(recipients) // 2)
+        message_id = f"<{i}.{spec.seed}@bench.maillens.invalid>"
+
+        headers = [
+            f"From: {_encode_header(sender_name)} <{sender}>",
+            "To: " + ", ".join(f"{n} <{a}>" for n, a in recipients[:cc_split]),
+        ]
+        if recipients[cc_split:]:
+            headers.append("Cc: " + ", ".join(a for _, a in recipients[cc_split:]))
+        if self.recent and rng.random() < spec.reply_rate:
+            parent_id, parent_refs, parent_subject = rng.choice(self.recent)
+            refs = " ".join((parent_refs.split() + [parent_id])[-10:])
+            subject = parent_subject if parent_subject.startswith("Re: ") else f"Re: {parent_subject}"
+            headers += [f"In-Reply-To: {parent_id}", f"References: {refs}"]
+        else:
+            refs = ""
+            subject = self._sentence(rng.randint(2, 7))[:-1]
+            if rng.random() < 0.05:
+                subject += " — café"
+        headers += [
+            f"Subject: {_encode_header(subject)}",
+            f"Date: {format_datetime(self.when)}",
+            f"Message-ID: {message_id}",
+            "MIME-Version: 1.0",
+        ]
+        self.recent.append((message_id, refs, subject))
+        if len(self.recent) > RECENT_FOR_REPLIES:
+            self.recent.pop(0)
+
+        paragraphs = self._paragraphs()
+        plain = "\n\n".join(paragraphs)
+        html = self._html(paragraphs) if rng.random() < spec.html_share else None
+        if html is None:
+            parts = [("text/plain; charset=utf-8", "8bit", plain.encode(), None)]
+        elif rng.random() < 0.5:
+            parts = [("text/html; charset=utf-8", "8bit", html.encode(), None)]
+        else:
+            parts = [_multipart("alternative", [
+                ("text/plain; charset=utf-8", "8bit", plain.encode(), None),
+                ("text/html; charset=utf-8", "8bit", html.encode(), None),
+            ], f"alt{i}")]
+        if rng.random() < spec.attach_rate:
+            for _ in range(1 if rng.random() < 0.8 else rng.randint(2, 4)):
+                mime_type, filename, data = self._attachment()
+                parts.append((f'{mime_type}; name="{filename}"', "base64", base64.encodebytes(data), filename))
+        if len(parts) == 1:
+            content_type, encoding, body, _ = parts[0]
+        else:
+            content_type, encoding, body, _ = _multipart("mixed", parts, f"mix{i}")
+        headers += [f"Content-Type: {content_type}", f"Content-Transfer-Encoding: {encoding}"]
+        return ("\n".join(headers) + "\n\n").encode() + body + b"\n"
+
+
+# a MIME part: (content type, transfer encoding, encoded body, attachment filename or None)
+_Part = tuple[str, str, bytes, str | None]
+
+
+def _multipart(subtype: str, parts: list[_Part], boundary: str) -> _Part:
+    chunks = []
+    for content_type, encoding, body, filename in parts:
+        header = f"--{boundary}\nContent-Type: {content_type}\nContent-Transfer-Encoding: {encoding}\n"
+        if filename:
+            header += f'Content-Disposition: attachment; filename="{filename}"\n'
+        chunks.append((header + "\n").encode() + body + b"\n")
+    chunks.append(f"--{boundary}--\n".encode())
+    return f'multipart/{subtype}; boundary="{boundary}"', "7bit", b"".join(chunks), None
+
+
+def _emlx(raw: bytes) -> bytes:
+    return f"{len(raw)}\n".encode() + raw + b'<?xml version="1.0" encoding="UTF-8"?>\n<plist version="1.0"><dict/></plist>\n'
+
+
+def _mbox_entry(raw: bytes, when: datetime) -> bytes:
+    # mboxrd quoting, so any body line starting "From " survives the split
+    lines = [b">" + line if line.lstrip(b">").startswith(b"From ") else line for line in raw.split(b"\n")]
+    return f"From bench@maillens.invalid {when:%a %b %d %H:%M:%S %Y}\n".encode() + b"\n".join(lines) + b"\n"
+
+
+def spec_path(out: str, spec: CorpusSpec) -> str:
+    return out + ".json" if spec.format == "mbox" else os.path.join(out, "corpus.json")
+
+
+def load_spec(out: str) -> CorpusSpec | None:
+    """The spec a corpus at `out` was generated with, or None."""
+    for fmt in ("emlx", "mbox"):
+        path = spec_path(out, CorpusSpec(format=fmt))
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                return CorpusSpec(**json.load(fh)["spec"])
+    return None
+
+
+def messages(spec: CorpusSpec) -> Iterator[tuple[bytes, datetime]]:
+    """(RFC 822 bytes, sent time) for each message of the corpus, without writing it."""
+    gen = _Generator(spec)
+    for i in range(spec.messages):
+        raw = gen.message(i)
+        yield raw, gen.when
+
+
+def generate(out: str, spec: CorpusSpec) -> dict:
+    """Write the corpus for `spec` at `out` (a folder, or the mbox file)."""
+    total_bytes = 0
+    if spec.format == "mbox":
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        with open(out, "wb") as fh:
+            for raw, when in messages(spec):
+                entry = _mbox_entry(raw, when)
+                fh.write(entry)
+                total_bytes += len(entry)
+    else:
+        for i, (raw, _) in enumerate(messages(spec)):
+            folder = os.path.join(out, f"Mailbox{i // MAILBOX_SIZE:04d}.mbox", "Messages")
+            if i % MAILBOX_SIZE == 0:
+                os.makedirs(folder, exist_ok=True)
+            data = _emlx(raw)
+            with open(os.path.join(folder, f"{i}.emlx"), "wb") as fh:
+                fh.write(data)
+            total_bytes += len(data)
+    summary = {"spec": spec._asdict(), "bytes": total_bytes}
+    with open(spec_path(out, spec), "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, indent=2)
+    return summary
+
+
+def main():
+    defaults = CorpusSpec()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out", help="output folder (emlx) or file (mbox)")
+    parser.add_argument("--messages", type=parse_count, default=defaults.messages, help="e.g. 10k, 100k, 1M")
+    parser.add_argument("--format", choices=("emlx", "mbox"), default=defaults.format)
+    for field in CorpusSpec._fields[2:]:
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(defaults._field_defaults[field]),
+                            default=defaults._field_defaults[field])
+    args = parser.parse_args()
+    spec = CorpusSpec(**{field: getattr(args, field) for field in CorpusSpec._fields})
+    summary = generate(args.out, spec)
+    print(f"{spec.messages} messages, {summary['bytes'] / 1e6:.1f} MB -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
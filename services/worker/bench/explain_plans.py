@@ -0,0 +1,74 @@
+# services/worker/bench/explain_plans.py
+"""
+Print EXPLAIN QUERY PLAN for every statement the insight and search endpoints run, and
+flag any that fall back to a full scan of emails.
+
+    python -m bench.explain_plans            # against maillens.db
+"""
+import inspect
+import re
+import sys
+from types import SimpleNamespace
+
+import db.connection as dbconn
+
+_FULL_SCAN = re.compile(r"\bSCAN (emails|e)\b(?! USING)")
+
+
+def _cases(api):
+    # the route functions are async wrappers (utils/executor.bounded); call what they wrap
+    api = SimpleNamespace(**{name: inspect.unwrap(fn) for name, fn in vars(api).items() if name.startswith("api_")})
+    return [
+        ("senders/first-time", lambda: api.api_insights_first_time_senders(limit=50)),
+        ("senders/top", lambda: api.api_insights_top_senders(limit=50)),
+        ("senders/by-address", lambda: api.api_insights_senders_by_address(address=["user1"], limit=50)),
+        ("senders/dormant", lambda: api.api_insights_senders_dormant(limit=50, inactive_days=365)),
+        ("recipients/count-type", lambda: api.api_insights_recipient_count_type(mode="single", limit=50)),
+        ("recipients/distribution", lambda: api.api_insights_recipient_distribution(bucket="large", limit=50)),
+        ("search", lambda: api.api_search(q="hello", limit=50, sender="user1@example1.com", date_from=0)),
+        ("attachments/largest", lambda: api.api_insights_attachments_largest(limit=50)),
+        ("attachments/types", lambda: api.api_insights_attachments_types(limit=50)),
+        ("attachments/duplicates", lambda: api.api_insights_attachments_duplicates(limit=50)),
+        ("timeline", lambda: api.api_insights_timeline(granularity="week", sender="user1@example1.com")),
+        ("timeline/domain", lambda: api.api_insights_timeline(granularity="month", domain="example1.com")),
+        ("timeline/all", lambda: api.api_insights_timeline(granularity="day", date_from=0)),
+        ("threads", lambda: api.api_threads(limit=50)),
+        ("threads/{id}", lambda: api.api_thread(thread_id=1)),
+    ]
+
+
+def main() -> int:
+    statements: list[str] = []
+    real_connect = dbconn.connect
+
+    def tracing_connect(*args, **kwargs):
+        con = real_connect(*args, **kwargs)
+        con.set_trace_callback(statements.append)
+        return con
+
+    dbconn.connect = tracing_connect
+    import main as api  # noqa: E402  (imported after patching connect)
+
+    con = real_connect()
+    scans = 0
+    for name, call in _cases(api):
+        statements.clear()
+        call()
+        print(f"== {name}")
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                continue
+            plan = [row[3] for row in con.execute("EXPLAIN QUERY PLAN " + sql)]
+            flagged = [step for step in plan if _FULL_SCAN.search(step)]
+            scans += len(flagged)
+            print("  " + " ".join(sql.split())[:110])
+            for step in plan:
+                print(f"    {'!!' if step in flagged else '  '} {step}")
+    con.close()
+    if scans:
+        print(f"{scans} full scan(s) of emails", file=sys.stderr)
+    return 1 if scans else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# services/worker/bench/suite.py
+"""
+Ingest a corpus into a scratch database, then time every /insights/* route (and
+the list/search routes) against it. Writes one JSON file per run so runs can be
+diffed or plotted.
+
+    python -m bench.suite --sizes 10k,100k --out bench-results.json
+    python -m bench.suite --corpus ~/Library/Mail/V10 --out mine.json
+    python -m bench.suite --sizes 10k --compare bench-results.json
+
+Synthetic corpora (bench/corpus.py) are generated once under --corpus-dir and
+reused while their spec matches. Each corpus runs in a fresh child process, so
+peak RSS is per corpus; routes are called through the ASGI app with the result
+cache cleared, i.e. the uncached latency a first visit sees.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from ingest.pipeline import default_workers
+from .corpus import CorpusSpec, generate, load_spec, parse_count
+
+DEFAULT_CORPUS_DIR = os.path.join(tempfile.gettempdir(), "maillens-bench")
+DEFAULT_REPEAT = 20
+# GET routes outside /insights worth tracking; /insights/* is discovered from the app
+EXTRA_ROUTES = ("/stats", "/emails", "/threads", "/search")
+ROUTE_PARAMS = {
+    "/search": {"q": "invoice"},
+    "/insights/recipients/count-type": {"mode": "single"},
+    "/insights/recipients/distribution": {"bucket": "large"},
+}
+
+
+def _rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes on macOS, KB elsewhere
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+async def _get(app, path: str, params: dict) -> int:
+    """One GET through the full ASGI stack (middleware, validation, JSON); returns the status."""
+    status = 500
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": urlencode(params, doseq=True).encode(), "headers": [],
+        "server": ("bench", 80), "client": ("bench", 0),
+    }
+    await app(scope, receive, send)
+    return status
+
+
+def _routes(app, top_sender: str | None) -> list[tuple[str, dict]]:
+    paths = sorted(
+        route.path for route in app.routes
+        if route.path.startswith("/insights/") and "GET" in getattr(route, "methods", ()) and "{" not in route.path
+    )
+    params = dict(ROUTE_PARAMS)
+    if top_sender:
+        params["/insights/senders/by-address"] = {"address": [top_sender]}
+    return [(path, params.get(path, {})) for path in (*EXTRA_ROUTES, *paths)]
+
+
+async def _time_routes(repeat: int, top_sender: str | None) -> dict:
+    import main
+    from utils.cache import results as result_cache
+
+    timings = {}
+    for path, params in _routes(main.app, top_sender):
+        samples, errors = [], 0
+        for _ in range(repeat):
+            result_cache.clear()
+            started = time.perf_counter()
+            status = await _get(main.app, path, params)
+            samples.append((time.perf_counter() - started) * 1000)
+            errors += status != 200
+        started = time.perf_counter()
+        await _get(main.app, path, params)  # served from the result cache this time
+        cached_ms = (time.perf_counter() - started) * 1000
+        timings[path] = {
+            "calls": repeat,
+            "errors": errors,
+            "p50_ms": round(_percentile(samples, 0.5), 3),
+            "p99_ms": round(_percentile(samples, 0.99), 3),
+            "max_ms": round(max(samples), 3),
+            "cached_ms": round(cached_ms, 3),
+        }
+    return timings
+
+
+def run_one(corpus: str, fmt: str, workers: int, headers_first: bool, repeat: int) -> dict:
+    """Runs in the child process, with MAILLENS_DB_PATH already pointing at a scratch file."""
+    from db.connection import DB_PATH, close_all, read_connection
+    from db.init_db import init_db
+    from ingest.bodies import fill_bodies
+    from ingest.emlx import ingest_emlx_folder
+    from ingest.mbox import ingest_mbox
+
+    init_db()
+    started = time.perf_counter()
+    if fmt == "mbox":
+        result = ingest_mbox(corpus, workers=workers, headers_first=headers_first)
+    else:
+        result = ingest_emlx_folder(corpus, workers=workers, headers_first=headers_first)
+    headers_s = time.perf_counter() - started
+    if headers_first:
+        fill_bodies(workers=workers)
+    elapsed = time.perf_counter() - started
+    messages = result.get("inserted", 0)
+    ingest = {
+        "ok": result.get("ok", False),
+        "messages": messages,
+        "elapsed_s": round(elapsed, 3),
+        "msgs_per_s": round(messages / elapsed, 1) if elapsed else 0.0,
+        "stages": result.get("timings", {}).get("stages", {}),
+        "rss_peak_mb": _rss_mb(),
+    }
+    if headers_first:
+        ingest["headers_s"] = round(headers_s, 3)
+
+    with read_connection() as con:
+        row = con.execute("SELECT from_email FROM sender_stats ORDER BY total_emails DESC LIMIT 1").fetchone()
+    top_sender = row[0] if row else None
+    routes = asyncio.run(_time_routes(repeat, top_sender))
+    close_all()
+    return {
+        "ingest": ingest,
+        "routes": routes,
+        "db_bytes": sum(os.path.getsize(p) for p in (str(DB_PATH), f"{DB_PATH}-wal") if os.path.exists(p)),
+        "rss_peak_mb": _rss_mb(),
+    }
+
+
+def _child(corpus: str, fmt: str, args) -> dict:
+    scratch = tempfile.mkdtemp(prefix="maillens-bench-db-")
+    env = {**os.environ, "MAILLENS_DB_PATH": os.path.join(scratch, "bench.db")}
+    cmd = [
+        sys.executable, "-m", "bench.suite", "--run-one", corpus, "--format", fmt,
+        "--workers", str(args.workers), "--repeat", str(args.repeat),
+    ]
+    if args.headers_first:
+        cmd.append("--headers-first")
+    try:
+        out = subprocess.run(cmd, env=env, check=True, stdout=subprocess.PIPE, cwd=os.getcwd()).stdout
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def _corpora(args) -> list[tuple[str, str, dict | None]]:
+    """(path, format, spec) for every corpus of this run, generating synthetic ones as needed."""
+    corpora = []
+    for path in args.corpus:
+        corpora.append((path, "mbox" if os.path.isfile(path) else "emlx", None))
+    for size in filter(None, (s.strip() for s in args.sizes.split(","))):
+        spec = CorpusSpec(messages=parse_count(size), format=args.format, seed=args.seed)
+        path = os.path.join(args.corpus_dir, f"{args.format}-{size}-seed{args.seed}" + (".mbox" if args.format == "mbox" else ""))
+        if load_spec(path) != spec:
+            print(f"generating {spec.messages} messages at {path}", file=sys.stderr)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            generate(path, spec)
+        corpora.append((path, spec.format, spec._asdict()))
+    return corpora
+
+
+def _compare(current: dict, baseline: dict):
+    before = {run["corpus"]: run for run in baseline.get("runs", [])}
+    for run in current["runs"]:
+        old = before.get(run["corpus"])
+        if old is None:
+            continue
+        print(f"== {run['corpus']}")
+        new_rate, old_rate = run["ingest"]["msgs_per_s"], old["ingest"]["msgs_per_s"]
+        print(f"  ingest      {old_rate:10.1f} -> {new_rate:10.1f} msgs/s  ({new_rate / old_rate if old_rate else 0:.2f}x)")
+        for path, timing in run["routes"].items():
+            prev = old["routes"].get(path)
+            if prev:
+                print(f"  {path:<38} p50 {prev['p50_ms']:8.2f} -> {timing['p50_ms']:8.2f} ms"
+                      f"   p99 {prev['p99_ms']:8.2f} -> {timing['p99_ms']:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="", help="synthetic corpus sizes, e.g. 10k,100k,1M")
+    parser.add_argument("--corpus", action="append", default=[], help="an existing .emlx folder or mbox (repeatable)")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--format", choices=("emlx", "mbox"), default="emlx")
+    parser.add_argument("--seed", type=int, default=CorpusSpec().seed)
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--headers-first", action="store_true")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="calls per route")
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--compare", help="an earlier results file to print deltas against")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        report = run_one(args.run_one, args.format, args.workers, args.headers_first, args.repeat)
+        print(json.dumps(report))
+        return
+
+    corpora = _corpora(args)
+    if not corpora:
+        parser.error("nothing to run: pass --sizes and/or --corpus")
+    results = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "headers_first": args.headers_first,
+        "repeat": args.repeat,
+        "runs": [],
+    }
+    for path, fmt, spec in corpora:
+        report = _child(path, fmt, args)
+        results["runs"].append({"corpus": os.path.basename(path.rstrip(os.sep)), "path": path, "spec": spec, **report})
+        ingest = report["ingest"]
+        slowest = max(report["routes"].items(), key=lambda item: item[1]["p99_ms"])
+        print(f"{path}: {ingest['messages']} msgs in {ingest['elapsed_s']}s ({ingest['msgs_per_s']} msgs/s), "
+              f"peak RSS {report['rss_peak_mb']} MB, slowest route {slowest[0]} p99 {slowest[1]['p99_ms']} ms")
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"wrote {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            _compare(results, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# services/worker/db/aggregates.py
+from contextlib import closing
+import json
+from typing import Iterable
+
+from .connection import connect
+
+# reads only ix_emails_from_date (from_email, date_ms)
+_SENDER_SELECT = """
+    SELECT from_email,
+           LOWER(TRIM(from_email)),
+           COUNT(*),
+           MIN(date_ms),
+           MAX(date_ms)
+    FROM emails
+    WHERE from_email IS NOT NULL
+      AND TRIM(from_email) <> ''
+"""
+
+_SENDER_UPSERT = """
+    INSERT INTO sender_stats (from_email, address_norm, total_emails, first_ts, latest_ts)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(from_email) DO UPDATE SET
+        total_emails = total_emails + excluded.total_emails,
+        first_ts = MIN(COALESCE(first_ts, excluded.first_ts), COALESCE(excluded.first_ts, first_ts)),
+        latest_ts = MAX(COALESCE(latest_ts, excluded.latest_ts), COALESCE(excluded.latest_ts, latest_ts))
+"""
+
+
+def _is_sender(value) -> bool:
+    return isinstance(value, str) and value.strip() != ""
+
+
+def add_senders(cur, rows: Iterable[tuple[str, int | None]]):
+    """Fold newly inserted (from_email, date_ms) pairs into sender_stats."""
+    batch: dict[str, list] = {}
+    for from_email, ts in rows:
+        if not _is_sender(from_email):
+            continue
+        entry = batch.get(from_email)
+        if entry is None:
+            batch[from_email] = [from_email, from_email.strip().lower(), 1, ts, ts]
+            continue
+        entry[2] += 1
+        if ts is not None:
+            entry[3] = ts if entry[3] is None else min(entry[3], ts)
+            entry[4] = ts if entry[4] is None else max(entry[4], ts)
+    if batch:
+        cur.executemany(_SENDER_UPSERT, batch.values())
+
+
+def refresh_senders(cur, senders: Iterable[str]):
+    """Recompute sender_stats rows from emails after updates or deletes."""
+    for sender in {s for s in senders if _is_sender(s)}:
+        cur.execute("DELETE FROM sender_stats WHERE from_email = ?", (sender,))
+        cur.execute(
+            f"INSERT INTO sender_stats (from_email, address_norm, total_emails, first_ts, latest_ts) "
+            f"{_SENDER_SELECT} AND from_email = ? GROUP BY from_email",
+            (sender,),
+        )
+
+
+def rebuild_sender_stats(con):
+    cur = con.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    cur.execute("DELETE FROM sender_stats")
+    cur.execute(
+        f"INSERT INTO sender_stats (from_email, address_norm, total_emails, first_ts, latest_ts) "
+        f"{_SENDER_SELECT} GROUP BY from_email"
+    )
+    con.commit()
+    return cur.execute("SELECT COUNT(*) FROM sender_stats").fetchone()[0]
+
+
+def _json_addresses(raw) -> list[str]:
+    if not raw:
+        return []
+    try:
+        entries = json.loads(raw)
+    except Exception:
+        return []
+    if isinstance(entries, str):
+        entries = [entries]
+    return [value.strip() for value in entries if isinstance(value, str) and value.strip()]
+
+
+def backfill_recipients(con, batch_size: int = 5000) -> int:
+    """Fill email_recipients and recipient_count for rows stored before they existed."""
+    cur = con.cursor()
+    last_id = 0
+    filled = 0
+    while True:
+        rows = cur.execute(
+            """
+            SELECT id, to_json, cc_json FROM emails
+            WHERE recipient_count IS NULL AND id > ?
+            ORDER BY id LIMIT ?
+            """,
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            return filled
+        cur.execute("BEGIN IMMEDIATE")
+        for email_id, to_json, cc_json in rows:
+            recipients: dict[str, str] = {}
+            for kind, raw in (("to", to_json), ("cc", cc_json)):
+                for address in _json_addresses(raw):
+                    recipients.setdefault(address, kind)
+            cur.executemany(
+                "INSERT OR IGNORE INTO email_recipients(email_id, address, kind) VALUES(?,?,?)",
+                [(email_id, address, kind) for address, kind in recipients.items()],
+            )
+            cur.execute("UPDATE emails SET recipient_count=? WHERE id=?", (len(recipients), email_id))
+        con.commit()
+        filled += len(rows)
+        last_id = rows[-1][0]
+
+
+if __name__ == "__main__":
+    with closing(connect(write=True)) as con:
+        count = rebuild_sender_stats(con)
+    print("Rebuilt sender_stats:", count, "senders")
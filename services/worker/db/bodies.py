@@ -0,0 +1,118 @@
+# services/worker/db/bodies.py
+"""
+Content-addressed body store. Each distinct body is kept once in `bodies`,
+keyed by emails.body_hash and compressed (see db/codec.py); the email_text
+view inflates it on read, which is also where emails_fts gets its text.
+
+Databases written before the store keep their text in emails.body_text
+(the view falls back to it). Convert them with:
+
+    python -m db.bodies                # VACUUMs afterwards to hand the space back
+    python -m db.bodies --no-vacuum
+"""
+from contextlib import closing
+import sys
+from typing import Iterable
+
+from utils.text import sha256_text
+from .codec import compress_text
+from .connection import DB_PATH, connect
+
+CONVERT_BATCH = 2_000
+_HASHES_PER_LOOKUP = 500
+
+
+def store_bodies(cur, bodies: Iterable[tuple[str, str]]) -> int:
+    """Store (body_hash, text) pairs not stored yet; only those get compressed. Returns how many were new."""
+    pending = {body_hash: text for body_hash, text in bodies if body_hash}
+    if not pending:
+        return 0
+    hashes = list(pending)
+    for start in range(0, len(hashes), _HASHES_PER_LOOKUP):
+        chunk = hashes[start:start + _HASHES_PER_LOOKUP]
+        cur.execute(f"SELECT hash FROM bodies WHERE hash IN ({', '.join('?' for _ in chunk)})", chunk)
+        for (known,) in cur.fetchall():
+            del pending[known]
+    cur.executemany(
+        "INSERT OR IGNORE INTO bodies(hash, codec, raw_bytes, data) VALUES(?,?,?,?)",
+        [(body_hash, *_packed(text)) for body_hash, text in pending.items()],
+    )
+    return len(pending)
+
+
+def _packed(text: str) -> tuple[str, int, bytes]:
+    codec, data = compress_text(text)
+    return codec, len((text or "").encode("utf-8", "surrogatepass")), data
+
+
+def release_bodies(cur, hashes: Iterable[str | None]):
+    """Drop stored bodies no email points at any more (after a replace or prune)."""
+    for body_hash in {h for h in hashes if h}:
+        cur.execute(
+            "DELETE FROM bodies WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM emails WHERE body_hash = ?)",
+            (body_hash, body_hash),
+        )
+
+
+def _db_bytes(cur) -> int:
+    page_size = cur.execute("PRAGMA page_size").fetchone()[0]
+    return page_size * cur.execute("PRAGMA page_count").fetchone()[0]
+
+
+def convert_bodies(con, batch_size: int = CONVERT_BATCH, vacuum: bool = True) -> dict:
+    """Move emails.body_text into the body store, one transaction per batch."""
+    cur = con.cursor()
+    before = _db_bytes(cur)
+    emails = stored = raw_bytes = 0
+    after_id = 0
+    while True:
+        cur.execute("BEGIN IMMEDIATE")
+        rows = cur.execute(
+            "SELECT id, body_hash, body_text FROM emails WHERE body_text IS NOT NULL AND id > ? ORDER BY id LIMIT ?",
+            (after_id, batch_size),
+        ).fetchall()
+        if not rows:
+            con.commit()
+            break
+        updates, bodies = [], []
+        for email_id, _, text in rows:
+            # rehash rather than trust it: the hash is now the only link to the text
+            actual = sha256_text(text)
+            updates.append((actual, email_id))
+            bodies.append((actual, text))
+            raw_bytes += len(text.encode("utf-8", "surrogatepass"))
+        stored += store_bodies(cur, bodies)
+        cur.executemany("UPDATE emails SET body_hash = ?, body_text = NULL WHERE id = ?", updates)
+        con.commit()
+        emails += len(rows)
+        after_id = rows[-1][0]
+
+    cur.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM bodies")
+    distinct, compressed_bytes = cur.fetchone()
+    if vacuum and emails:
+        cur.execute("VACUUM")
+    after = _db_bytes(cur)
+    return {
+        "emails": emails,
+        "bodies_added": stored,
+        "bodies_total": distinct,
+        "text_bytes": raw_bytes,
+        "stored_bytes": compressed_bytes,
+        "db_bytes_before": before,
+        "db_bytes_after": after,
+        "saved_bytes": before - after,
+    }
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1e6:.1f} MB"
+
+
+if __name__ == "__main__":
+    with closing(connect(write=True)) as con:
+        report = convert_bodies(con, vacuum="--no-vacuum" not in sys.argv[1:])
+    print(f"{DB_PATH}: moved {report['emails']} bodies, {report['bodies_added']} new in the store "
+          f"({report['bodies_total']} total)")
+    print(f"  text {_mb(report['text_bytes'])} -> store {_mb(report['stored_bytes'])}")
+    print(f"  file {_mb(report['db_bytes_before'])} -> {_mb(report['db_bytes_after'])}, "
+          f"saved {_mb(report['saved_bytes'])}")
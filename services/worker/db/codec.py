@@ -0,0 +1,39 @@
+# services/worker/db/codec.py
+import os
+import zlib
+
+# "zlib" (stdlib) or "zstd" (needs the optional zstandard package); stored per body,
+# so changing it only affects bodies written from then on
+BODY_CODEC = os.environ.get("MAILLENS_BODY_CODEC", "zlib")
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+MIN_COMPRESS_BYTES = 128  # shorter bodies are stored as-is
+
+
+def _zstd():
+    import zstandard
+
+    return zstandard
+
+
+def compress_text(text: str) -> tuple[str, bytes]:
+    """(codec, data) for a body; falls back to "raw" when compression doesn't pay."""
+    raw = (text or "").encode("utf-8", "surrogatepass")
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return "raw", raw
+    if BODY_CODEC == "zstd":
+        codec, data = "zstd", _zstd().ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    else:
+        codec, data = "zlib", zlib.compress(raw, ZLIB_LEVEL)
+    return (codec, data) if len(data) < len(raw) else ("raw", raw)
+
+
+def inflate_text(codec: str | None, data: bytes | None) -> str | None:
+    """Registered on every connection as inflate_body(codec, data)."""
+    if data is None:
+        return None
+    if codec == "zlib":
+        data = zlib.decompress(data)
+    elif codec == "zstd":
+        data = _zstd().ZstdDecompressor().decompress(data)
+    return bytes(data).decode("utf-8", "surrogatepass")
@@ -1,19 +1,151 @@
+from contextlib import contextmanager
+import os
 from pathlib import Path
 import sqlite3
+import threading
 
-DB_PATH = Path(__file__).resolve().parent.parent / "maillens.db"
+from .codec import inflate_text
+# MAILLENS_DB_PATH points the worker at another database (benchmarks, scratch copies)
+DB_PATH = Path(os.environ.get("MAILLENS_DB_PATH") or Path(__file__).resolve().parent.parent / "maillens.db")
 
 BUSY_TIMEOUT_MS = 30_000  # wait up to 30s when the database is busy
 
+# Tunables for long-lived connections (env overrides for large mailboxes / small machines)
+READ_CACHE_KB = int(os.environ.get("MAILLENS_READ_CACHE_KB", 16_384))    # page cache per reader
+WRITE_CACHE_KB = int(os.environ.get("MAILLENS_WRITE_CACHE_KB", 65_536))  # page cache for the writer
+MMAP_SIZE = int(os.environ.get("MAILLENS_MMAP_SIZE", 256 * 1024 * 1024))  # bytes, 0 disables
+TEMP_STORE = os.environ.get("MAILLENS_TEMP_STORE", "MEMORY")             # DEFAULT | FILE | MEMORY
 
-def connect(write: bool = False):
-    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000)
+
+def connect(write: bool = False, check_same_thread: bool = True):
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=check_same_thread)
     # ensure we respect the busy timeout for long-running writes
     conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
     conn.execute("PRAGMA foreign_keys=ON;")
+    # the email_text view (and so emails_fts snippets) reads bodies through this
+    conn.create_function("inflate_body", 2, inflate_text, deterministic=True)
     conn.row_factory = sqlite3.Row
     if write:
         conn.isolation_level = None  # manual transactions
     return conn
+
+
+def _tune(conn, cache_kb: int):
+    conn.execute(f"PRAGMA cache_size=-{cache_kb}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute(f"PRAGMA temp_store={TEMP_STORE}")
+    return conn
+
+
+class ReadPool:
+    """
+    One pre-configured read connection per thread, reused across requests.
+
+    FastAPI runs sync handlers on a fixed threadpool, so per-thread
+    connections give pooling without any checkout locking. Reads outside a
+    transaction always see the latest committed data under WAL.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all: list[sqlite3.Connection] = []
+        self.opened = 0
+        self.checkouts = 0
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _tune(connect(check_same_thread=False), READ_CACHE_KB)
+            self._local.conn = conn
+            with self._lock:
+                self._all.append(conn)
+                self.opened += 1
+        with self._lock:
+            self.checkouts += 1
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass
+        # threads still holding a closed handle will reopen on next use
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._all), "opened": self.opened, "checkouts": self.checkouts}
+
+
+_read_pool = ReadPool()
+_probe_lock = threading.Lock()
+_probe_conn: sqlite3.Connection | None = None
+_writer_lock = threading.RLock()
+_writer_conn: sqlite3.Connection | None = None
+_writer_stats = {"acquisitions": 0}
+
+
+@contextmanager
+def read_connection():
+    conn = _read_pool.get()
+    try:
+        yield conn
+    finally:
+        # never leave a pooled connection inside a transaction
+        if conn.in_transaction:
+            conn.rollback()
+
+
+@contextmanager
+def write_connection():
+    """The process-wide writer connection, held exclusively for the block."""
+    global _writer_conn
+    with _writer_lock:
+        if _writer_conn is None:
+            _writer_conn = _tune(connect(write=True, check_same_thread=False), WRITE_CACHE_KB)
+        _writer_stats["acquisitions"] += 1
+        yield _writer_conn
+
+
+def data_version() -> int:
+    """
+    Changes whenever any other connection (our writer, a CLI rebuild, another
+    process) commits to the database. Cheap enough to check per request.
+    """
+    global _probe_conn
+    with _probe_lock:
+        if _probe_conn is None:
+            _probe_conn = connect(check_same_thread=False)
+        return _probe_conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def close_all():
+    global _writer_conn, _probe_conn
+    _read_pool.close_all()
+    with _probe_lock:
+        if _probe_conn is not None:
+            _probe_conn.close()
+            _probe_conn = None
+    with _writer_lock:
+        if _writer_conn is not None:
+            _writer_conn.close()
+            _writer_conn = None
+
+
+def pool_stats() -> dict:
+    return {
+        "readers": _read_pool.stats(),
+        "writer": {"open": _writer_conn is not None, **_writer_stats},
+        "pragmas": {
+            "read_cache_kb": READ_CACHE_KB,
+            "write_cache_kb": WRITE_CACHE_KB,
+            "mmap_size": MMAP_SIZE,
+            "temp_store": TEMP_STORE,
+        },
+    }
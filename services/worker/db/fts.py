@@ -0,0 +1,57 @@
+# services/worker/db/fts.py
+from contextlib import closing
+
+from .connection import connect
+
+# External-content FTS over the email_text view: the index stores only tokens,
+# and snippet()/highlight() read the text back by rowid, inflating just those
+# bodies. Column names must match the view's. Keep in sync with schema.sql.
+FTS_CONTENT = "email_text"
+FTS_DDL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+  subject, body_text,
+  content='{FTS_CONTENT}', content_rowid='id',
+  tokenize='porter unicode61'
+)
+"""
+
+
+def _is_current(cur) -> bool:
+    row = cur.execute("SELECT sql FROM sqlite_master WHERE name='emails_fts'").fetchone()
+    return row is not None and f"content='{FTS_CONTENT}'" in row[0]
+
+
+def unindex(cur, where_sql: str, params=()):
+    """
+    Remove the emails matching where_sql from emails_fts. External-content rows
+    are deleted by replaying the indexed text, so run this before the row changes.
+    """
+    cur.execute(
+        f"""
+        INSERT INTO emails_fts(emails_fts, rowid, subject, body_text)
+        SELECT 'delete', id, subject, body_text FROM {FTS_CONTENT}
+        WHERE id IN (SELECT id FROM emails WHERE {where_sql})
+        """,
+        params,
+    )
+
+
+def rebuild_fts(con) -> int:
+    """(Re)create emails_fts over email_text and re-index every email."""
+    cur = con.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    if not _is_current(cur):
+        # older databases used a contentless table or read straight from emails
+        cur.execute("DROP TABLE IF EXISTS emails_fts")
+        cur.execute(FTS_DDL)
+    cur.execute("INSERT INTO emails_fts(emails_fts) VALUES('rebuild')")
+    # 'rebuild' reads every row; headers-only rows get indexed when their body lands
+    unindex(cur, "pipeline_state = 0")
+    con.commit()
+    return cur.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+
+
+if __name__ == "__main__":
+    with closing(connect(write=True)) as con:
+        count = rebuild_fts(con)
+    print("Rebuilt emails_fts:", count, "emails")
@@ -1,15 +1,118 @@
 from contextlib import closing
+from pathlib import Path
 import sqlite3
 import time
 
+from .aggregates import backfill_recipients, rebuild_sender_stats
+from .rollups import rebuild_daily_volume
 from .connection import DB_PATH, connect
+from .fts import rebuild_fts
+from .jobs import queue_job
 
+SCHEMA_PATH = Path(__file__).resolve().parent / "schema.sql"
 RETRY_ATTEMPTS = 5
 RETRY_DELAY_BASE = 0.5  # seconds
 
+# seconds-vs-milliseconds guard for rows written by older importers
+NORMALIZED_TS = "CASE WHEN date_ts IS NULL THEN NULL WHEN date_ts > 1000000000000 THEN date_ts ELSE date_ts * 1000 END"
+
+
+# Columns added after a table was first released. CREATE TABLE IF NOT EXISTS
+# won't touch an existing table, so these are added before schema.sql runs
+# (its indexes may reference them).
+ADDED_COLUMNS = [
+    ("emails", "recipient_count", "INTEGER"),
+    ("emails", "date_ms", "INTEGER"),
+    ("emails", "from_norm", "TEXT"),
+    ("emails", "pipeline_state", "INTEGER NOT NULL DEFAULT 1"),
+    ("emails", "in_reply_to", "TEXT"),
+    ("emails", "ref_ids", "TEXT"),
+    ("emails", "thread_id", "INTEGER"),
+]
+
+
+def _add_missing_columns(cur):
+    for table, column, decl in ADDED_COLUMNS:
+        existing = {row[1] for row in cur.execute(f"PRAGMA table_info({table})")}
+        if existing and column not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _backfill_canonical_columns(con, batch_size: int = 20_000):
+    cur = con.cursor()
+    max_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM emails").fetchone()[0]
+    for start in range(0, max_id, batch_size):
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            f"""
+            UPDATE emails
+            SET date_ms = {NORMALIZED_TS},
+                from_norm = LOWER(TRIM(from_email))
+            WHERE id > ? AND id <= ?
+            """,
+            (start, start + batch_size),
+        )
+        con.commit()
+    # ix_emails_from_date starts with from_email, so the single-column index is redundant
+    cur.execute("DROP INDEX IF EXISTS ix_emails_from")
+    rebuild_sender_stats(con)
+
+
+def _queue_attachment_backfill(con):
+    """
+    Attachments were not recorded before this version. Queue a job
+    (ingest/bodies.py:fill_attachments) that re-reads those messages and
+    records theirs; the emails themselves, their bodies and search stay as they are.
+    """
+    cur = con.cursor()
+    # ix_att_mime_bytes starts with the same columns
+    cur.execute("DROP INDEX IF EXISTS ix_att_mime")
+    cur.execute("BEGIN IMMEDIATE")
+    if cur.execute(
+        "SELECT 1 FROM emails WHERE has_attach = 1 "
+        "AND NOT EXISTS (SELECT 1 FROM attachments WHERE email_id = emails.id) LIMIT 1"
+    ).fetchone():
+        queue_job(cur, "attachments")
+    con.commit()
+
+
+def _queue_thread_header_backfill(con):
+    """
+    In-Reply-To and References were not kept before this version, so older
+    rows can't be threaded from what is stored (the new columns are NULL).
+    Queue a job (ingest/bodies.py:fill_thread_headers) that reads them from
+    each message and then threads every email.
+    """
+    cur = con.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    if cur.execute("SELECT 1 FROM emails WHERE in_reply_to IS NULL LIMIT 1").fetchone():
+        queue_job(cur, "thread_headers")
+    con.commit()
+
+
+# (version, step) pairs run once, in order, on databases created at an older
+# version. schema.sql has already created any new tables by the time they run.
+MIGRATIONS = [
+    (2, backfill_recipients),
+    (3, _backfill_canonical_columns),  # ends by rebuilding sender_stats
+    (4, rebuild_fts),  # emails_fts becomes external content over the email_text view
+    (5, _queue_attachment_backfill),
+    (6, _queue_thread_header_backfill),
+    (7, rebuild_daily_volume),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _schema_version(cur) -> int:
+    try:
+        row = cur.execute("SELECT value FROM meta WHERE key='schema_version'").fetchone()
+    except sqlite3.OperationalError:
+        return 0  # fresh database, meta doesn't exist yet
+    return int(row[0]) if row else 0
+
 
 def init_db():
-    sql = (DB_PATH.parent / "db" / "schema.sql").read_text(encoding="utf-8")
+    sql = SCHEMA_PATH.read_text(encoding="utf-8")
     last_exc: Exception | None = None
 
     for attempt in range(RETRY_ATTEMPTS):
@@ -17,8 +120,15 @@ def init_db():
             with closing(connect(write=True)) as con:
                 cur = con.cursor()
                 cur.execute("BEGIN IMMEDIATE")
+                current = _schema_version(cur)
+                _add_missing_columns(cur)
                 cur.executescript(sql)
-                cur.execute("INSERT OR REPLACE INTO meta(key,value) VALUES('schema_version','1')")
+                con.commit()
+                for version, step in MIGRATIONS:
+                    if current < version:
+                        step(con)
+                cur.execute("INSERT OR REPLACE INTO meta(key,value) VALUES('schema_version',?)",
+                            (str(SCHEMA_VERSION),))
                 con.commit()
             return
         except sqlite3.OperationalError as exc:
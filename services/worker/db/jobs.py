@@ -0,0 +1,176 @@
+# services/worker/db/jobs.py
+"""
+The ingest_jobs table: one row per queued or finished ingest job. The
+scheduler that runs them is ingest/runner.py; the writers record each
+committed batch here in the same transaction (record_batch), so a job's
+done/checkpoint never runs ahead of the data.
+"""
+import json
+import time
+from typing import NamedTuple
+
+from .connection import read_connection, write_connection
+
+ACTIVE_STATES = ("queued", "running")
+MAX_ATTEMPTS = 3  # a job cut short more often than this is failed rather than queued again
+
+_COLUMNS = (
+    "job_id, kind, path, options, state, attempts, done, checkpoint, "
+    "created_ts, started_ts, finished_ts, result, error"
+)
+
+
+class Job(NamedTuple):
+    job_id: int
+    kind: str
+    path: str
+    options: dict
+    state: str
+    attempts: int
+    done: int
+    checkpoint: str | None
+    created_ts: int
+    started_ts: int | None
+    finished_ts: int | None
+    result: dict | None
+    error: str | None
+
+
+def _job(row) -> Job:
+    values = list(row)
+    values[3] = json.loads(values[3] or "{}")
+    values[11] = json.loads(values[11]) if values[11] else None
+    return Job(*values)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def create_job(kind: str, path: str, options: dict) -> Job:
+    with write_connection() as con:
+        row = con.execute(
+            f"INSERT INTO ingest_jobs (kind, path, options, created_ts) VALUES (?, ?, ?, ?) RETURNING {_COLUMNS}",
+            (kind, path, json.dumps(options), _now_ms()),
+        ).fetchone()
+    return _job(row)
+
+
+def queue_job(cur, kind: str, path: str = "", options: dict | None = None) -> bool:
+    """
+    Queue a job inside the caller's transaction (schema migrations), unless one
+    for (kind, path) is already queued or running. The runner starts it.
+    """
+    placeholders = ", ".join("?" for _ in ACTIVE_STATES)
+    if cur.execute(
+        f"SELECT 1 FROM ingest_jobs WHERE kind = ? AND path = ? AND state IN ({placeholders}) LIMIT 1",
+        (kind, path, *ACTIVE_STATES),
+    ).fetchone():
+        return False
+    cur.execute(
+        "INSERT INTO ingest_jobs (kind, path, options, created_ts) VALUES (?, ?, ?, ?)",
+        (kind, path, json.dumps(options or {}), _now_ms()),
+    )
+    return True
+
+
+def get_job(job_id: int) -> Job | None:
+    with read_connection() as con:
+        row = con.execute(f"SELECT {_COLUMNS} FROM ingest_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _job(row) if row else None
+
+
+def find_job(kind: str, path: str, states: tuple[str, ...] = ACTIVE_STATES) -> Job | None:
+    """The oldest job for (kind, path) in one of states."""
+    placeholders = ", ".join("?" for _ in states)
+    with read_connection() as con:
+        row = con.execute(
+            f"SELECT {_COLUMNS} FROM ingest_jobs WHERE kind = ? AND path = ? AND state IN ({placeholders}) "
+            f"ORDER BY job_id LIMIT 1",
+            (kind, path, *states),
+        ).fetchone()
+    return _job(row) if row else None
+
+
+def list_jobs(states: tuple[str, ...] | None = None, limit: int = 50, before: int | None = None,
+              oldest_first: bool = False) -> list[Job]:
+    where, params = [], []
+    if states:
+        where.append(f"state IN ({', '.join('?' for _ in states)})")
+        params += states
+    if before is not None:
+        where.append("job_id < ?")
+        params.append(before)
+    sql = f"SELECT {_COLUMNS} FROM ingest_jobs"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY job_id {'ASC' if oldest_first else 'DESC'} LIMIT ?"
+    with read_connection() as con:
+        return [_job(row) for row in con.execute(sql, (*params, limit)).fetchall()]
+
+
+def mark_running(job_id: int) -> bool:
+    """queued -> running; False if the job was cancelled in the meantime."""
+    with write_connection() as con:
+        cur = con.execute(
+            "UPDATE ingest_jobs SET state = 'running', attempts = attempts + 1, started_ts = ?, error = NULL "
+            "WHERE job_id = ? AND state = 'queued'",
+            (_now_ms(), job_id),
+        )
+        return cur.rowcount == 1
+
+
+def mark_finished(job_id: int, state: str, result: dict | None = None, error: str | None = None):
+    with write_connection() as con:
+        con.execute(
+            "UPDATE ingest_jobs SET state = ?, finished_ts = ?, result = ?, error = ? WHERE job_id = ?",
+            (state, _now_ms(), json.dumps(result) if result is not None else None, error, job_id),
+        )
+
+
+def cancel_queued(job_id: int) -> bool:
+    with write_connection() as con:
+        cur = con.execute(
+            "UPDATE ingest_jobs SET state = 'cancelled', finished_ts = ? WHERE job_id = ? AND state = 'queued'",
+            (_now_ms(), job_id),
+        )
+        return cur.rowcount == 1
+
+
+def requeue_interrupted(live: set[int]) -> list[int]:
+    """
+    Queue again the jobs left "running" by a process that died, except those in
+    `live` (running here). Past MAX_ATTEMPTS they are failed instead.
+    """
+    with write_connection() as con:
+        cur = con.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            rows = cur.execute("SELECT job_id, attempts FROM ingest_jobs WHERE state = 'running'").fetchall()
+            requeued = []
+            for job_id, attempts in rows:
+                if job_id in live:
+                    continue
+                if attempts >= MAX_ATTEMPTS:
+                    cur.execute(
+                        "UPDATE ingest_jobs SET state = 'failed', finished_ts = ?, error = 'interrupted' WHERE job_id = ?",
+                        (_now_ms(), job_id),
+                    )
+                else:
+                    cur.execute("UPDATE ingest_jobs SET state = 'queued' WHERE job_id = ?", (job_id,))
+                    requeued.append(job_id)
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+    return requeued
+
+
+def record_batch(cur, job_id: int | None, count: int, checkpoint: str | None):
+    """Called inside a writer's batch transaction."""
+    if job_id is None or not count:
+        return
+    cur.execute(
+        "UPDATE ingest_jobs SET done = done + ?, checkpoint = COALESCE(?, checkpoint) WHERE job_id = ?",
+        (count, checkpoint, job_id),
+    )
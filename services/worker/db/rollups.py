@@ -0,0 +1,88 @@
+# services/worker/db/rollups.py
+"""
+daily_volume: messages and bytes per (sender, UTC day), with the sender's
+domain alongside. The ingest writer keeps it current (add_volume on insert,
+remove_volume before an update or delete), so /insights/timeline reads at
+most one row per sender-day instead of scanning emails.
+"""
+from contextlib import closing
+from typing import Iterable
+
+from .connection import connect
+
+DAY_MS = 86_400_000
+
+# floor(date_ms / DAY_MS) in SQL, which truncates; matches Python's // for dates before 1970
+_DAY_SQL = f"(date_ms / {DAY_MS} - (date_ms % {DAY_MS} < 0))"
+_DOMAIN_SQL = "(CASE WHEN INSTR(from_norm, '@') THEN SUBSTR(from_norm, LENGTH(RTRIM(from_norm, REPLACE(from_norm, '@', ''))) + 1) ELSE '' END)"
+
+_VOLUME_UPSERT = """
+    INSERT INTO daily_volume (sender, day, sender_domain, count, bytes)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(sender, day) DO UPDATE SET
+        count = count + excluded.count,
+        bytes = bytes + excluded.bytes
+"""
+
+
+def sender_domain(sender: str) -> str:
+    return sender.rpartition("@")[2] if "@" in sender else ""
+
+
+def _grouped(rows: Iterable[tuple[str | None, int | None, int | None]]) -> dict[tuple[str, int], list[int]]:
+    totals: dict[tuple[str, int], list[int]] = {}
+    for sender, date_ms, size in rows:
+        if not sender or date_ms is None:
+            continue
+        entry = totals.setdefault((sender, date_ms // DAY_MS), [0, 0])
+        entry[0] += 1
+        entry[1] += size or 0
+    return totals
+
+
+def add_volume(cur, rows: Iterable[tuple[str | None, int | None, int | None]]):
+    """Fold newly stored (from_norm, date_ms, size_bytes) triples into daily_volume."""
+    totals = _grouped(rows)
+    if totals:
+        cur.executemany(
+            _VOLUME_UPSERT,
+            [(sender, day, sender_domain(sender), count, size) for (sender, day), (count, size) in totals.items()],
+        )
+
+
+def remove_volume(cur, rows: Iterable[tuple[str | None, int | None, int | None]]):
+    """Take back the contribution of emails about to be updated or deleted."""
+    totals = _grouped(rows)
+    if not totals:
+        return
+    params = [(count, size, sender, day) for (sender, day), (count, size) in totals.items()]
+    cur.executemany(
+        "UPDATE daily_volume SET count = count - ?, bytes = bytes - ? WHERE sender = ? AND day = ?", params
+    )
+    cur.executemany(
+        "DELETE FROM daily_volume WHERE sender = ? AND day = ? AND count <= 0",
+        [(sender, day) for _, _, sender, day in params],
+    )
+
+
+def rebuild_daily_volume(con) -> int:
+    cur = con.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    cur.execute("DELETE FROM daily_volume")
+    cur.execute(
+        f"""
+        INSERT INTO daily_volume (sender, day, sender_domain, count, bytes)
+        SELECT from_norm, {_DAY_SQL}, {_DOMAIN_SQL}, COUNT(*), IFNULL(SUM(size_bytes), 0)
+        FROM emails
+        WHERE from_norm IS NOT NULL AND from_norm <> '' AND date_ms IS NOT NULL
+        GROUP BY from_norm, {_DAY_SQL}
+        """
+    )
+    con.commit()
+    return cur.execute("SELECT COUNT(*) FROM daily_volume").fetchone()[0]
+
+
+if __name__ == "__main__":
+    with closing(connect(write=True)) as con:
+        count = rebuild_daily_volume(con)
+    print("Rebuilt daily_volume:", count, "sender-days")
@@ -7,37 +7,162 @@ CREATE TABLE IF NOT EXISTS emails (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   source TEXT,                 -- 'emlx' | 'mbox' | 'imap' | 'gmail'
   source_uid TEXT,             -- path/UID/gmail_id (dedupe key)
-  message_id TEXT,             -- RFC Message-ID
+  message_id TEXT,             -- RFC Message-ID, as "<id>"
   date_ts INTEGER,             -- unix ms
+  date_ms INTEGER,             -- date_ts, guaranteed ms (older imports stored seconds)
   from_name TEXT,
   from_email TEXT,
+  from_norm TEXT,              -- lower(trim(from_email))
   to_json TEXT,                -- JSON array
   cc_json TEXT,                -- JSON array
   subject TEXT,
   snippet TEXT,
-  body_text TEXT,
-  body_hash TEXT,              -- sha256 of normalized text
+  body_text TEXT,              -- NULL once the body is in `bodies`; set only by older versions
+  body_hash TEXT,              -- sha256 of normalized text, key into bodies
   size_bytes INTEGER,
-  has_attach INTEGER DEFAULT 0
+  has_attach INTEGER DEFAULT 0,
+  recipient_count INTEGER,     -- distinct addresses across To + Cc
+  pipeline_state INTEGER NOT NULL DEFAULT 1, -- 0 = headers only (body/FTS pending), 1 = complete
+  in_reply_to TEXT,            -- first Message-ID of In-Reply-To
+  ref_ids TEXT,                -- References Message-IDs, space separated, oldest first
+  thread_id INTEGER            -- threads.thread_id (see db/threads.py)
 );
 CREATE UNIQUE INDEX IF NOT EXISTS ux_emails_source_uid ON emails(source, source_uid);
 CREATE INDEX IF NOT EXISTS ix_emails_date ON emails(date_ts DESC, id DESC);
-CREATE INDEX IF NOT EXISTS ix_emails_from ON emails(from_email);
+CREATE INDEX IF NOT EXISTS ix_emails_from_date ON emails(from_email, date_ms);
+CREATE INDEX IF NOT EXISTS ix_emails_from_norm ON emails(from_norm, date_ms DESC);
+CREATE INDEX IF NOT EXISTS ix_emails_rcpt_count ON emails(recipient_count, date_ts DESC, id DESC);
+CREATE INDEX IF NOT EXISTS ix_emails_body_pending ON emails(id) WHERE pipeline_state = 0;
+CREATE INDEX IF NOT EXISTS ix_emails_body_hash ON emails(body_hash);
+CREATE INDEX IF NOT EXISTS ix_emails_thread ON emails(thread_id, date_ms);
 
+-- Each distinct body once, compressed (see db/bodies.py, db/codec.py)
+CREATE TABLE IF NOT EXISTS bodies (
+  hash TEXT PRIMARY KEY,       -- emails.body_hash
+  codec TEXT NOT NULL,         -- 'raw' | 'zlib' | 'zstd'
+  raw_bytes INTEGER NOT NULL,  -- utf-8 size before compression
+  data BLOB NOT NULL
+);
+
+-- Email text as search sees it; inflate_body() is registered by db/connection.py
+CREATE VIEW IF NOT EXISTS email_text AS
+  SELECT e.id AS id,
+         e.subject AS subject,
+         CASE WHEN b.data IS NULL THEN e.body_text ELSE inflate_body(b.codec, b.data) END AS body_text
+  FROM emails e
+  LEFT JOIN bodies b ON b.hash = e.body_hash;
+
+-- One row per distinct recipient address of an email (To wins over Cc)
+CREATE TABLE IF NOT EXISTS email_recipients (
+  email_id INTEGER NOT NULL REFERENCES emails(id) ON DELETE CASCADE,
+  address TEXT NOT NULL,
+  kind TEXT NOT NULL,          -- 'to' | 'cc'
+  PRIMARY KEY (email_id, address)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_rcpt_address ON email_recipients(address, email_id);
+
+-- One row per MIME part with a filename, written by the ingest writer
 CREATE TABLE IF NOT EXISTS attachments (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   email_id INTEGER REFERENCES emails(id) ON DELETE CASCADE,
   filename TEXT,
   mime_major TEXT,
   mime_minor TEXT,
-  bytes INTEGER,
-  sha256 TEXT
+  bytes INTEGER,               -- decoded size
+  sha256 TEXT                  -- of the decoded payload, NULL if empty
 );
 CREATE INDEX IF NOT EXISTS ix_att_email ON attachments(email_id);
-CREATE INDEX IF NOT EXISTS ix_att_mime ON attachments(mime_major, mime_minor);
+CREATE INDEX IF NOT EXISTS ix_att_mime_bytes ON attachments(mime_major, mime_minor, bytes);
+CREATE INDEX IF NOT EXISTS ix_att_bytes ON attachments(bytes DESC, id DESC);
+CREATE INDEX IF NOT EXISTS ix_att_sha ON attachments(sha256, bytes) WHERE sha256 IS NOT NULL;
 
--- Full-text search
+-- Full-text search over email_text (external content, see db/fts.py).
+-- Only rows with pipeline_state = 1 are indexed.
 CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
-  subject, body, content='',
+  subject, body_text,
+  content='email_text', content_rowid='id',
   tokenize='porter unicode61'
-);
\ No newline at end of file
+);
+
+-- Conversation threading (see db/threads.py). One node per Message-ID seen on
+-- an email or referenced by one; nodes of a thread form a tree via parent_key.
+CREATE TABLE IF NOT EXISTS thread_nodes (
+  message_key TEXT PRIMARY KEY,
+  parent_key TEXT,
+  thread_id INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_thread_nodes_thread ON thread_nodes(thread_id, parent_key);
+
+CREATE TABLE IF NOT EXISTS threads (
+  thread_id INTEGER PRIMARY KEY,
+  root_key TEXT NOT NULL,      -- Message-ID of the root, which may be only referenced
+  root_email_id INTEGER,       -- the root's email, NULL while we don't have it
+  subject TEXT,                -- of the root email, else of the oldest one
+  message_count INTEGER NOT NULL DEFAULT 0,
+  first_ts INTEGER,            -- unix ms
+  latest_ts INTEGER            -- unix ms
+);
+CREATE INDEX IF NOT EXISTS ix_threads_latest ON threads(latest_ts DESC, thread_id DESC);
+
+-- Ingest job queue (see db/jobs.py, ingest/runner.py). Survives restarts: jobs
+-- found "running" at startup were cut short and are queued again.
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+  job_id INTEGER PRIMARY KEY,
+  kind TEXT NOT NULL,          -- emlx | mbox | bodies | attachments | thread_headers
+  path TEXT NOT NULL DEFAULT '',
+  options TEXT NOT NULL DEFAULT '{}',  -- JSON: workers, batch_size, prune, headers_first, ...
+  state TEXT NOT NULL DEFAULT 'queued',  -- queued | running | done | failed | cancelled
+  attempts INTEGER NOT NULL DEFAULT 0,
+  done INTEGER NOT NULL DEFAULT 0,     -- messages committed, over all attempts
+  checkpoint TEXT,             -- source_uid (or email id) of the last committed message
+  created_ts INTEGER NOT NULL, -- unix ms
+  started_ts INTEGER,
+  finished_ts INTEGER,
+  result TEXT,                 -- JSON result of the last attempt
+  error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_ingest_jobs_state ON ingest_jobs(state, job_id);
+
+-- Messages and bytes per sender and UTC day, maintained by the ingest writer (see db/rollups.py)
+CREATE TABLE IF NOT EXISTS daily_volume (
+  sender TEXT NOT NULL,          -- emails.from_norm
+  day INTEGER NOT NULL,          -- floor(date_ms / 86400000): days since 1970-01-01 UTC
+  sender_domain TEXT NOT NULL,   -- after the last '@' of sender, '' without one
+  count INTEGER NOT NULL,
+  bytes INTEGER NOT NULL,        -- sum of size_bytes
+  PRIMARY KEY (sender, day)
+) WITHOUT ROWID;
+-- covering, so a domain's or the whole mailbox's timeline never touches the table
+CREATE INDEX IF NOT EXISTS ix_daily_volume_domain ON daily_volume(sender_domain, day, count, bytes);
+CREATE INDEX IF NOT EXISTS ix_daily_volume_day ON daily_volume(day, count, bytes);
+
+-- Folders kept in sync by watch mode (ingest/watch.py)
+CREATE TABLE IF NOT EXISTS watched_sources (
+  source TEXT NOT NULL,        -- emlx
+  path TEXT NOT NULL,
+  created_ts INTEGER NOT NULL, -- unix ms
+  PRIMARY KEY (source, path)
+) WITHOUT ROWID;
+
+-- Per-file state from the last ingest, lets re-runs skip unchanged files
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+  source TEXT NOT NULL,
+  source_uid TEXT NOT NULL,    -- same key as emails.source_uid
+  mtime_ns INTEGER,
+  size_bytes INTEGER,
+  fingerprint TEXT,            -- sha256 of the raw message bytes
+  PRIMARY KEY (source, source_uid)
+) WITHOUT ROWID;
+
+-- Per-sender aggregates maintained by the ingest writer (see db/aggregates.py)
+CREATE TABLE IF NOT EXISTS sender_stats (
+  from_email TEXT PRIMARY KEY,            -- as stored in emails.from_email
+  address_norm TEXT NOT NULL COLLATE NOCASE,  -- lower(trim(from_email)), for prefix LIKE
+  total_emails INTEGER NOT NULL DEFAULT 0,
+  first_ts INTEGER,                       -- unix ms
+  latest_ts INTEGER                       -- unix ms
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_sender_stats_total ON sender_stats(total_emails DESC, latest_ts DESC, from_email);
+CREATE INDEX IF NOT EXISTS ix_sender_stats_count_latest ON sender_stats(total_emails, latest_ts DESC);
+CREATE INDEX IF NOT EXISTS ix_sender_stats_latest ON sender_stats(latest_ts DESC);
+CREATE INDEX IF NOT EXISTS ix_sender_stats_norm ON sender_stats(address_norm);
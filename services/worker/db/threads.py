@@ -0,0 +1,218 @@
+# services/worker/db/threads.py
+"""
+Incremental conversation threading, after JWZ (https://www.jwz.org/doc/threading.html).
+
+Every Message-ID seen on an email or in its In-Reply-To/References gets a
+node in thread_nodes, with the parent the headers claim for it; ids only
+ever referenced stay as ghost nodes. A thread is a connected set of nodes:
+when an email links two threads (say a reply that arrived before its
+parent), the smaller is folded into the larger. threads holds the
+per-thread root and counts, refreshed for the threads a batch touched.
+
+Unlike full JWZ there is no subject-based grouping; only headers link
+messages.
+"""
+from contextlib import closing
+import re
+from typing import Iterable, NamedTuple
+
+from .connection import connect
+
+_MESSAGE_ID = re.compile(r"<[^<>\s]+>")
+_NO_MESSAGE_ID = "<email-{}@maillens.invalid>"
+MAX_PARENT_WALK = 1_000  # guards the loop check against pathological chains
+
+
+class ThreadInput(NamedTuple):
+    email_id: int
+    message_id: str
+    in_reply_to: str
+    ref_ids: str
+
+
+def message_keys(header) -> list[str]:
+    """Message-IDs in a header value, in order, as "<id>"; a bare value counts as one id."""
+    text = str(header or "").strip()
+    keys = _MESSAGE_ID.findall(text)
+    if not keys and text and " " not in text:
+        keys = [f"<{text.strip('<>')}>"]
+    return keys
+
+
+def _own_key(email: ThreadInput) -> str:
+    keys = message_keys(email.message_id)
+    # emails without a Message-ID can't be replied to; give them a node of their own
+    return keys[0] if keys else _NO_MESSAGE_ID.format(email.email_id)
+
+
+def _nodes(cur, keys: list[str]) -> dict[str, tuple[str | None, int]]:
+    placeholders = ", ".join("?" for _ in keys)
+    cur.execute(f"SELECT message_key, parent_key, thread_id FROM thread_nodes WHERE message_key IN ({placeholders})", keys)
+    return {key: (parent, thread_id) for key, parent, thread_id in cur.fetchall()}
+
+
+def _is_ancestor(cur, node: str, of: str) -> bool:
+    """True if `node` is `of` or one of its ancestors."""
+    current = of
+    for _ in range(MAX_PARENT_WALK):
+        if current is None:
+            return False
+        if current == node:
+            return True
+        row = cur.execute("SELECT parent_key FROM thread_nodes WHERE message_key = ?", (current,)).fetchone()
+        current = row[0] if row else None
+    return True
+
+
+def _set_parent(cur, child: str, parent: str, replace: bool):
+    if child == parent:
+        return
+    row = cur.execute("SELECT parent_key FROM thread_nodes WHERE message_key = ?", (child,)).fetchone()
+    current = row[0] if row else None
+    if current == parent or (current is not None and not replace):
+        return
+    # a parent that descends from child would close a loop
+    if _is_ancestor(cur, child, parent):
+        return
+    cur.execute("UPDATE thread_nodes SET parent_key = ? WHERE message_key = ?", (parent, child))
+
+
+def _merge(cur, thread_ids: set[int]) -> int:
+    """Fold thread_ids into the one with the most messages; returns the survivor."""
+    if len(thread_ids) == 1:
+        return next(iter(thread_ids))
+    placeholders = ", ".join("?" for _ in thread_ids)
+    cur.execute(
+        f"SELECT thread_id FROM threads WHERE thread_id IN ({placeholders}) "
+        f"ORDER BY message_count DESC, thread_id LIMIT 1",
+        tuple(thread_ids),
+    )
+    row = cur.fetchone()
+    keep = row[0] if row else min(thread_ids)
+    others = tuple(t for t in thread_ids if t != keep)
+    placeholders = ", ".join("?" for _ in others)
+    cur.execute(f"UPDATE thread_nodes SET thread_id = ? WHERE thread_id IN ({placeholders})", (keep, *others))
+    cur.execute(f"UPDATE emails SET thread_id = ? WHERE thread_id IN ({placeholders})", (keep, *others))
+    cur.execute(f"DELETE FROM threads WHERE thread_id IN ({placeholders})", others)
+    return keep
+
+
+def thread_emails(cur, emails: Iterable[ThreadInput]):
+    """Link stored emails into threads and refresh every thread they touched."""
+    touched: set[int] = set()
+    for email in emails:
+        key = _own_key(email)
+        chain: list[str] = []
+        for ref in message_keys(email.ref_ids) + message_keys(email.in_reply_to)[:1]:
+            if ref != key and ref not in chain:
+                chain.append(ref)
+        keys = chain + [key]
+
+        existing = _nodes(cur, keys)
+        thread_ids = {thread_id for _, thread_id in existing.values()}
+        if thread_ids:
+            thread_id = _merge(cur, thread_ids)
+        else:
+            cur.execute("INSERT INTO threads (root_key, message_count) VALUES (?, 0)", (key,))
+            thread_id = cur.lastrowid
+        cur.executemany(
+            "INSERT INTO thread_nodes (message_key, parent_key, thread_id) VALUES (?, NULL, ?)",
+            [(k, thread_id) for k in keys if k not in existing],
+        )
+
+        # References lists ancestors oldest first; fill in links nobody has claimed yet
+        for parent, child in zip(chain, chain[1:]):
+            _set_parent(cur, child, parent, replace=False)
+        if chain:
+            # an email's own headers are the best word on its parent
+            _set_parent(cur, key, chain[-1], replace=True)
+
+        old = cur.execute("SELECT thread_id FROM emails WHERE id = ?", (email.email_id,)).fetchone()
+        if old is not None and old[0] is not None and old[0] != thread_id:
+            touched.add(old[0])
+        cur.execute("UPDATE emails SET thread_id = ? WHERE id = ?", (thread_id, email.email_id))
+        touched.add(thread_id)
+    refresh_threads(cur, touched)
+
+
+def refresh_threads(cur, thread_ids: Iterable[int]):
+    """Recompute root and counts; threads left with no emails are dropped (their nodes stay)."""
+    for thread_id in {t for t in thread_ids if t is not None}:
+        cur.execute(
+            "SELECT COUNT(*), MIN(date_ms), IFNULL(MAX(date_ms), 0) FROM emails WHERE thread_id = ?",
+            (thread_id,),
+        )
+        count, first_ts, latest_ts = cur.fetchone()
+        if not count:
+            cur.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+            continue
+        # the root is a node without a parent; prefer one we hold an email for, then the oldest
+        roots = [row[0] for row in cur.execute(
+            "SELECT message_key FROM thread_nodes WHERE thread_id = ? AND parent_key IS NULL ORDER BY message_key",
+            (thread_id,),
+        )]
+        root_key, root_email_id = (roots[0] if roots else None), None
+        if roots:
+            placeholders = ", ".join("?" for _ in roots)
+            row = cur.execute(
+                f"""
+                SELECT id FROM emails
+                WHERE thread_id = ?
+                  AND (message_id IN ({placeholders}) OR printf(?, id) IN ({placeholders}))
+                ORDER BY date_ms, id LIMIT 1
+                """,
+                (thread_id, *roots, _NO_MESSAGE_ID.replace("{}", "%d"), *roots),
+            ).fetchone()
+            if row is not None:
+                root_email_id = row[0]
+                root_key = cur.execute(
+                    "SELECT message_id FROM emails WHERE id = ?", (root_email_id,)
+                ).fetchone()[0] or _NO_MESSAGE_ID.format(root_email_id)
+        # subject of the root email, else of the oldest one while the root is only referenced
+        row = cur.execute(
+            "SELECT subject FROM emails WHERE thread_id = ? ORDER BY id != ?, date_ms, id LIMIT 1",
+            (thread_id, root_email_id or 0),
+        ).fetchone()
+        subject = row[0] if row else None
+        cur.execute(
+            """
+            UPDATE threads
+            SET root_key = COALESCE(?, root_key), root_email_id = ?, subject = ?,
+                message_count = ?, first_ts = ?, latest_ts = ?
+            WHERE thread_id = ?
+            """,
+            (root_key, root_email_id, subject, count, first_ts, latest_ts, thread_id),
+        )
+
+
+def rebuild_threads(con, batch_size: int = 5_000) -> int:
+    """Thread every email from scratch, from the headers stored on emails."""
+    cur = con.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    cur.execute("UPDATE emails SET thread_id = NULL")
+    cur.execute("DELETE FROM thread_nodes")
+    cur.execute("DELETE FROM threads")
+    con.commit()
+    after_id = 0
+    while True:
+        cur.execute("BEGIN IMMEDIATE")
+        rows = cur.execute(
+            """
+            SELECT id, message_id, in_reply_to, ref_ids FROM emails
+            WHERE id > ? ORDER BY id LIMIT ?
+            """,
+            (after_id, batch_size),
+        ).fetchall()
+        if rows:
+            thread_emails(cur, (ThreadInput(*row) for row in rows))
+        con.commit()
+        if not rows:
+            break
+        after_id = rows[-1][0]
+    return cur.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+
+if __name__ == "__main__":
+    with closing(connect(write=True)) as con:
+        count = rebuild_threads(con)
+    print("Rebuilt threads:", count)
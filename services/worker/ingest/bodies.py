@@ -0,0 +1,313 @@
+# services/worker/ingest/bodies.py
+"""
+Second phase of a headers-first ingest: parse the bodies of rows stored with
+pipeline_state = 0, then fill body_text/snippet/body_hash and the FTS index.
+
+Progress lives in the rows themselves, so an interrupted pass simply resumes
+with whatever is still pending.
+
+fill_attachments() re-reads stored emails only to record their attachments
+(for rows written before attachments were kept); it never touches the email
+row or its index entry. fill_thread_headers() likewise reads In-Reply-To and
+References for rows stored before they were kept, then rebuilds threads.
+"""
+from threading import Event
+from time import perf_counter
+from typing import Callable, Iterator, NamedTuple
+
+from db.bodies import store_bodies
+from db.connection import read_connection, write_connection
+from db.jobs import record_batch
+from db.threads import rebuild_threads
+from utils.metrics import MESSAGES_TOTAL, StageTimings, inc
+from utils.progress import cancel, fail, finish, reset
+from .emlx import body_fields, parse_message, read_emlx, thread_headers
+from .mbox import read_mbox_message, release_maps
+from .pipeline import write_parallel, write_serial
+from .writer import COMMIT_EVERY, AttachmentRow, insert_attachments
+
+PENDING_PAGE = 1000  # ids fetched per read while listing pending rows
+
+
+class BodyUpdate(NamedTuple):
+    id: int
+    source_uid: str
+    body_text: str
+    snippet: str
+    body_hash: str | None
+    has_attach: int
+    attachments: tuple[AttachmentRow, ...] = ()
+    ok: bool = True
+
+
+class ThreadHeaders(NamedTuple):
+    id: int
+    source_uid: str
+    in_reply_to: str
+    ref_ids: str
+    ok: bool = True
+
+
+def _read_message(source: str, source_uid: str, size_bytes: int) -> bytes:
+    if source == "emlx":
+        _, raw_msg, _ = read_emlx(source_uid)
+        return raw_msg
+    if source == "mbox":
+        path, _, start = source_uid.rpartition(":")
+        return read_mbox_message(path, int(start), int(start) + size_bytes)
+    raise ValueError(f"unsupported_source: {source}")
+
+
+def parse_body(email_id: int, source: str, source_uid: str, size_bytes: int) -> BodyUpdate:
+    try:
+        fields = body_fields(parse_message(_read_message(source, source_uid, size_bytes)))
+    except (OSError, ValueError) as e:
+        # source moved or changed under us; mark the row done with an empty body
+        print(f"[ingest.bodies] {source_uid}: {e}")
+        return BodyUpdate(email_id, source_uid, "", "", None, 0, ok=False)
+    return BodyUpdate(email_id, source_uid, *fields)
+
+
+def parse_thread_headers(email_id: int, source: str, source_uid: str, size_bytes: int) -> ThreadHeaders:
+    try:
+        msg = parse_message(_read_message(source, source_uid, size_bytes), headers_only=True)
+    except (OSError, ValueError) as e:
+        print(f"[ingest.bodies] {source_uid}: {e}")
+        return ThreadHeaders(email_id, source_uid, "", "", ok=False)
+    return ThreadHeaders(email_id, source_uid, *thread_headers(msg))
+
+
+class BodyWriter:
+    """Applies BodyUpdates in one transaction per batch, indexing each body as it lands."""
+
+    source = "bodies"
+
+    def __init__(self, batch_size: int = COMMIT_EVERY, timings: StageTimings | None = None, job_id: int | None = None):
+        self.batch_size = max(1, batch_size)
+        self.timings = timings
+        self.job_id = job_id
+        self.filled = 0
+        self.failed = 0
+        self._pending: list[BodyUpdate] = []
+
+    def write(self, update: BodyUpdate):
+        self._pending.append(update)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        started = perf_counter()
+        filled = failed = 0
+        bodies = []
+        with write_connection() as con:
+            cur = con.cursor()
+            cur.execute("BEGIN")
+            try:
+                for u in batch:
+                    if not self._apply(cur, u, bodies):
+                        continue
+                    if u.ok:
+                        filled += 1
+                    else:
+                        failed += 1
+                store_bodies(cur, bodies)
+                record_batch(cur, self.job_id, len(batch), str(batch[-1].id))
+                con.commit()
+            except BaseException:
+                con.rollback()
+                raise
+        self.filled += filled
+        self.failed += failed
+        if self.timings is not None:
+            self.timings.record({"sqlite_flush": perf_counter() - started})
+            inc(MESSAGES_TOTAL, filled, source=self.source, outcome="filled")
+            inc(MESSAGES_TOTAL, failed, source=self.source, outcome="failed")
+
+    def _apply(self, cur, u: BodyUpdate, bodies: list) -> bool:
+        """Write one update; False when the row no longer needs it."""
+        if not u.ok:
+            # the source can't be read now; a row that already has a body keeps it
+            cur.execute(
+                "UPDATE emails SET pipeline_state=1 WHERE id=? AND pipeline_state=0 AND body_hash IS NOT NULL "
+                "RETURNING id",
+                (u.id,),
+            )
+            if cur.fetchone() is not None:
+                cur.execute(
+                    "INSERT INTO emails_fts(rowid, subject, body_text) SELECT id, subject, body_text FROM email_text "
+                    "WHERE id=?",
+                    (u.id,),
+                )
+                return True
+        # a concurrent re-ingest may already have replaced the row
+        cur.execute(
+            """
+            UPDATE emails SET body_text=NULL, snippet=?, body_hash=?, has_attach=?, pipeline_state=1
+            WHERE id=? AND pipeline_state=0
+            RETURNING subject
+            """,
+            (u.snippet, u.body_hash, u.has_attach, u.id),
+        )
+        updated = cur.fetchone()
+        if updated is None:
+            return False
+        bodies.append((u.body_hash, u.body_text))
+        cur.execute(
+            "INSERT INTO emails_fts(rowid, subject, body_text) VALUES(?,?,?)",
+            (u.id, updated[0], u.body_text),
+        )
+        cur.execute("DELETE FROM attachments WHERE email_id=?", (u.id,))
+        insert_attachments(cur, [(u.id, u.attachments)])
+        return True
+
+    def close(self):
+        self.flush()
+
+
+class ThreadHeaderWriter(BodyWriter):
+    """Stores ThreadHeaders on rows that have none yet; an unreadable source is stored as no headers."""
+
+    source = "thread_headers"
+
+    def _apply(self, cur, u: ThreadHeaders, bodies: list) -> bool:
+        cur.execute(
+            "UPDATE emails SET in_reply_to=?, ref_ids=? WHERE id=? AND in_reply_to IS NULL",
+            (u.in_reply_to, u.ref_ids, u.id),
+        )
+        return cur.rowcount == 1
+
+
+class AttachmentWriter(BodyWriter):
+    """Records the attachments of BodyUpdates for emails that have none yet; the rows stay as they are."""
+
+    source = "attachments"
+
+    def _apply(self, cur, u: BodyUpdate, bodies: list) -> bool:
+        if not u.ok:
+            return True  # counted as failed; nothing to record
+        if cur.execute("SELECT 1 FROM attachments WHERE email_id=? LIMIT 1", (u.id,)).fetchone():
+            return False
+        insert_attachments(cur, [(u.id, u.attachments)])
+        return True
+
+
+def pending_bodies(cur) -> int:
+    # literal 0 so the planner can use the partial index ix_emails_body_pending
+    cur.execute("SELECT COUNT(*) FROM emails WHERE pipeline_state = 0")
+    return cur.fetchone()[0]
+
+
+# stored emails that say they have attachments but have no attachment rows
+_MISSING_ATTACHMENTS = (
+    "has_attach = 1 AND pipeline_state = 1 AND NOT EXISTS (SELECT 1 FROM attachments WHERE email_id = emails.id)"
+)
+
+
+# rows stored before In-Reply-To/References were kept; ingest writes '' when a message has none
+_MISSING_THREAD_HEADERS = "in_reply_to IS NULL"
+
+
+def missing_attachments(cur) -> int:
+    cur.execute(f"SELECT COUNT(*) FROM emails WHERE {_MISSING_ATTACHMENTS}")
+    return cur.fetchone()[0]
+
+
+def _pending_tasks(where_sql: str = "pipeline_state = 0") -> Iterator[tuple]:
+    after = 0
+    while True:
+        with read_connection() as con:
+            page = con.execute(
+                f"""
+                SELECT id, source, source_uid, size_bytes FROM emails
+                WHERE {where_sql} AND id > ?
+                ORDER BY id LIMIT ?
+                """,
+                (after, PENDING_PAGE),
+            ).fetchall()
+        if not page:
+            return
+        yield from page
+        after = page[-1][0]
+
+
+def _fill(kind: str, total: int, tasks: Iterator[tuple], writer: BodyWriter, timings: StageTimings,
+          cancel_event: Event | None, workers: int, parse_fn: Callable = parse_body,
+          after: Callable[[], dict] | None = None) -> dict:
+    reset(kind, total=total)
+
+    def _result(**extra) -> dict:
+        return {"total": total, "filled": writer.filled, "failed": writer.failed, **extra,
+                "timings": timings.summary()}
+
+    try:
+        if workers > 1:
+            completed = write_parallel(tasks, parse_fn, writer, workers, cancel_event, timings)
+        else:
+            completed = write_serial(tasks, parse_fn, writer, cancel_event, timings)
+        writer.close()
+        if not completed:
+            cancel()
+            return {"ok": False, "cancelled": True, **_result()}
+        extra = after() if after is not None else {}
+        finish()
+        return {"ok": True, **_result(**extra)}
+    except Exception as e:
+        fail(str(e))
+        writer.close()
+        return {"ok": False, "error": str(e), **_result()}
+    finally:
+        # serial parses map mbox files in this process
+        release_maps()
+
+
+def fill_bodies(
+    *,
+    cancel_event: Event | None = None,
+    workers: int = 1,
+    batch_size: int = COMMIT_EVERY,
+    job_id: int | None = None,
+) -> dict:
+    with read_connection() as con:
+        total = pending_bodies(con.cursor())
+    timings = StageTimings("bodies")
+    writer = BodyWriter(batch_size=batch_size, timings=timings, job_id=job_id)
+    return _fill("bodies", total, _pending_tasks(), writer, timings, cancel_event, workers)
+
+
+def fill_attachments(
+    *,
+    cancel_event: Event | None = None,
+    workers: int = 1,
+    batch_size: int = COMMIT_EVERY,
+    job_id: int | None = None,
+) -> dict:
+    """Record attachments for stored emails that predate them (queued by the schema migration)."""
+    with read_connection() as con:
+        total = missing_attachments(con.cursor())
+    timings = StageTimings("attachments")
+    writer = AttachmentWriter(batch_size=batch_size, timings=timings, job_id=job_id)
+    return _fill("attachments", total, _pending_tasks(_MISSING_ATTACHMENTS), writer, timings, cancel_event, workers)
+
+
+def fill_thread_headers(
+    *,
+    cancel_event: Event | None = None,
+    workers: int = 1,
+    batch_size: int = COMMIT_EVERY,
+    job_id: int | None = None,
+) -> dict:
+    """Read In-Reply-To/References for stored emails that predate them, then thread everything again."""
+    with read_connection() as con:
+        total = con.execute(f"SELECT COUNT(*) FROM emails WHERE {_MISSING_THREAD_HEADERS}").fetchone()[0]
+    timings = StageTimings("thread_headers")
+    writer = ThreadHeaderWriter(batch_size=batch_size, timings=timings, job_id=job_id)
+
+    def _rethread() -> dict:
+        with write_connection() as con:
+            return {"threads": rebuild_threads(con)}
+
+    return _fill("thread_headers", total, _pending_tasks(_MISSING_THREAD_HEADERS), writer, timings, cancel_event,
+                 workers, parse_fn=parse_thread_headers, after=_rethread)
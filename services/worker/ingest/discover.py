@@ -0,0 +1,33 @@
+# services/worker/ingest/discover.py
+import os
+from typing import Iterator
+
+
+def iter_files(folder_path: str, suffix: str) -> Iterator[str]:
+    """
+    Yield files under folder_path ending in suffix as they are found.
+
+    Directories are read with os.scandir one at a time, so the first paths
+    come out long before a large (or network-mounted) tree is fully listed.
+    Entries are sorted within each directory, files before subdirectories,
+    which keeps the order deterministic between runs.
+    """
+    stack = [folder_path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.endswith(suffix) and entry.is_file():
+                    yield entry.path
+            except OSError:
+                continue
+        # pushed in reverse so subdirectories are visited in name order
+        stack.extend(reversed(subdirs))
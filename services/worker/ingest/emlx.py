@@ -1,20 +1,24 @@
-import os, json, time
+import os, json
+import binascii
+import hashlib
+import quopri
+from itertools import islice
 from email import policy
-from email.header import decode_header, make_header
-from email.parser import BytesParser
-from email.utils import getaddresses, parseaddr
+from email.parser import BytesHeaderParser, BytesParser
+from functools import partial
 from pathlib import Path
-from dateutil import parser as dateparse
-from db.connection import connect
+from db.connection import read_connection
+from db.threads import message_keys
+from utils.metrics import StageTimings, stage
 from utils.text import html_to_text, sha256_text
-from utils.progress import cancel, reset, step, finish, fail
+from .discover import iter_files
+from .headers import address_list, date_to_ms, decode_header, first_address, header_to_str
+from .manifest import ManifestEntry, fingerprint_bytes, load_manifest, missing_paths, plan_files
+from .pipeline import write_parallel, write_serial
+from .writer import COMMIT_EVERY, AttachmentRow, EmailRow, EmailWriter
+from utils.progress import cancel, discovered, discovery_complete, reset, finish, fail
 from threading import Event
 
-def _to_ms(dt: str | None) -> int:
-    if not dt: return int(time.time() * 1000)
-    try: return int(dateparse.parse(dt).timestamp() * 1000)
-    except Exception: return int(time.time() * 1000)
-
 def _decode_part_text(part) -> tuple[str, str]:
     payload = part.get_payload(decode=True)
     charset = part.get_content_charset() or "utf-8"
@@ -31,171 +35,289 @@ def _decode_part_text(part) -> tuple[str, str]:
             text = payload.decode("utf-8", errors="replace")
     return part.get_content_type(), text
 
-def _extract_body(msg):
+_HASH_CHUNK = 64 * 1024  # characters of transfer-encoded payload decoded at a time
+_UUENCODE = frozenset({"x-uuencode", "uuencode", "uue", "x-uue"})
+
+
+def _payload_bytes(text: str) -> bytes:
+    # compat32 keeps undecodable 8-bit bytes as surrogates
+    try:
+        return text.encode("ascii", "surrogateescape")
+    except UnicodeError:
+        return text.encode("raw-unicode-escape")
+
+
+def _iter_decoded(part):
+    """
+    Yield a leaf part's decoded payload in chunks, as get_payload(decode=True)
+    would return it in one piece, without building the whole bytes object.
+    """
+    payload = part.get_payload()
+    if not isinstance(payload, str):
+        return
+    cte = str(part.get("content-transfer-encoding", "")).strip().lower()
+    if cte in _UUENCODE:
+        yield part.get_payload(decode=True)  # rare enough to decode in one piece
+    elif cte == "base64":
+        carry = ""
+        for start in range(0, len(payload), _HASH_CHUNK):
+            chunk = carry + "".join(payload[start:start + _HASH_CHUNK].split())
+            usable = len(chunk) - len(chunk) % 4
+            carry = chunk[usable:]
+            if usable:
+                try:
+                    yield binascii.a2b_base64(chunk[:usable])
+                except binascii.Error:
+                    # same leniency as get_payload(decode=True): undecodable base64 is dropped
+                    return
+        if carry.strip("="):
+            try:
+                yield binascii.a2b_base64(carry + "=" * (-len(carry) % 4))
+            except binascii.Error:
+                pass
+    elif cte == "quoted-printable":
+        start = 0
+        while start < len(payload):
+            # cut after a newline so no =XX escape or soft break is split
+            end = payload.rfind("\n", start, start + _HASH_CHUNK) + 1 or min(len(payload), start + _HASH_CHUNK)
+            if end <= start:
+                end = min(len(payload), start + _HASH_CHUNK)
+            yield quopri.decodestring(_payload_bytes(payload[start:end]))
+            start = end
+    else:
+        for start in range(0, len(payload), _HASH_CHUNK):
+            yield _payload_bytes(payload[start:start + _HASH_CHUNK])
+
+
+def _attachment(part) -> AttachmentRow:
+    with stage("attachment_hash"):
+        size = 0
+        digest = hashlib.sha256()
+        for chunk in _iter_decoded(part):
+            size += len(chunk)
+            digest.update(chunk)
+    return AttachmentRow(
+        filename=decode_header(part.get_filename()),
+        mime_major=part.get_content_maintype(),
+        mime_minor=part.get_content_subtype(),
+        bytes=size,
+        sha256=digest.hexdigest() if size else None,
+    )
+
+
+def _walk(msg) -> tuple[str, list[AttachmentRow]]:
+    """Body text and attachments from a single traversal of the MIME tree."""
     # prefer text/plain; fallback to text/html converted
     plain_segments = []
     html_segments = []
-    if msg.is_multipart():
-        for part in msg.walk():
-            if part.get_content_maintype() == "multipart":
-                continue
-            ctype, text = _decode_part_text(part)
-            if ctype == "text/plain":
-                plain_segments.append(text.strip())
-            elif ctype == "text/html":
-                html_segments.append(html_to_text(text))
-    else:
-        ctype, text = _decode_part_text(msg)
-        if ctype == "text/html":
-            html_segments.append(html_to_text(text))
-        else:
+    attachments = []
+    for part in msg.walk():
+        if part.get_filename():
+            attachments.append(_attachment(part))
+        if part.is_multipart():
+            continue
+        ctype, text = _decode_part_text(part)
+        if ctype == "text/plain" or (part is msg and ctype != "text/html"):
             plain_segments.append(text.strip())
+        elif ctype == "text/html":
+            with stage("html_to_text"):
+                html_segments.append(html_to_text(text))
     body = "\n".join(filter(None, plain_segments)) or "\n".join(filter(None, html_segments))
-    return body
-
-def _header_to_str(value) -> str:
-    if value is None:
-        return ""
-    if isinstance(value, str):
-        return value
-    if isinstance(value, (list, tuple)):
-        return ", ".join(filter(None, (_header_to_str(v) for v in value)))
-    raw = getattr(value, "value", None)
-    if isinstance(raw, str):
-        return raw
-    try:
-        return str(value)
-    except Exception:
-        return ""
+    return body, attachments
 
-def _decode_header(value: str | None) -> str:
-    if not value:
-        return ""
-    try:
-        return str(make_header(decode_header(str(value))))
-    except Exception:
-        return str(value)
-
-def _first_address(headers) -> tuple[str, str]:
-    header_strings = [_header_to_str(h) for h in headers]
-    for name, addr in getaddresses(header_strings):
-        clean_addr = addr.strip()
-        if clean_addr:
-            return _decode_header(name), clean_addr
-    if header_strings:
-        parsed_name, parsed_addr = parseaddr(header_strings[0])
-        parsed_addr = parsed_addr.strip()
-        if parsed_addr:
-            return _decode_header(parsed_name), parsed_addr
-        return ("", header_strings[0].strip())
-    return ("", "")
-
-def _address_list(headers) -> list[str]:
-    header_strings = [_header_to_str(h) for h in headers]
-    seen: list[str] = []
-    for _, addr in getaddresses(header_strings):
-        clean = addr.strip()
-        if clean and clean not in seen:
-            seen.append(clean)
-    if not seen and header_strings:
-        fallback = header_strings[0].strip()
-        if fallback:
-            seen.append(fallback)
-    return seen
-
-def ingest_emlx_folder(folder_path: str, *, limit: int | None = None, cancel_event: Event | None = None) -> dict:
+def read_emlx(path: str) -> tuple[bytes, bytes, str]:
+    """Returns (file bytes, message bytes, fingerprint) for an .emlx file."""
+    with stage("read"):
+        raw = Path(path).read_bytes()
+    with stage("fingerprint"):
+        try:
+            first_line, rest = raw.split(b"\n", 1)
+            if first_line.strip().isdigit():
+                raw_msg = rest
+                # the length prefix excludes Apple's plist trailer, whose flags change on read
+                fingerprint = fingerprint_bytes(rest[:int(first_line.strip())])
+            else:
+                raw_msg = raw
+                fingerprint = fingerprint_bytes(raw)
+        except ValueError:
+            raw_msg = raw
+            fingerprint = fingerprint_bytes(raw)
+    return raw, raw_msg, fingerprint
+
+def parse_message(raw_msg: bytes, headers_only: bool = False):
+    parser = BytesHeaderParser if headers_only else BytesParser
+    with stage("header_parse" if headers_only else "mime_parse"):
+        return parser(policy=policy.compat32).parsebytes(raw_msg)
+
+def parse_emlx(
+    path: str,
+    mtime_ns: int = 0,
+    known_fingerprint: str | None = None,
+    headers_only: bool = False,
+) -> EmailRow | ManifestEntry:
+    raw, raw_msg, fingerprint = read_emlx(path)
+
+    if known_fingerprint is not None and fingerprint == known_fingerprint:
+        return ManifestEntry("emlx", path, mtime_ns, len(raw), fingerprint)
+
+    return message_to_row(
+        parse_message(raw_msg, headers_only),
+        source="emlx",
+        source_uid=path,
+        size_bytes=len(raw),
+        headers_only=headers_only,
+        mtime_ns=mtime_ns,
+        fingerprint=fingerprint,
+        replace=known_fingerprint is not None,
+    )
+
+def body_fields(msg) -> tuple[str, str, str, int, tuple[AttachmentRow, ...]]:
+    """(body_text, snippet, body_hash, has_attach, attachments) for a fully parsed message."""
+    # extract_body includes html_to_text and attachment_hash, which are also timed on their own
+    with stage("extract_body"):
+        body_text, attachments = _walk(msg)
+        body_text = (body_text or "").strip()
+    snippet = (body_text[:200] + "…") if len(body_text) > 200 else body_text
+    with stage("body_hash"):
+        body_hash = sha256_text(body_text)
+    return body_text, snippet, body_hash, 1 if attachments else 0, tuple(attachments)
+
+def thread_headers(msg) -> tuple[str, str]:
+    """(in_reply_to, ref_ids) as db/threads.py links them: the first In-Reply-To id, all References ids."""
+    in_reply_to = next(iter(message_keys(header_to_str(msg.get("In-Reply-To")))), "")
+    ref_ids = " ".join(message_keys(header_to_str(msg.get("References"))))
+    return in_reply_to, ref_ids
+
+def message_to_row(
+    msg,
+    *,
+    source: str,
+    source_uid: str,
+    size_bytes: int,
+    headers_only: bool = False,
+    **extra,
+) -> EmailRow:
+    if headers_only:
+        # msg came from BytesHeaderParser; ingest/bodies.py fills these in later
+        body_text, snippet, body_hash, has_attach, attachments = "", "", None, 0, ()
+    else:
+        body_text, snippet, body_hash, has_attach, attachments = body_fields(msg)
+    with stage("date_parse"):
+        date_ms = date_to_ms(str(msg.get("Date") or ""))
+
+    with stage("headers"):
+        raw_from = msg.get_all("From", [])
+        from_name, from_email = first_address(raw_from)
+        if not from_email and raw_from:
+            from_email = str(raw_from[0]).strip()
+
+        to_addresses = address_list(msg.get_all("To", []))
+        cc_addresses = address_list(msg.get_all("Cc", []))
+        subject = decode_header(msg.get("Subject"))
+        message_id = str(msg.get("Message-ID") or "").strip()
+        # normalised to "<id>" so thread links (db/threads.py) match it exactly
+        message_id = next(iter(message_keys(message_id)), message_id)
+        in_reply_to, ref_ids = thread_headers(msg)
+
+    recipients: dict[str, str] = {}
+    for kind, addresses in (("to", to_addresses), ("cc", cc_addresses)):
+        for address in addresses:
+            recipients.setdefault(address, kind)
+
+    return EmailRow(
+        source=source,
+        source_uid=source_uid,
+        message_id=message_id,
+        date_ts=date_ms,
+        from_name=from_name,
+        from_email=from_email,
+        date_ms=date_ms,
+        from_norm=from_email.strip().lower(),
+        to_json=json.dumps(to_addresses, ensure_ascii=False),
+        cc_json=json.dumps(cc_addresses, ensure_ascii=False),
+        subject=subject,
+        snippet=snippet,
+        body_text=body_text,
+        body_hash=body_hash,
+        size_bytes=size_bytes,
+        has_attach=has_attach,
+        recipient_count=len(recipients),
+        pipeline_state=0 if headers_only else 1,
+        in_reply_to=in_reply_to,
+        ref_ids=ref_ids,
+        recipients=tuple(recipients.items()),
+        attachments=attachments,
+        **extra,
+    )
+
+def ingest_emlx_folder(
+    folder_path: str,
+    *,
+    limit: int | None = None,
+    cancel_event: Event | None = None,
+    workers: int = 1,
+    prune: bool = False,
+    batch_size: int = COMMIT_EVERY,
+    headers_first: bool = False,
+    job_id: int | None = None,
+) -> dict:
+    """
+    Ingest every .emlx under folder_path. With headers_first, rows are stored
+    from headers alone and fill_bodies() (ingest/bodies.py) completes them.
+    """
     if not os.path.isdir(folder_path):
         return {"ok": False, "error": "path_not_directory", "path": folder_path}
 
-    files: list[str] = []
-    for root, _, fs in os.walk(folder_path):
-        for f in fs:
-            if f.endswith(".emlx"):
-                files.append(os.path.join(root, f))
+    seen: list[str] = []
+
+    def _discover():
+        found = iter_files(folder_path, ".emlx")
+        if limit is not None and limit > 0:
+            found = islice(found, limit)
+        try:
+            for path in found:
+                seen.append(path)
+                discovered()
+                yield path
+        finally:
+            discovery_complete()
 
-    files.sort()
-    if limit is not None and limit > 0:
-        files = files[:limit]
+    reset("emlx")
+    timings = StageTimings("emlx")
+    writer = EmailWriter(batch_size=batch_size, timings=timings, job_id=job_id)
+    with read_connection() as con:
+        manifest = load_manifest(con, "emlx", folder_path)
+    counters: dict[str, int] = {}
+    tasks = plan_files(_discover(), manifest, counters)
 
-    total = len(files)
-    reset("emlx", total)
-    con = connect(write=True); cur = con.cursor()
-    cur.execute("BEGIN")
-    inserted = 0
+    def _result(**extra) -> dict:
+        return {
+            "total": len(seen),
+            "inserted": writer.inserted,
+            "updated": writer.updated,
+            "unchanged": counters.get("unchanged", 0) + writer.unchanged,
+            **extra,
+            "timings": timings.summary(),
+        }
 
+    parse_fn = partial(parse_emlx, headers_only=True) if headers_first else parse_emlx
     try:
-        for idx, path in enumerate(files, start=1):
-            if cancel_event and cancel_event.is_set():
-                con.commit()
-                con.close()
-                cancel()
-                return {"ok": False, "cancelled": True, "total": total, "inserted": inserted}
-            raw = Path(path).read_bytes()
-            try:
-                first_line, rest = raw.split(b"\n", 1)
-                if first_line.strip().isdigit():
-                    raw_msg = rest
-                else:
-                    raw_msg = raw
-            except ValueError:
-                raw_msg = raw
+        if workers > 1:
+            completed = write_parallel(tasks, parse_fn, writer, workers, cancel_event, timings)
+        else:
+            completed = write_serial(tasks, parse_fn, writer, cancel_event, timings)
+        if not completed:
+            writer.close()
+            cancel()
+            return {"ok": False, "cancelled": True, **_result()}
 
-            msg = BytesParser(policy=policy.compat32).parsebytes(raw_msg)
-
-            body_text = (_extract_body(msg) or "").strip()
-            snippet = (body_text[:200] + "…") if len(body_text) > 200 else body_text
-            date_ms = _to_ms(str(msg.get("Date") or ""))
-
-            raw_from = msg.get_all("From", [])
-            from_name, from_email = _first_address(raw_from)
-            if not from_email and raw_from:
-                from_email = str(raw_from[0]).strip()
-
-            to_addresses = _address_list(msg.get_all("To", []))
-            cc_addresses = _address_list(msg.get_all("Cc", []))
-            subject = _decode_header(msg.get("Subject"))
-            message_id = str(msg.get("Message-ID") or "").strip()
-
-            has_attach = 1 if any(p.get_filename() for p in msg.walk()) else 0
-
-            cur.execute("""
-                INSERT OR IGNORE INTO emails
-                (source, source_uid, message_id, date_ts, from_name, from_email,
-                 to_json, cc_json, subject, snippet, body_text, body_hash, size_bytes, has_attach)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                "emlx",
-                path,
-                message_id,
-                date_ms,
-                from_name,
-                from_email,
-                json.dumps(to_addresses, ensure_ascii=False),
-                json.dumps(cc_addresses, ensure_ascii=False),
-                subject,
-                snippet,
-                body_text,
-                sha256_text(body_text),
-                os.path.getsize(path),
-                has_attach
-            ))
-
-            if cur.rowcount > 0:
-                cur.execute("SELECT id FROM emails WHERE source=? AND source_uid=?", ("emlx", path))
-                rid = cur.fetchone()[0]
-                cur.execute("INSERT INTO emails_fts(rowid, subject, body) VALUES(?,?,?)",
-                            (rid, subject, body_text))
-                inserted += 1
-
-            # Optional: commit in batches to keep WAL small
-            if idx % 500 == 0:
-                con.commit()
-                cur.execute("BEGIN")
-            step(path)
+        # a limited run only saw part of the tree, so it can't tell what is gone
+        missing = missing_paths(manifest, seen) if limit is None else []
+        pruned = writer.prune("emlx", missing) if prune and missing else 0
+        writer.close()
         finish()
-        con.commit(); con.close()
-        return {"ok": True, "total": total, "inserted": inserted}
+        return {"ok": True, **_result(missing=len(missing), pruned=pruned)}
     except Exception as e:
         fail(str(e))
-        con.commit(); con.close()
-        return {"ok": False, "error": str(e), "total": total, "inserted": inserted}
+        writer.close()
+        return {"ok": False, "error": str(e), **_result()}
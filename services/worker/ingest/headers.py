@@ -0,0 +1,129 @@
+# services/worker/ingest/headers.py
+"""
+Header decoding for message_to_row.
+
+Most Date headers are plain RFC 2822 and go through email.utils; dateutil only
+sees the rest. The same From lines and encoded display names come back
+thousands of times in a mailbox, so their parsed form is memoized in bounded
+LRU caches (per process: each ingest worker keeps its own).
+"""
+from email.header import decode_header as _split_encoded, make_header
+from email.utils import getaddresses, parseaddr, parsedate_to_datetime
+from functools import lru_cache
+import time
+
+from dateutil import parser as dateparse
+
+NAME_CACHE_SIZE = 8_192
+ADDRESS_CACHE_SIZE = 8_192
+MAX_CACHED_HEADER = 1_024  # longer headers (big To/Cc lists) are rarely repeated, and costly to keep
+_QUOTING = frozenset('"()\\:;')  # quoted names, comments, route addresses and groups
+
+
+def header_to_str(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return ", ".join(filter(None, (header_to_str(v) for v in value)))
+    raw = getattr(value, "value", None)
+    if isinstance(raw, str):
+        return raw
+    try:
+        return str(value)
+    except Exception:
+        return ""
+
+
+def date_to_ms(value: str | None) -> int:
+    """Unix ms for a Date header; now when it is missing or unparseable."""
+    if not value:
+        return int(time.time() * 1000)
+    try:
+        parsed = parsedate_to_datetime(value)
+        # naive means no zone, or "-0000": leave those to dateutil, as before
+        if parsed.tzinfo is not None:
+            return int(parsed.timestamp() * 1000)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        pass
+    try:
+        return int(dateparse.parse(value).timestamp() * 1000)
+    except Exception:
+        return int(time.time() * 1000)
+
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def _decode_words(value: str) -> str:
+    try:
+        return str(make_header(_split_encoded(value)))
+    except Exception:
+        return value
+
+
+def decode_header(value) -> str:
+    """Decode RFC 2047 encoded words; plain values come back as they are."""
+    if not value:
+        return ""
+    value = str(value)
+    if "=?" not in value:
+        return value
+    return _decode_words(value) if len(value) <= MAX_CACHED_HEADER else _decode_words.__wrapped__(value)
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _cached_addresses(header: str) -> tuple[tuple[str, str], ...]:
+    return tuple(getaddresses([header]))
+
+
+def _addresses(header_strings: list[str]) -> list[tuple[str, str]]:
+    pairs: list[tuple[str, str]] = []
+    for header in header_strings:
+        if len(header) <= MAX_CACHED_HEADER:
+            pairs.extend(_cached_addresses(header))
+        elif _QUOTING.isdisjoint(header):
+            # nothing can hide a comma, so each piece is one address; those repeat
+            # across long lists even when the list as a whole never does
+            for piece in header.split(","):
+                if piece and not piece.isspace():
+                    pairs.extend(_cached_addresses(piece.strip()))
+        else:
+            pairs.extend(getaddresses([header]))
+    return pairs
+
+
+def first_address(headers) -> tuple[str, str]:
+    """(display name, address) of the first address in headers (e.g. From)."""
+    header_strings = [header_to_str(h) for h in headers]
+    for name, addr in _addresses(header_strings):
+        clean_addr = addr.strip()
+        if clean_addr:
+            return decode_header(name), clean_addr
+    if header_strings:
+        parsed_name, parsed_addr = parseaddr(header_strings[0])
+        parsed_addr = parsed_addr.strip()
+        if parsed_addr:
+            return decode_header(parsed_name), parsed_addr
+        return ("", header_strings[0].strip())
+    return ("", "")
+
+
+def address_list(headers) -> list[str]:
+    """Distinct addresses over headers (e.g. every To line), in order."""
+    header_strings = [header_to_str(h) for h in headers]
+    addresses: list[str] = []
+    seen: set[str] = set()
+    for _, addr in _addresses(header_strings):
+        clean = addr.strip()
+        if clean and clean not in seen:
+            seen.add(clean)
+            addresses.append(clean)
+    if not addresses and header_strings:
+        fallback = header_strings[0].strip()
+        if fallback:
+            addresses.append(fallback)
+    return addresses
+
+
+def cache_info() -> dict:
+    return {"names": _decode_words.cache_info()._asdict(), "addresses": _cached_addresses.cache_info()._asdict()}
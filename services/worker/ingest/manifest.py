@@ -0,0 +1,92 @@
+# services/worker/ingest/manifest.py
+import hashlib
+import os
+from typing import Iterable, Iterator, NamedTuple
+
+from utils.progress import step
+
+
+class ManifestEntry(NamedTuple):
+    """A file whose content is already stored; only its stat info needs refreshing."""
+    source: str
+    source_uid: str
+    mtime_ns: int
+    size_bytes: int
+    fingerprint: str
+
+
+class FileTask(NamedTuple):
+    path: str
+    mtime_ns: int
+    known_fingerprint: str | None  # None when the file has never been ingested
+
+
+def fingerprint_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _prefix_bounds(folder_path: str) -> tuple[str, str]:
+    # source_uids are the paths os.walk produced, so match its spelling of the root
+    prefix = os.path.join(folder_path, "")
+    # every path under the folder sorts between prefix and prefix + U+10FFFF
+    return prefix, prefix + "\U0010ffff"
+
+
+def load_manifest(con, source: str, folder_path: str) -> dict[str, tuple[int, int, str]]:
+    lo, hi = _prefix_bounds(folder_path)
+    cur = con.execute(
+        """
+        SELECT source_uid, mtime_ns, size_bytes, fingerprint
+        FROM ingest_manifest
+        WHERE source = ? AND source_uid >= ? AND source_uid < ?
+        """,
+        (source, lo, hi),
+    )
+    return {row[0]: (row[1], row[2], row[3]) for row in cur}
+
+
+def load_manifest_paths(con, source: str, paths: list[str]) -> dict[str, tuple[int, int, str]]:
+    """load_manifest for an explicit list of source_uids."""
+    manifest = {}
+    for start in range(0, len(paths), 500):
+        chunk = paths[start:start + 500]
+        cur = con.execute(
+            f"""
+            SELECT source_uid, mtime_ns, size_bytes, fingerprint
+            FROM ingest_manifest
+            WHERE source = ? AND source_uid IN ({", ".join("?" for _ in chunk)})
+            """,
+            (source, *chunk),
+        )
+        manifest.update((row[0], (row[1], row[2], row[3])) for row in cur)
+    return manifest
+
+
+def plan_files(
+    paths: Iterable[str],
+    manifest: dict[str, tuple[int, int, str]],
+    counters: dict[str, int],
+) -> Iterator[FileTask]:
+    """
+    Yield a parse task for every new or changed file.
+
+    Files whose (mtime, size) match the manifest are skipped without being
+    opened; they still advance progress so totals line up.
+    """
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            counters["vanished"] = counters.get("vanished", 0) + 1
+            step(path)
+            continue
+        known = manifest.get(path)
+        if known is not None and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            counters["unchanged"] = counters.get("unchanged", 0) + 1
+            step(path)
+            continue
+        yield FileTask(path, st.st_mtime_ns, known[2] if known else None)
+
+
+def missing_paths(manifest: dict[str, tuple[int, int, str]], seen: Iterable[str]) -> list[str]:
+    return sorted(set(manifest) - set(seen))
@@ -0,0 +1,183 @@
+# services/worker/ingest/mbox.py
+import mmap
+import os
+import re
+import threading
+from functools import partial
+from threading import Event
+from typing import Iterator
+
+from db.connection import read_connection
+from utils.metrics import StageTimings, stage
+from .emlx import message_to_row, parse_message
+from .pipeline import write_parallel, write_serial
+from .writer import COMMIT_EVERY, EmailRow, EmailWriter
+from utils.progress import cancel, discovered, discovery_complete, reset, finish, fail
+
+_SEPARATOR = b"\nFrom "
+# mboxrd quoting: a body line ">From " (with any number of '>') had one '>' added on export
+_QUOTED_FROM = re.compile(rb"^>(>*From )", re.MULTILINE)
+
+# per-thread cache so pool workers map each file once, not once per message; per
+# thread because concurrent jobs release their maps without seeing each other's
+_local = threading.local()
+
+
+def _maps() -> dict[str, mmap.mmap]:
+    maps = getattr(_local, "maps", None)
+    if maps is None:
+        maps = _local.maps = {}
+    return maps
+
+
+def _map(path: str) -> mmap.mmap:
+    maps = _maps()
+    mm = maps.get(path)
+    if mm is None or mm.closed:
+        with open(path, "rb") as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        maps[path] = mm
+    return mm
+
+
+def _release(path: str):
+    mm = _maps().pop(path, None)
+    if mm is not None:
+        mm.close()
+
+
+def release_maps():
+    for path in list(_maps()):
+        _release(path)
+
+
+def iter_message_spans(mm: mmap.mmap, start: int = 0) -> Iterator[tuple[int, int]]:
+    """
+    Yield (start, end) byte offsets of each message in an mbox.
+
+    Scans the mapping for "From " separator lines with mmap.find, so the file
+    is paged in by the OS and never copied into Python bytes as a whole.
+    """
+    size = len(mm)
+    if start >= size:
+        return
+    if mm[start:start + 5] != b"From ":
+        nxt = mm.find(_SEPARATOR, start)
+        if nxt == -1:
+            return
+        start = nxt + 1
+    while start < size:
+        nxt = mm.find(_SEPARATOR, start)
+        end = size if nxt == -1 else nxt + 1
+        yield start, end
+        start = end
+
+
+def read_mbox_message(path: str, start: int, end: int) -> bytes:
+    with stage("read"):
+        mm = _map(path)
+        # only this message's bytes are copied out of the mapping
+        raw = mm[start:end]
+        _, _, raw_msg = raw.partition(b"\n")  # drop the "From sender date" envelope line
+        return _QUOTED_FROM.sub(rb"\1", raw_msg)
+
+
+def parse_mbox_message(path: str, start: int, end: int, headers_only: bool = False) -> EmailRow:
+    msg = parse_message(read_mbox_message(path, start, end), headers_only)
+    return message_to_row(
+        msg, source="mbox", source_uid=f"{path}:{start}", size_bytes=end - start, headers_only=headers_only
+    )
+
+
+def _checkpoint_key(path: str) -> str:
+    return f"mbox_offset:{path}"
+
+
+def _checkpoint(row: EmailRow) -> tuple[str, str]:
+    path, _, offset = row.source_uid.rpartition(":")
+    return _checkpoint_key(path), str(int(offset) + row.size_bytes)
+
+
+def _resume_offset(path: str, mm: mmap.mmap) -> int:
+    with read_connection() as con:
+        row = con.execute("SELECT value FROM meta WHERE key=?", (_checkpoint_key(path),)).fetchone()
+    if row is None:
+        return 0
+    offset = int(row[0])
+    if offset == len(mm):
+        return offset  # fully ingested and nothing appended since
+    # only trust the checkpoint if it still lands on a message boundary
+    if offset > len(mm) or mm[offset:offset + 5] != b"From ":
+        return 0
+    return offset
+
+
+def _mbox_files(path: str) -> list[str]:
+    if os.path.isfile(path):
+        return [path]
+    found = []
+    for root, _, fs in os.walk(path):
+        for f in fs:
+            if f == "mbox" or f.endswith(".mbox"):
+                found.append(os.path.join(root, f))
+    return sorted(found)
+
+
+def ingest_mbox(
+    path: str,
+    *,
+    limit: int | None = None,
+    cancel_event: Event | None = None,
+    workers: int = 1,
+    batch_size: int = COMMIT_EVERY,
+    resume: bool = True,
+    headers_first: bool = False,
+    job_id: int | None = None,
+) -> dict:
+    if not os.path.exists(path):
+        return {"ok": False, "error": "path_not_found", "path": path}
+
+    files = _mbox_files(path)
+    reset("mbox")
+    timings = StageTimings("mbox")
+    writer = EmailWriter(batch_size=batch_size, checkpoint=_checkpoint, timings=timings, job_id=job_id)
+    seen = 0
+
+    def _tasks():
+        nonlocal seen
+        try:
+            for mbox_path in files:
+                mm = _map(mbox_path)
+                start = _resume_offset(mbox_path, mm) if resume else 0
+                for span in iter_message_spans(mm, start):
+                    if limit is not None and 0 < limit <= seen:
+                        return
+                    seen += 1
+                    discovered()
+                    yield (mbox_path, *span)
+        finally:
+            discovery_complete()
+
+    tasks = _tasks()
+
+    parse_fn = partial(parse_mbox_message, headers_only=True) if headers_first else parse_mbox_message
+    try:
+        if workers > 1:
+            completed = write_parallel(tasks, parse_fn, writer, workers, cancel_event, timings)
+        else:
+            completed = write_serial(tasks, parse_fn, writer, cancel_event, timings)
+        writer.close()
+        if not completed:
+            cancel()
+            return {"ok": False, "cancelled": True, "total": seen, "inserted": writer.inserted,
+                    "timings": timings.summary()}
+        finish()
+        return {"ok": True, "total": seen, "inserted": writer.inserted, "timings": timings.summary()}
+    except Exception as e:
+        fail(str(e))
+        writer.close()
+        return {"ok": False, "error": str(e), "total": seen, "inserted": writer.inserted,
+                "timings": timings.summary()}
+    finally:
+        for mbox_path in files:
+            _release(mbox_path)
@@ -0,0 +1,149 @@
+# services/worker/ingest/pipeline.py
+import multiprocessing
+import os
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from threading import Event, Thread
+from typing import Callable, Iterable
+
+from .writer import EmailWriter
+from utils.metrics import StageTimings, take_stage_times
+from utils.progress import bind, current as current_progress, step
+
+QUEUE_SIZE = 1000      # parsed rows waiting for the writer
+INFLIGHT_PER_WORKER = 8  # submitted but not yet collected parse jobs per process
+PARSE_TIMEOUT_S = float(os.environ.get("MAILLENS_PARSE_TIMEOUT_S", 120))  # per message, before the job fails
+# the worker process is multithreaded (API, jobs, watchers); forking it can copy a held
+# lock (the import lock, say) into the child, so pool processes come from a forkserver
+_POOL_CONTEXT = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+_DONE = object()
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _parse_timed(parse_fn: Callable, *task) -> tuple:
+    # runs in the pool process; its stage timings travel back with the row
+    row = parse_fn(*task)
+    return row, take_stage_times()
+
+
+class ParseTimeout(RuntimeError):
+    pass
+
+
+def _collect(future) -> tuple:
+    try:
+        return future.result(timeout=PARSE_TIMEOUT_S)
+    except FutureTimeout:
+        raise ParseTimeout(f"parse_timeout: no result from a parse process in {PARSE_TIMEOUT_S:g}s") from None
+
+
+def _stop_pool(pool: ProcessPoolExecutor, pending: deque, timed_out: bool):
+    for future in pending:
+        future.cancel()
+    if timed_out:
+        # a stuck child would block shutdown(wait=True) forever
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=not timed_out, cancel_futures=True)
+
+
+def write_serial(
+    tasks: Iterable[tuple],
+    parse_fn: Callable,
+    writer: EmailWriter,
+    cancel_event: Event | None = None,
+    timings: StageTimings | None = None,
+) -> bool:
+    """Parse and write on the calling thread. Returns False if cancelled."""
+    for task in tasks:
+        if cancel_event and cancel_event.is_set():
+            return False
+        row, times = _parse_timed(parse_fn, *task)
+        if timings is not None:
+            timings.record(times)
+        writer.write(row)
+        step(row.source_uid)
+    return True
+
+
+def write_parallel(
+    tasks: Iterable[tuple],
+    parse_fn: Callable,
+    writer: EmailWriter,
+    workers: int,
+    cancel_event: Event | None = None,
+    timings: StageTimings | None = None,
+) -> bool:
+    """
+    Parse in a process pool and write from a single thread.
+
+    Results are collected in submission order so row ids stay deterministic;
+    the bounded queue applies back-pressure when SQLite is the bottleneck.
+    Returns False if cancelled.
+    """
+    rows: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+    writer_error: list[BaseException] = []
+    stop = Event()
+    progress = current_progress()
+
+    def _drain():
+        try:
+            with bind(progress):
+                while True:
+                    item = rows.get()
+                    if item is _DONE:
+                        return
+                    row, times = item
+                    if timings is not None:
+                        timings.record(times)
+                    writer.write(row)
+                    step(row.source_uid)
+        except BaseException as exc:
+            writer_error.append(exc)
+            stop.set()
+            # unblock the producer if it is waiting on a full queue
+            while rows.get() is not _DONE:
+                pass
+
+    drain_thread = Thread(target=_drain, name="ingest-writer", daemon=True)
+    drain_thread.start()
+
+    cancelled = False
+    max_inflight = max(1, workers) * INFLIGHT_PER_WORKER
+    pending: deque = deque()
+    timed_out = False
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT)
+    try:
+        try:
+            for task in tasks:
+                if stop.is_set():
+                    break
+                if cancel_event and cancel_event.is_set():
+                    cancelled = True
+                    break
+                pending.append(pool.submit(_parse_timed, parse_fn, *task))
+                while len(pending) >= max_inflight:
+                    rows.put(_collect(pending.popleft()))
+
+            while pending and not stop.is_set():
+                if cancel_event and cancel_event.is_set():
+                    cancelled = True
+                    break
+                rows.put(_collect(pending.popleft()))
+        except ParseTimeout:
+            timed_out = True
+            raise
+        finally:
+            _stop_pool(pool, pending, timed_out)
+    finally:
+        rows.put(_DONE)
+        drain_thread.join()
+
+    if writer_error:
+        raise writer_error[0]
+    return not cancelled
@@ -1,57 +1,235 @@
 # services/worker/ingest/runner.py
+"""
+Ingest job scheduler. Jobs are rows in ingest_jobs (db/jobs.py) and run on
+background threads, up to MAX_RUNNING_JOBS at once (MAILLENS_MAX_JOBS, two
+by default); all of them write through the one shared writer connection, a
+batch at a time. Two jobs for the same source never run together, the later
+one waits in the queue.
+
+A job that was running when the worker died is queued again at the next
+startup (resume_interrupted). It then skips what its committed batches
+already stored: the manifest for .emlx, the meta offset for mbox,
+pipeline_state for the body pass, and the rows themselves for the
+attachments and thread header passes.
+"""
+import cProfile
+import os
+from pathlib import Path
 import threading
 from threading import Event, Thread
-from typing import Optional
+import time
+from typing import NamedTuple, Optional
 
+from db.jobs import (
+    ACTIVE_STATES, Job, cancel_queued, create_job, find_job, get_job, list_jobs, mark_finished, mark_running,
+    requeue_interrupted,
+)
+from utils.progress import Progress, bind
+from .bodies import fill_attachments, fill_bodies, fill_thread_headers
 from .emlx import ingest_emlx_folder
-from utils.progress import cancel as prog_cancel
+from .mbox import ingest_mbox
+from .writer import COMMIT_EVERY
+
+PROFILE_DIR = Path(__file__).resolve().parent.parent / "profiles"
+MAX_RUNNING_JOBS = int(os.environ.get("MAILLENS_MAX_JOBS", 2))
+_STORED_ROW_PASSES = ("bodies", "attachments", "thread_headers")  # jobs with no source path
+
+
+class _Live(NamedTuple):
+    job: Job
+    thread: Thread
+    cancel_event: Event
+    progress: Progress
+
 
-_current_thread: Optional[Thread] = None
-_cancel_event: Optional[Event] = None
+_lock = threading.RLock()
+_live: dict[int, _Live] = {}
+_focus: Optional[tuple[int, Progress]] = None  # latest started job, what /progress follows
+
+
+def _source_key(kind: str, path: str) -> tuple[str, str]:
+    # one pass of each kind over stored rows at a time; ingests conflict only on the same source
+    return (kind, "") if kind in _STORED_ROW_PASSES else (kind, os.path.realpath(path))
 
 
 def is_running() -> bool:
-    return _current_thread is not None and _current_thread.is_alive()
+    return bool(_live)
+
+
+def running_jobs() -> list[int]:
+    return sorted(_live)
+
+
+def source_busy(kind: str, path: str) -> bool:
+    """Whether a job for this source is queued or running."""
+    key = _source_key(kind, path)
+    return any(_source_key(job.kind, job.path) == key for job in list_jobs(states=ACTIVE_STATES, limit=1000))
+
+
+def submit(kind: str, path: str = "", dedupe_states: tuple[str, ...] = ACTIVE_STATES, **options) -> tuple[Job, bool]:
+    """
+    Queue a job; returns (job, created). A job for the same source in one of
+    dedupe_states is returned instead of adding another.
+    """
+    with _lock:
+        existing = find_job(kind, path, dedupe_states)
+        if existing is not None:
+            return existing, False
+        if options.get("profile"):
+            PROFILE_DIR.mkdir(exist_ok=True)
+            options["profile_path"] = str(PROFILE_DIR / f"ingest-{kind}-{time.strftime('%Y%m%d-%H%M%S')}.pstats")
+        job = create_job(kind, path, options)
+    _pump()
+    return get_job(job.job_id) or job, True
+
+
+def submit_emlx(path: str, workers: int = 1, prune: bool = False, batch_size: int = COMMIT_EVERY,
+                profile: bool = False, headers_first: bool = False) -> tuple[Job, bool]:
+    return submit("emlx", path, workers=workers, prune=prune, batch_size=batch_size, profile=profile,
+                  headers_first=headers_first)
+
+
+def submit_mbox(path: str, workers: int = 1, batch_size: int = COMMIT_EVERY, profile: bool = False,
+                headers_first: bool = False) -> tuple[Job, bool]:
+    return submit("mbox", path, workers=workers, batch_size=batch_size, profile=profile,
+                  headers_first=headers_first)
 
 
-def start_emlx(path: str):
-    global _current_thread, _cancel_event
-    if is_running():
-        raise RuntimeError("ingestion_already_running")
+def submit_bodies(workers: int = 1, batch_size: int = COMMIT_EVERY, profile: bool = False) -> tuple[Job, bool]:
+    """Queue the body pass over rows a headers-first ingest left pending."""
+    # a pass already running may have paged past rows stored since, so only a queued one counts
+    return submit("bodies", dedupe_states=("queued",), workers=workers, batch_size=batch_size, profile=profile)
 
-    cancel_event = Event()
-    _cancel_event = cancel_event
 
-    def _run():
+def _execute(job: Job, cancel_event: Event) -> dict:
+    options = job.options
+    common = dict(cancel_event=cancel_event, workers=options.get("workers", 1),
+                  batch_size=options.get("batch_size", COMMIT_EVERY), job_id=job.job_id)
+    if job.kind == "bodies":
+        return fill_bodies(**common)
+    if job.kind == "attachments":
+        return fill_attachments(**common)
+    if job.kind == "thread_headers":
+        return fill_thread_headers(**common)
+    headers_first = options.get("headers_first", False)
+    if job.kind == "mbox":
+        result = ingest_mbox(job.path, headers_first=headers_first, **common)
+    else:
+        result = ingest_emlx_folder(job.path, prune=options.get("prune", False), headers_first=headers_first, **common)
+    if headers_first and result.get("ok"):
+        # headers are queryable from here on; bodies and search follow as their own job
+        bodies, _ = submit_bodies(workers=common["workers"], batch_size=common["batch_size"])
+        result["bodies_job"] = bodies.job_id
+    return result
+
+
+def _run(job_id: int):
+    live = _live[job_id]
+    job = live.job
+    profile_path = job.options.get("profile_path")
+    profiler = cProfile.Profile() if profile_path else None
+    result: dict = {}
+    error = None
+    try:
+        with bind(live.progress):
+            if profiler is not None:
+                profiler.enable()
+            result = _execute(job, live.cancel_event)
+    except Exception as e:
+        error = str(e)
+        live.progress.fail(error)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"[ingest.runner] Profile written to {profile_path}")
+        if error is None and result.get("ok"):
+            state = "done"
+        elif result.get("cancelled") or live.cancel_event.is_set():
+            state = "cancelled"
+        else:
+            state = "failed"
+            error = error or result.get("error") or "failed"
+        print(f"[ingest.runner] job {job.job_id} ({job.kind}) {state}: {result or error}")
         try:
-            ingest_emlx_folder(path, cancel_event=cancel_event)
+            mark_finished(job.job_id, state, result, error)
         finally:
-            # ensure we clear references once the worker exits
-            _cleanup_ingest_thread("completed")
-
-    thread = Thread(target=_run, name="ingest-emlx", daemon=True)
-    _current_thread = thread
-    print("[ingest.runner] Starting ingest-emlx thread")
-    thread.start()
-
-
-def cancel_running():
-    global _cancel_event
-    if _cancel_event is not None:
-        _cancel_event.set()
-        prog_cancel()
-    thread = _current_thread
-    if thread and thread.is_alive():
+            with _lock:
+                _live.pop(job.job_id, None)
+            _pump()
+
+
+def _pump():
+    """Start queued jobs, oldest first, while there is room and their source is free."""
+    global _focus
+    with _lock:
+        if len(_live) >= MAX_RUNNING_JOBS:
+            return
+        busy = {_source_key(live.job.kind, live.job.path) for live in _live.values()}
+        for job in list_jobs(states=("queued",), limit=100, oldest_first=True):
+            if len(_live) >= MAX_RUNNING_JOBS:
+                break
+            key = _source_key(job.kind, job.path)
+            if key in busy or not mark_running(job.job_id):
+                continue
+            busy.add(key)
+            thread = Thread(target=_run, args=(job.job_id,), name=f"ingest-job-{job.job_id}", daemon=True)
+            progress = Progress()
+            _live[job.job_id] = _Live(get_job(job.job_id) or job, thread, Event(), progress)
+            _focus = (job.job_id, progress)
+            print(f"[ingest.runner] Starting job {job.job_id} ({job.kind} {job.path})")
+            thread.start()
+
+
+def resume_interrupted() -> list[int]:
+    """Queue again jobs a previous worker process left running, and start the queue."""
+    with _lock:
+        requeued = requeue_interrupted(set(_live))
+    if requeued:
+        print(f"[ingest.runner] Resuming interrupted jobs: {requeued}")
+    _pump()
+    return requeued
+
+
+def cancel_job(job_id: int) -> Optional[str]:
+    """Returns the job's state after the request, or None if there is no such job."""
+    with _lock:
+        live = _live.get(job_id)
+        if live is None:
+            if cancel_queued(job_id):
+                return "cancelled"
+            job = get_job(job_id)
+            return job.state if job else None
+        live.cancel_event.set()
+        live.progress.cancel()
+    return "cancelling"
+
+
+def cancel_all() -> int:
+    """Cancel every queued and running job; returns how many there were."""
+    with _lock:
+        ids = [job.job_id for job in list_jobs(states=ACTIVE_STATES, limit=1000)]
+        for job_id in ids:
+            cancel_job(job_id)
+        threads = [live.thread for live in _live.values()]
+    for thread in threads:
         thread.join(timeout=5)
-    if thread is None or not thread.is_alive():
-        _cleanup_ingest_thread("cancelled")
-
-
-def _cleanup_ingest_thread(reason: str):
-    global _current_thread, _cancel_event
-    if _current_thread is None:
-        return
-    active_threads = ", ".join(t.name for t in threading.enumerate())
-    print(f"[ingest.runner] Ingestion thread ended ({reason}). Active threads: {active_threads}")
-    _current_thread = None
-    _cancel_event = None
+    return len(ids)
+
+
+def job_progress(job_id: int) -> Optional[dict]:
+    live = _live.get(job_id)
+    return live.progress.get() if live else None
+
+
+def focus_progress() -> dict:
+    """Progress of the latest started job, running or not; idle before the first."""
+    if _focus is None:
+        return {**Progress().get(), "job_id": None, "running": False}
+    job_id, progress = _focus
+    return {**progress.get(), "job_id": job_id, "running": job_id in _live}
+
+
+def last_result() -> Optional[dict]:
+    finished = list_jobs(states=("done", "failed", "cancelled"), limit=1)
+    return finished[0].result if finished else None
@@ -0,0 +1,436 @@
+# services/worker/ingest/watch.py
+"""
+Watch mode: keep a registered Apple Mail folder in sync as .emlx files
+appear, change and disappear, without walking the whole tree per change.
+
+Changes are noticed through inotify where the kernel has it (called via
+ctypes), otherwise by polling a directory mtime index: adding, removing or
+renaming a file bumps its directory's mtime, so each poll stats every known
+directory and lists again only the ones that moved. Apple Mail writes
+messages by rename, which both backends see; an in-place rewrite that keeps
+the directory mtime is only seen by inotify.
+
+Changes are coalesced until the tree has been quiet for WATCH_SETTLE_S (or
+WATCH_MAX_DELAY_S has passed) and then written as one micro-batch through
+the usual plan_files -> parse_emlx -> EmailWriter path, so the manifest
+decides what is new, changed or unchanged, and known files that are gone
+are pruned.
+
+Registered folders live in watched_sources. At startup each gets a catch-up
+ingest job for what changed while the worker was down, then its watcher.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+from threading import Event, Thread
+import time
+from typing import Iterable, NamedTuple, Optional
+
+from db.connection import read_connection, write_connection
+from utils.metrics import StageTimings
+from utils.progress import Progress, bind
+from .discover import iter_files
+from .emlx import parse_emlx
+from .manifest import load_manifest, load_manifest_paths, plan_files
+from .pipeline import write_serial
+from .runner import cancel_job, source_busy, submit_emlx
+from .writer import EmailWriter
+
+WATCH_SETTLE_S = float(os.environ.get("MAILLENS_WATCH_SETTLE_S", 0.5))
+WATCH_MAX_DELAY_S = 3.0   # flush a steady trickle of changes at least this often
+WATCH_POLL_INTERVAL_S = float(os.environ.get("MAILLENS_WATCH_POLL_S", 1.0))
+WATCH_BATCH_SIZE = 200    # rows per transaction within a micro-batch
+FORCE_POLLING = os.environ.get("MAILLENS_WATCH_BACKEND") == "poll"
+
+SUFFIX = ".emlx"
+
+
+class Changes(NamedTuple):
+    """What to look at again: single files, one directory level, whole subtrees."""
+    files: frozenset[str] = frozenset()
+    dirs: frozenset[str] = frozenset()
+    trees: frozenset[str] = frozenset()
+
+
+# --- change sources -----------------------------------------------------------
+
+class _PollBackend:
+    name = "poll"
+
+    def __init__(self, root: str, stop: Event):
+        self._stop = stop
+        self._mtimes: dict[str, int] = {}  # directory -> st_mtime_ns when last listed
+        self._index(root)
+        self._next = time.monotonic() + WATCH_POLL_INTERVAL_S
+
+    def _subdirs(self, path: str) -> list[str]:
+        try:
+            with os.scandir(path) as it:
+                return [e.path for e in it if e.is_dir(follow_symlinks=False)]
+        except OSError:
+            return []
+
+    def _index(self, top: str):
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            try:
+                self._mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            stack.extend(self._subdirs(path))
+
+    def _forget(self, top: str):
+        prefix = os.path.join(top, "")
+        for path in [p for p in self._mtimes if p == top or p.startswith(prefix)]:
+            del self._mtimes[path]
+
+    def read(self, timeout: float) -> list[tuple[str, str]]:
+        wait = max(0.0, self._next - time.monotonic())
+        if self._stop.wait(min(wait, timeout)) or wait > timeout:
+            return []
+        self._next = time.monotonic() + WATCH_POLL_INTERVAL_S
+        changes = []
+        for path, mtime in list(self._mtimes.items()):
+            if path not in self._mtimes:
+                continue  # forgotten with a parent earlier in this pass
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                self._forget(path)
+                changes.append(("tree", path))
+                continue
+            if current == mtime:
+                continue
+            self._mtimes[path] = current
+            changes.append(("dir", path))
+            for sub in self._subdirs(path):
+                if sub not in self._mtimes:
+                    self._index(sub)
+                    changes.append(("tree", sub))
+        return changes
+
+    def close(self):
+        self._mtimes.clear()
+
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_ONLYDIR
+_EVENT = struct.Struct("iIII")  # struct inotify_event: wd, mask, cookie, len; then the name
+
+
+def _libc():
+    name = ctypes.util.find_library("c")
+    libc = ctypes.CDLL(name, use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError(errno.ENOSYS, "inotify unavailable")
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    return libc
+
+
+class _InotifyBackend:
+    name = "inotify"
+
+    def __init__(self, root: str, stop: Event):
+        self._libc = _libc()
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._root = root
+        self._paths: dict[int, str] = {}  # watch descriptor -> directory
+        try:
+            self._add_tree(root, initial=True)
+        except OSError:
+            self.close()
+            raise
+
+    def _add(self, path: str, initial: bool):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            # at setup, hitting the per-user watch limit (ENOSPC) means polling instead
+            if initial and (path == self._root or err == errno.ENOSPC):
+                raise OSError(err, f"inotify_add_watch failed for {path}")
+            return
+        self._paths[wd] = path
+
+    def _add_tree(self, top: str, initial: bool = False):
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            self._add(path, initial)
+            try:
+                with os.scandir(path) as it:
+                    stack.extend(e.path for e in it if e.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+
+    def read(self, timeout: float) -> list[tuple[str, str]]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+        changes = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & _IN_Q_OVERFLOW:
+                changes.append(("tree", self._root))  # events were dropped: check everything
+                continue
+            if mask & _IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            parent = self._paths.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, os.fsdecode(name))
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    # files can land before the new directory's watch exists
+                    self._add_tree(path)
+                if mask & (_IN_CREATE | _IN_MOVED_TO | _IN_MOVED_FROM | _IN_DELETE):
+                    changes.append(("tree", path))
+            elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_MOVED_FROM | _IN_DELETE):
+                # a bare IN_CREATE is skipped: the file is still being written
+                changes.append(("file", path))
+        return changes
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._paths.clear()
+
+
+def _open_backend(root: str, stop: Event):
+    if not FORCE_POLLING:
+        try:
+            return _InotifyBackend(root, stop)
+        except (OSError, AttributeError) as e:
+            print(f"[ingest.watch] inotify unavailable for {root} ({e}); polling instead")
+    return _PollBackend(root, stop)
+
+
+# --- applying changes ---------------------------------------------------------
+
+def _listing(path: str) -> list[str]:
+    try:
+        with os.scandir(path) as it:
+            return [e.path for e in it if e.name.endswith(SUFFIX) and e.is_file()]
+    except OSError:
+        return []
+
+
+def sync_changes(root: str, changes: Changes, cancel_event: Event | None = None,
+                 batch_size: int = WATCH_BATCH_SIZE) -> dict:
+    """
+    Write one micro-batch: parse the new or changed .emlx files among
+    `changes` and prune the known ones that are gone.
+    """
+    timings = StageTimings("emlx")
+    present: set[str] = {p for p in changes.files if p.endswith(SUFFIX) and os.path.isfile(p)}
+    for path in changes.dirs:
+        present.update(_listing(path))
+    for path in changes.trees:
+        present.update(iter_files(path, SUFFIX))
+
+    with read_connection() as con:
+        known = load_manifest_paths(con, "emlx", [p for p in changes.files if p.endswith(SUFFIX)])
+        for path in changes.dirs:
+            known.update((uid, v) for uid, v in load_manifest(con, "emlx", path).items()
+                         if os.path.dirname(uid) == path)
+        for path in changes.trees:
+            known.update(load_manifest(con, "emlx", path))
+    # a path can be reported gone and come back (rename over it) within one batch
+    gone = sorted(p for p in known if p not in present and not os.path.exists(p))
+
+    writer = EmailWriter(batch_size=batch_size, timings=timings)
+    counters: dict[str, int] = {}
+    completed = write_serial(plan_files(sorted(present), known, counters), parse_emlx, writer, cancel_event, timings)
+    pruned = writer.prune("emlx", gone) if completed and gone else 0
+    writer.close()
+    return {
+        "ok": completed,
+        "inserted": writer.inserted,
+        "updated": writer.updated,
+        "unchanged": counters.get("unchanged", 0) + writer.unchanged,
+        "pruned": pruned,
+        "timings": timings.summary(),
+    }
+
+
+class _Watch:
+    def __init__(self, root: str):
+        self.root = root
+        self.stop_event = Event()
+        self.progress = Progress()
+        self.thread = Thread(target=self._run, name=f"watch-{os.path.basename(root)}", daemon=True)
+        self.backend = ""
+        self.error = ""
+        self.batches = 0
+        self.pending = 0
+        self.totals = {"inserted": 0, "updated": 0, "pruned": 0}
+        self.last_sync_ts: Optional[int] = None
+        self.last_latency_ms: Optional[float] = None  # first change seen -> batch committed
+        self.catch_up_job: Optional[int] = None  # the ingest job add_watch queued, if it queued one
+
+    def _run(self):
+        with bind(self.progress):
+            try:
+                backend = _open_backend(self.root, self.stop_event)
+            except Exception as e:
+                self.error = str(e)
+                return
+            self.backend = backend.name
+            files: set[str] = set()
+            dirs: set[str] = set()
+            trees: set[str] = set()
+            first = last = 0.0
+            try:
+                while not self.stop_event.is_set():
+                    for kind, path in backend.read(WATCH_SETTLE_S / 2):
+                        {"file": files, "dir": dirs, "tree": trees}[kind].add(path)
+                        last = time.monotonic()
+                        first = first or last
+                    self.pending = len(files) + len(dirs) + len(trees)
+                    if not self.pending:
+                        continue
+                    now = time.monotonic()
+                    if now - last < WATCH_SETTLE_S and now - first < WATCH_MAX_DELAY_S:
+                        continue
+                    if source_busy("emlx", self.root):
+                        continue  # an ingest job for this folder is queued or running; it goes first
+                    batch = Changes(frozenset(files), frozenset(dirs), frozenset(trees))
+                    files, dirs, trees = set(), set(), set()
+                    self._apply(batch, first)
+                    first = 0.0
+            except Exception as e:
+                self.error = str(e)
+                print(f"[ingest.watch] {self.root} stopped: {e}")
+            finally:
+                backend.close()
+
+    def _apply(self, batch: Changes, first: float):
+        result = sync_changes(self.root, batch, self.stop_event)
+        self.batches += 1
+        self.pending = 0
+        for key in self.totals:
+            self.totals[key] += result[key]
+        self.last_sync_ts = int(time.time() * 1000)
+        self.last_latency_ms = round((time.monotonic() - first) * 1000, 1)
+        if result["inserted"] or result["updated"] or result["pruned"]:
+            print(f"[ingest.watch] {self.root}: +{result['inserted']} ~{result['updated']} -{result['pruned']}")
+
+    def status(self) -> dict:
+        return {
+            "path": self.root,
+            "backend": self.backend,
+            "running": self.thread.is_alive(),
+            "error": self.error,
+            "pending": self.pending,
+            "batches": self.batches,
+            **self.totals,
+            "last_sync_ts": self.last_sync_ts,
+            "last_latency_ms": self.last_latency_ms,
+        }
+
+
+_lock = threading.Lock()
+_watches: dict[str, _Watch] = {}
+
+
+def _start(root: str) -> _Watch:
+    # caller holds _lock
+    watch = _watches.get(root)
+    if watch is None or not watch.thread.is_alive():
+        watch = _Watch(root)
+        _watches[root] = watch
+        watch.thread.start()
+    return watch
+
+
+def add_watch(path: str) -> tuple[dict, int]:
+    """
+    Register a folder and start watching it; returns (status, catch-up job id).
+    The catch-up job brings the folder up to date first; the manifest makes it
+    cheap when little has changed.
+    """
+    root = os.path.abspath(path)
+    with write_connection() as con:
+        con.execute(
+            "INSERT OR IGNORE INTO watched_sources (source, path, created_ts) VALUES ('emlx', ?, ?)",
+            (root, int(time.time() * 1000)),
+        )
+    job, created = submit_emlx(root, prune=True)
+    with _lock:
+        watch = _start(root)
+        if created:
+            watch.catch_up_job = job.job_id
+    return watch.status(), job.job_id
+
+
+def remove_watch(path: str) -> bool:
+    root = os.path.abspath(path)
+    with write_connection() as con:
+        removed = con.execute(
+            "DELETE FROM watched_sources WHERE source = 'emlx' AND path = ?", (root,)
+        ).rowcount
+    with _lock:
+        watch = _watches.pop(root, None)
+    if watch is not None:
+        watch.stop_event.set()
+        watch.thread.join(timeout=5)
+        # only the watch's own catch-up; an ingest started through /ingest/start carries on
+        if watch.catch_up_job is not None:
+            cancel_job(watch.catch_up_job)
+    return bool(removed or watch)
+
+
+def watched_paths() -> list[str]:
+    with read_connection() as con:
+        return [row[0] for row in con.execute("SELECT path FROM watched_sources WHERE source = 'emlx' ORDER BY path")]
+
+
+def start_registered() -> list[str]:
+    """At startup: catch up and watch every registered folder that still exists."""
+    roots = [root for root in watched_paths() if os.path.isdir(root)]
+    for root in roots:
+        add_watch(root)
+    return roots
+
+
+def stop_all():
+    with _lock:
+        watches = list(_watches.values())
+        _watches.clear()
+    for watch in watches:
+        watch.stop_event.set()
+    for watch in watches:
+        watch.thread.join(timeout=5)
+
+
+def watch_status(paths: Iterable[str] | None = None) -> list[dict]:
+    with _lock:
+        live = dict(_watches)
+    roots = watched_paths() if paths is None else list(paths)
+    return [live[root].status() if root in live else {"path": root, "running": False} for root in roots]
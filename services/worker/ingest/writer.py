@@ -0,0 +1,295 @@
+# services/worker/ingest/writer.py
+from contextlib import contextmanager
+from operator import attrgetter
+from time import perf_counter
+from typing import Callable, Iterable, NamedTuple
+
+from db.aggregates import add_senders, refresh_senders
+from db.bodies import release_bodies, store_bodies
+from db.connection import write_connection
+from db.fts import unindex
+from db.jobs import record_batch
+from db.rollups import add_volume, remove_volume
+from db.threads import ThreadInput, refresh_threads, thread_emails
+from utils.metrics import MESSAGES_TOTAL, StageTimings, inc
+from .manifest import ManifestEntry
+
+COMMIT_EVERY = 500  # rows per transaction, keeps the WAL small
+MAX_SQL_VARIABLES = 32766  # SQLITE_MAX_VARIABLE_NUMBER default since 3.32
+
+
+class AttachmentRow(NamedTuple):
+    filename: str
+    mime_major: str
+    mime_minor: str
+    bytes: int
+    sha256: str | None  # of the decoded payload; None when it is empty
+
+
+class EmailRow(NamedTuple):
+    source: str
+    source_uid: str
+    message_id: str
+    date_ts: int
+    from_name: str
+    from_email: str
+    date_ms: int
+    from_norm: str
+    to_json: str
+    cc_json: str
+    subject: str
+    snippet: str
+    body_text: str  # goes to the body store under body_hash, not into emails
+    body_hash: str
+    size_bytes: int
+    has_attach: int
+    recipient_count: int = 0
+    pipeline_state: int = 1  # 0 = headers only, body and FTS filled later by ingest/bodies.py
+    in_reply_to: str = ""
+    ref_ids: str = ""
+    # side-table data, not stored in emails
+    recipients: tuple[tuple[str, str], ...] = ()  # distinct (address, kind) over To then Cc
+    attachments: tuple[AttachmentRow, ...] = ()
+    # manifest bookkeeping, not stored in emails
+    mtime_ns: int = 0
+    fingerprint: str = ""
+    replace: bool = False  # the source_uid was ingested before with different content
+
+
+EMAIL_COLUMNS = (
+    "source", "source_uid", "message_id", "date_ts", "from_name", "from_email",
+    "to_json", "cc_json", "subject", "snippet", "body_hash",
+    "size_bytes", "has_attach", "recipient_count", "date_ms", "from_norm",
+    "pipeline_state", "in_reply_to", "ref_ids",
+)
+
+_COLUMN_LIST = ", ".join(EMAIL_COLUMNS)
+_ROW_PLACEHOLDER = f"({', '.join('?' for _ in EMAIL_COLUMNS)})"
+_ROWS_PER_STATEMENT = MAX_SQL_VARIABLES // len(EMAIL_COLUMNS)
+
+_INSERT_SQL = f"INSERT OR IGNORE INTO emails ({_COLUMN_LIST}) VALUES {_ROW_PLACEHOLDER}"
+
+_UPDATE_SQL = f"""
+    UPDATE emails SET {", ".join(f"{col}=?" for col in EMAIL_COLUMNS[2:])}, body_text=NULL
+    WHERE id=?
+"""
+
+_ATTACHMENT_SQL = """
+    INSERT INTO attachments (email_id, filename, mime_major, mime_minor, bytes, sha256)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_MANIFEST_SQL = """
+    INSERT INTO ingest_manifest (source, source_uid, mtime_ns, size_bytes, fingerprint)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(source, source_uid) DO UPDATE SET
+        mtime_ns=excluded.mtime_ns,
+        size_bytes=excluded.size_bytes,
+        fingerprint=excluded.fingerprint
+"""
+
+
+_email_values: Callable[[EmailRow], tuple] = attrgetter(*EMAIL_COLUMNS)
+
+
+def insert_attachments(cur, rows: Iterable[tuple[int, tuple[AttachmentRow, ...]]]):
+    """Store (email id, attachments) pairs."""
+    cur.executemany(_ATTACHMENT_SQL, [(rid, *att) for rid, attachments in rows for att in attachments])
+
+
+class EmailWriter:
+    """
+    Buffers parsed rows for one ingest run and writes them through the shared
+    writer connection.
+
+    Rows are buffered and flushed as one transaction per batch: a multi-row
+    INSERT ... RETURNING hands back the new ids, and the matching FTS rows and
+    manifest entries go in with executemany.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = COMMIT_EVERY,
+        checkpoint: Callable[[EmailRow], tuple[str, str]] | None = None,
+        timings: StageTimings | None = None,
+        job_id: int | None = None,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.timings = timings
+        self.job_id = job_id  # ingest_jobs row credited with each committed batch
+        # maps a written row to a (meta key, value) resume point, stored with its batch;
+        # a batch can span several files, so the latest point per key is kept
+        self._checkpoint_fn = checkpoint
+        self._checkpoints: dict[str, str] = {}
+        self.written = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self._pending: list[EmailRow | ManifestEntry] = []
+        self._cur = None  # only set inside _transaction()
+
+    @contextmanager
+    def _transaction(self):
+        # the writer connection is held for one batch at a time, never across a run
+        with write_connection() as con:
+            cur = con.cursor()
+            cur.execute("BEGIN")
+            self._cur = cur
+            try:
+                yield cur
+                con.commit()
+            except BaseException:
+                con.rollback()
+                raise
+            finally:
+                self._cur = None
+
+    def write(self, row: EmailRow | ManifestEntry):
+        self._pending.append(row)
+        self.written += 1
+        if self._checkpoint_fn is not None:
+            key, value = self._checkpoint_fn(row)
+            self._checkpoints[key] = value
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        checkpoints, self._checkpoints = self._checkpoints, {}
+        before = (self.inserted, self.updated, self.unchanged)
+        started = perf_counter()
+        with self._transaction() as cur:
+            inserts = [r for r in batch if isinstance(r, EmailRow) and not r.replace]
+            for start in range(0, len(inserts), _ROWS_PER_STATEMENT):
+                self._insert_many(inserts[start:start + _ROWS_PER_STATEMENT])
+
+            touched_senders: set[str] = set()
+            for row in batch:
+                if isinstance(row, EmailRow) and row.replace:
+                    touched_senders.update(self._replace(row))
+            refresh_senders(cur, touched_senders)
+
+            manifest_rows = [
+                r if isinstance(r, ManifestEntry)
+                else (r.source, r.source_uid, r.mtime_ns, r.size_bytes, r.fingerprint)
+                for r in batch
+                if isinstance(r, ManifestEntry) or r.fingerprint
+            ]
+            if manifest_rows:
+                cur.executemany(_MANIFEST_SQL, manifest_rows)
+            if checkpoints:
+                cur.executemany("INSERT OR REPLACE INTO meta(key, value) VALUES(?, ?)", checkpoints.items())
+            record_batch(cur, self.job_id, len(batch), batch[-1].source_uid)
+        # content identical to what we stored, only the stat info moved
+        self.unchanged += sum(1 for r in batch if isinstance(r, ManifestEntry))
+        if self.timings is not None:
+            self.timings.record({"sqlite_flush": perf_counter() - started})
+            source = self.timings.source
+            inc(MESSAGES_TOTAL, self.inserted - before[0], source=source, outcome="inserted")
+            inc(MESSAGES_TOTAL, self.updated - before[1], source=source, outcome="updated")
+            inc(MESSAGES_TOTAL, self.unchanged - before[2], source=source, outcome="unchanged")
+
+    def _insert_many(self, rows: list[EmailRow]):
+        cur = self._cur
+        placeholders = ", ".join(_ROW_PLACEHOLDER for _ in rows)
+        params = [value for row in rows for value in _email_values(row)]
+        cur.execute(
+            f"INSERT OR IGNORE INTO emails ({_COLUMN_LIST}) VALUES {placeholders} RETURNING id, source, source_uid",
+            params,
+        )
+        # rows skipped by OR IGNORE are absent here: already stored, e.g. by a
+        # run from before the manifest existed, which now only gains its entry
+        ids = {(source, uid): rid for rid, source, uid in cur.fetchall()}
+        self.unchanged += len(rows) - len(ids)
+        if not ids:
+            return
+        new_rows = []
+        for row in rows:
+            rid = ids.pop((row.source, row.source_uid), None)
+            if rid is not None:
+                new_rows.append((rid, row))
+        self._index_rows(new_rows)
+        add_senders(cur, [(row.from_email, row.date_ms) for _, row in new_rows])
+        add_volume(cur, [(row.from_norm, row.date_ms, row.size_bytes) for _, row in new_rows])
+        self.inserted += len(new_rows)
+
+    def _index_rows(self, new_rows: list[tuple[int, EmailRow]]):
+        """Write the per-email side tables for freshly stored rows."""
+        cur = self._cur
+        # headers-only rows are stored and indexed once their body is filled in
+        complete = [row for _, row in new_rows if row.pipeline_state == 1]
+        store_bodies(cur, ((row.body_hash, row.body_text) for row in complete))
+        cur.executemany(
+            "INSERT INTO emails_fts(rowid, subject, body_text) VALUES(?,?,?)",
+            [(rid, row.subject, row.body_text) for rid, row in new_rows if row.pipeline_state == 1],
+        )
+        cur.executemany(
+            "INSERT OR IGNORE INTO email_recipients(email_id, address, kind) VALUES(?,?,?)",
+            [(rid, address, kind) for rid, row in new_rows for address, kind in row.recipients],
+        )
+        insert_attachments(cur, ((rid, row.attachments) for rid, row in new_rows))
+        thread_emails(cur, (ThreadInput(rid, row.message_id, row.in_reply_to, row.ref_ids) for rid, row in new_rows))
+
+    def _replace(self, row: EmailRow) -> tuple[str, ...]:
+        """Insert or overwrite one email; returns the senders whose stats it touched."""
+        cur = self._cur
+        cur.execute(
+            "SELECT id, from_email, pipeline_state, body_hash, from_norm, date_ms, size_bytes "
+            "FROM emails WHERE source=? AND source_uid=?",
+            (row.source, row.source_uid),
+        )
+        old = cur.fetchone()
+        if old is not None:
+            remove_volume(cur, [old[4:7]])
+        add_volume(cur, [(row.from_norm, row.date_ms, row.size_bytes)])
+        if old is None:
+            cur.execute(_INSERT_SQL, _email_values(row))
+            rid = cur.lastrowid
+            self.inserted += 1
+            touched = (row.from_email,)
+        else:
+            rid = old[0]
+            if old[2] == 1:
+                unindex(cur, "id = ?", (rid,))
+            cur.execute(_UPDATE_SQL, _email_values(row)[2:] + (rid,))
+            cur.execute("DELETE FROM email_recipients WHERE email_id=?", (rid,))
+            cur.execute("DELETE FROM attachments WHERE email_id=?", (rid,))
+            self.updated += 1
+            touched = (old[1], row.from_email)
+        self._index_rows([(rid, row)])
+        if old is not None and old[3] != row.body_hash:
+            release_bodies(cur, (old[3],))
+        return touched
+
+    def prune(self, source: str, source_uids: list[str]) -> int:
+        """Delete emails (and their index rows) whose source files are gone."""
+        self.flush()
+        removed = 0
+        senders: set[str] = set()
+        threads: set[int] = set()
+        with self._transaction() as cur:
+            for uid in source_uids:
+                cur.execute(
+                    "SELECT id, from_email, pipeline_state, body_hash, thread_id, from_norm, date_ms, size_bytes "
+                    "FROM emails WHERE source=? AND source_uid=?",
+                    (source, uid),
+                )
+                old = cur.fetchone()
+                if old is not None:
+                    remove_volume(cur, [old[5:8]])
+                    if old[2] == 1:
+                        unindex(cur, "id = ?", (old[0],))
+                    cur.execute("DELETE FROM emails WHERE id=?", (old[0],))
+                    release_bodies(cur, (old[3],))
+                    senders.add(old[1])
+                    threads.add(old[4])
+                    removed += 1
+                cur.execute("DELETE FROM ingest_manifest WHERE source=? AND source_uid=?", (source, uid))
+            refresh_senders(cur, senders)
+            refresh_threads(cur, threads)
+        return removed
+
+    def close(self):
+        self.flush()
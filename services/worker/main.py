@@ -1,19 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
 import json
+import os
+import sqlite3
 import time
 
-from fastapi import Body, FastAPI, HTTPException, Query
+from fastapi import Body, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from ingest.runner import start_emlx, cancel_running, is_running
+from starlette.concurrency import run_in_threadpool
+from ingest.runner import (
+    cancel_all, cancel_job, focus_progress, is_running, job_progress, last_result, resume_interrupted, running_jobs,
+    submit_bodies, submit_emlx, submit_mbox,
+)
+from db.connection import close_all as close_connections, pool_stats, read_connection, write_connection
 from db.init_db import init_db
+from db.jobs import ACTIVE_STATES, get_job, list_jobs
+from db.rollups import DAY_MS
+from ingest.bodies import pending_bodies
 from ingest.emlx import ingest_emlx_folder
-from utils.progress import get as get_progress
+from ingest.pipeline import default_workers
+from ingest.watch import add_watch, remove_watch, start_registered as start_watches, stop_all as stop_watches, watch_status
+from ingest.writer import COMMIT_EVERY
+from utils import metrics
+from utils.cache import cached, results as result_cache
+from utils.cursor import decode_cursor, encode_cursor
+from utils.executor import bounded, stats as read_pool_stats
+from utils.progress import Watcher as ProgressWatcher, version as progress_version
 from typing import List, Optional
 
 SECONDS_IN_DAY = 86400
+EPOCH = date(1970, 1, 1)  # daily_volume.day counts UTC days from here
+DORMANT_CUTOFF_GRANULARITY_S = 60  # lets repeated dormant lookups share a cache entry
 DEFAULT_DORMANT_INACTIVE_DAYS = 365
+PROGRESS_PUSH_INTERVAL_S = 0.25  # at most 4 progress events per second per client
+PROGRESS_KEEPALIVE_S = 15
+# per-route deadlines for @bounded reads; insights get utils/executor.DEFAULT_DEADLINE_S
+LIST_DEADLINE_S = 5.0     # /emails, /threads, /stats: index walks, slow only when something is wrong
+SEARCH_DEADLINE_S = 10.0
+SEARCH_MAX_LIMIT = 200
+SEARCH_BM25 = "bm25(emails_fts, 2.0, 1.0)"  # subject matches weigh double
+SEARCH_MARK = ("<mark>", "</mark>")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        # jobs a previous process left running carry on from their last committed batch
+        resume_interrupted()
+        start_watches()
+    except sqlite3.OperationalError:
+        pass  # no ingest_jobs / watched_sources tables until /db/init
+    # connections are opened lazily per worker thread; release them all on shutdown
+    yield
+    stop_watches()
+    close_connections()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # allow the Vite dev server origin
 app.add_middleware(
@@ -23,6 +68,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class RecordLatency:
+    """
+    Request latency by route. Plain ASGI: an @app.middleware("http") wrapper
+    would keep http.disconnect from reaching the handlers, and @bounded reads
+    use it to stop queries nobody is waiting for.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            # label by route template, not raw path, to keep series bounded
+            route = scope.get("route")
+            metrics.observe(
+                metrics.HTTP_SECONDS,
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
+
+app.add_middleware(RecordLatency)
+
 @app.get("/")
 def root():
     return {"message": "MailLens Worker running!"}
@@ -30,44 +112,235 @@ def root():
 @app.post("/db/init")
 def api_init_db():
     init_db()
+    resume_interrupted()
     return {"ok": True}
 
+@app.post("/db/rebuild/sender-stats")
+def api_rebuild_sender_stats():
+    from db.aggregates import rebuild_sender_stats
+
+    if is_running():
+        raise HTTPException(status_code=409, detail="ingestion_already_running")
+    with write_connection() as con:
+        senders = rebuild_sender_stats(con)
+    return {"ok": True, "senders": senders}
+
+@app.post("/db/rebuild/fts")
+def api_rebuild_fts():
+    from db.fts import rebuild_fts
+
+    if is_running():
+        raise HTTPException(status_code=409, detail="ingestion_already_running")
+    with write_connection() as con:
+        emails = rebuild_fts(con)
+    return {"ok": True, "emails": emails}
+
+@app.post("/db/rebuild/threads")
+def api_rebuild_threads():
+    from db.threads import rebuild_threads
+
+    if is_running():
+        raise HTTPException(status_code=409, detail="ingestion_already_running")
+    with write_connection() as con:
+        threads = rebuild_threads(con)
+    return {"ok": True, "threads": threads}
+
+@app.post("/db/rebuild/rollups")
+def api_rebuild_rollups():
+    from db.rollups import rebuild_daily_volume
+
+    if is_running():
+        raise HTTPException(status_code=409, detail="ingestion_already_running")
+    with write_connection() as con:
+        sender_days = rebuild_daily_volume(con)
+    return {"ok": True, "sender_days": sender_days}
+
+@app.get("/db/pool")
+def api_db_pool():
+    return {**pool_stats(), "read_executor": read_pool_stats()}
+
+@app.get("/cache/stats")
+def api_cache_stats():
+    return result_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def api_metrics():
+    cache = result_cache.stats()
+    metrics.set_gauge("maillens_result_cache_hits", cache["hits"])
+    metrics.set_gauge("maillens_result_cache_misses", cache["misses"])
+    metrics.set_gauge("maillens_result_cache_entries", cache["entries"])
+    metrics.set_gauge("maillens_result_cache_bytes", cache["bytes"])
+    reads = read_pool_stats()
+    metrics.set_gauge("maillens_read_queries_running", reads["running"])
+    metrics.set_gauge("maillens_read_queries_queued", reads["queued"])
+    metrics.set_gauge("maillens_ingest_running", len(running_jobs()))
+    metrics.set_gauge("maillens_watch_sources", sum(1 for w in watch_status() if w["running"]))
+    metrics.set_gauge("maillens_ingest_jobs_queued", len(list_jobs(states=("queued",), limit=1000)))
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 class IngestRequest(BaseModel):
     source: str  # "emlx" | "mbox" | ...
     path: str
+    workers: int = 1  # >1 parses in a process pool with a single DB writer; 0 = auto
+    prune: bool = False  # emlx only: delete emails whose source files have disappeared
+    batch_size: int = COMMIT_EVERY  # rows per insert batch / transaction
+    profile: bool = False  # dump a cProfile .pstats for this run (parses on one thread)
+    headers_first: bool = False  # store headers for every message first, then bodies and FTS
+
+class WatchRequest(BaseModel):
+    path: str  # Apple Mail folder; .emlx files under it are kept in sync
+
+class BodiesRequest(BaseModel):
+    workers: int = 1
+    batch_size: int = COMMIT_EVERY
+    profile: bool = False
+
+def _workers(requested: int, profile: bool) -> int:
+    if profile:
+        return 1  # cProfile only sees the ingest thread, not pool processes
+    return requested if requested > 0 else default_workers()
 
 @app.post("/ingest/start")
 def api_ingest_start(req: IngestRequest):
-    if req.source != "emlx":
+    if req.source not in {"emlx", "mbox"}:
         raise HTTPException(status_code=400, detail="unsupported_source")
-    try:
-        start_emlx(req.path)
-        return {"ok": True, "status": "started"}
-    except RuntimeError as e:
-        raise HTTPException(status_code=409, detail=str(e))
+    workers = _workers(req.workers, req.profile)
+    batch_size = max(1, req.batch_size)
+    if req.source == "mbox":
+        job, created = submit_mbox(
+            req.path, workers=workers, batch_size=batch_size, profile=req.profile,
+            headers_first=req.headers_first,
+        )
+    else:
+        job, created = submit_emlx(
+            req.path, workers=workers, prune=req.prune, batch_size=batch_size, profile=req.profile,
+            headers_first=req.headers_first,
+        )
+    return _submitted(job, created)
+
+@app.post("/ingest/bodies")
+def api_ingest_bodies(req: Optional[BodiesRequest] = None):
+    """Fill in bodies and search for rows a headers-first ingest left pending."""
+    req = req or BodiesRequest()
+    job, created = submit_bodies(
+        workers=_workers(req.workers, req.profile), batch_size=max(1, req.batch_size), profile=req.profile
+    )
+    return _submitted(job, created)
+
+def _submitted(job, created: bool) -> dict:
+    # a second request for a source already queued or running gets that job back
+    response = {"ok": True, "status": job.state, "job_id": job.job_id}
+    if job.options.get("profile_path"):
+        response["profile"] = job.options["profile_path"]
+    if not created:
+        response["existing"] = True
+    return response
+
+def _job_dict(job) -> dict:
+    return {**job._asdict(), "progress": job_progress(job.job_id)}
+
+def _progress_snapshot():
+    # the latest started job, plus a line per job still queued or running
+    snapshot = focus_progress()
+    snapshot["jobs"] = [
+        {"job_id": job.job_id, "kind": job.kind, "path": job.path, "state": job.state, "done": job.done}
+        for job in list_jobs(states=ACTIVE_STATES, limit=20)
+    ]
+    return snapshot
+
+@app.get("/ingest/result")
+def api_ingest_result():
+    """Result dict (counts and stage timings) of the last finished ingest job."""
+    return {"running": is_running(), "result": last_result()}
+
+@app.get("/jobs")
+def api_jobs(state: Optional[str] = None, limit: int = 50, before: Optional[int] = None):
+    """Ingest jobs, newest first; page with before=<last job_id>."""
+    states = tuple(state.split(",")) if state else None
+    jobs = list_jobs(states=states, limit=max(1, min(limit, 500)), before=before)
+    return {"jobs": [_job_dict(job) for job in jobs], "next_before": jobs[-1].job_id if jobs else None}
+
+@app.get("/jobs/{job_id}")
+def api_job(job_id: int):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job_not_found")
+    return _job_dict(job)
+
+@app.post("/jobs/{job_id}/cancel")
+def api_job_cancel(job_id: int):
+    state = cancel_job(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="job_not_found")
+    if state not in {"cancelled", "cancelling"}:
+        raise HTTPException(status_code=409, detail="job_not_active")
+    return {"ok": True, "status": state}
 
 @app.get("/progress")
 def api_progress():
-    snapshot = get_progress()
-    status = snapshot.get("status")
-    if status in {"done", "cancelled", "error"}:
-        running_flag = False
-    else:
-        running_flag = is_running()
-    snapshot["running"] = running_flag
-    return snapshot
+    return _progress_snapshot()
+
+@app.get("/progress/stream")
+async def api_progress_stream(request: Request):
+    """Server-sent progress snapshots, pushed on change and coalesced to PROGRESS_PUSH_INTERVAL_S."""
+    async def events():
+        with ProgressWatcher(asyncio.get_running_loop()) as watcher:
+            sent_version = None
+            running = None
+            while not await request.is_disconnected():
+                version = progress_version()
+                # the job list is a SQLite read; keep it off the event loop
+                snapshot = await run_in_threadpool(_progress_snapshot)
+                # the ingest thread can exit without touching progress; push that too
+                if version != sent_version or snapshot["running"] != running:
+                    sent_version, running = version, snapshot["running"]
+                    yield f"id: {version}\nevent: progress\ndata: {json.dumps(snapshot)}\n\n"
+                    await asyncio.sleep(PROGRESS_PUSH_INTERVAL_S)
+                    continue
+                wait = PROGRESS_PUSH_INTERVAL_S if running else PROGRESS_KEEPALIVE_S
+                if not await watcher.wait(wait) and not running:
+                    yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/watch")
+def api_watch():
+    """Registered watch folders, with their backend and micro-batch counters."""
+    return {"watches": watch_status()}
+
+@app.post("/watch")
+def api_watch_add(req: WatchRequest):
+    """Ingest the folder once, then keep it in sync as Mail adds, changes and deletes messages."""
+    if not os.path.isdir(req.path):
+        raise HTTPException(status_code=400, detail="path_not_directory")
+    status, job_id = add_watch(req.path)
+    return {"ok": True, "job_id": job_id, **status}
+
+@app.post("/watch/stop")
+def api_watch_stop(req: WatchRequest):
+    if not remove_watch(req.path):
+        raise HTTPException(status_code=404, detail="watch_not_found")
+    return {"ok": True}
 
 @app.post("/cancel")
 def api_cancel():
-    if not is_running():
+    """Cancel every queued and running ingest job."""
+    if not cancel_all():
         return {"ok": False, "status": "idle"}
-    cancel_running()
     return {"ok": True, "status": "cancelling"}
 
 @app.get("/stats")
+@bounded("/stats", deadline_s=LIST_DEADLINE_S)
+@cached("/stats")
 def api_stats():
-    from db.connection import connect
-    con = connect(); cur = con.cursor()
+    with read_connection() as con:
+        return _stats(con.cursor())
+
+def _stats(cur):
     cur.execute("SELECT COUNT(*) FROM emails")
     total = cur.fetchone()[0]
 
@@ -88,7 +361,8 @@ def api_stats():
     cur.execute("SELECT MAX(date_ts) FROM emails")
     latest_ts = cur.fetchone()[0]
 
-    con.close()
+    pending = pending_bodies(cur)
+
     return {
         "total": total,
         "flagged": flagged,
@@ -96,146 +370,354 @@ def api_stats():
         "junk": junk,
         "unique_senders": unique_senders,
         "latest_ts": latest_ts,
+        "pending_bodies": pending,  # headers stored, body and search not yet filled in
     }
 
+def _decode(cursor: str, arity: int) -> tuple:
+    try:
+        return decode_cursor(cursor, arity)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid_cursor")
+
+# Aggregate lists (senders, recipients) are small enough to filter without an
+# index seek. Their keys are (column, descending) pairs; NULL compares as -1,
+# which keeps SQLite's NULLs-lowest ordering for counts and timestamps.
+
+def _keyset_after(keys: tuple[tuple[str, bool], ...], values: tuple) -> tuple[str, tuple]:
+    """WHERE fragment selecting rows strictly after `values` in ORDER BY `keys`."""
+    clauses, params = [], []
+    for i, (column, descending) in enumerate(keys):
+        terms = [f"IFNULL({prev}, -1) = ?" for prev, _ in keys[:i]]
+        terms.append(f"IFNULL({column}, -1) {'<' if descending else '>'} ?")
+        clauses.append(" AND ".join(terms))
+        params += [*values[:i], values[i]]
+    return "(" + " OR ".join(f"({c})" for c in clauses) + ")", tuple(params)
+
+def _key_cursor(row, keys: tuple[tuple[str, bool], ...]) -> str:
+    return encode_cursor(*(-1 if row[column] is None else row[column] for column, _ in keys))
+
+def _email_page(cur, where_sql: str, params: tuple, limit: int, cursor: Optional[str]) -> tuple[list[dict], Optional[str]]:
+    """
+    One page of emails matching where_sql in (date_ts DESC, id DESC) order,
+    resuming after `cursor`. Both halves seek ix_emails_date-ordered ranges, so
+    a page costs the same at any depth. Undated emails sort last, as in SQLite.
+    """
+    after = _decode(cursor, 2) if cursor else None
+    where = f"({where_sql}) AND " if where_sql else ""
+
+    def fetch(keyset: str, keyset_params: tuple, count: int):
+        return cur.execute(
+            f"""
+            SELECT id, date_ts, from_email, subject, snippet
+            FROM emails
+            WHERE {where}{keyset}
+            ORDER BY date_ts DESC, id DESC
+            LIMIT ?
+            """,
+            params + keyset_params + (count,),
+        ).fetchall()
+
+    rows = []
+    if after is None:
+        rows = fetch("date_ts IS NOT NULL", (), limit + 1)
+    elif after[0] is not None:
+        rows = fetch("(date_ts, id) < (?, ?)", after, limit + 1)
+    if len(rows) <= limit:
+        if after is not None and after[0] is None:
+            rows += fetch("date_ts IS NULL AND id < ?", (after[1],), limit + 1 - len(rows))
+        else:
+            rows += fetch("date_ts IS NULL", (), limit + 1 - len(rows))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["date_ts"], rows[-1]["id"])
+    return [dict(row) for row in rows], next_cursor
+
 @app.get("/emails")
-def api_emails(limit: int = 50):
-    from db.connection import connect
-    con = connect(); cur = con.cursor()
-    cur.execute("""SELECT id, date_ts, from_email, subject, snippet
-                   FROM emails ORDER BY date_ts DESC, id DESC LIMIT ?""", (limit,))
-    rows = [dict(r) for r in cur.fetchall()]
-    con.close(); return rows
+@bounded("/emails", deadline_s=LIST_DEADLINE_S)
+@cached("/emails")
+def api_emails(limit: int = 50, cursor: Optional[str] = None):
+    with read_connection() as con:
+        emails, next_cursor = _email_page(con.cursor(), "", (), max(1, limit), cursor)
+    return {"emails": emails, "next_cursor": next_cursor}
+
+@app.get("/emails/{email_id}/body")
+@bounded("/emails/{email_id}/body", deadline_s=LIST_DEADLINE_S)
+def api_email_body(email_id: int):
+    """The full body, inflated from the body store; lists only ever carry the snippet."""
+    with read_connection() as con:
+        row = con.execute(
+            """
+            SELECT t.body_text, e.body_hash, e.pipeline_state
+            FROM email_text t JOIN emails e ON e.id = t.id
+            WHERE t.id = ?
+            """,
+            (email_id,),
+        ).fetchone()
+    if row is None:
+        raise HTTPException(status_code=404, detail="email_not_found")
+    return {
+        "id": email_id,
+        "body_text": row["body_text"] or "",
+        "body_hash": row["body_hash"],
+        "pending": row["pipeline_state"] == 0,  # headers-only so far
+    }
 
 
-@app.get("/insights/senders/first-time")
-def api_insights_first_time_senders(limit: int = 50):
-    from db.connection import connect
+@app.get("/threads")
+@bounded("/threads", deadline_s=LIST_DEADLINE_S)
+@cached("/threads")
+def api_threads(limit: int = 50, cursor: Optional[str] = None):
+    """Conversations by latest activity, newest first; walks ix_threads_latest."""
+    limit = max(1, limit)
+    keyset, params = "1", ()
+    if cursor:
+        keyset, params = "(latest_ts, thread_id) < (?, ?)", _decode(cursor, 2)
+    with read_connection() as con:
+        rows = con.execute(
+            f"""
+            SELECT thread_id, subject, root_email_id, message_count, first_ts, latest_ts
+            FROM threads
+            WHERE {keyset}
+            ORDER BY latest_ts DESC, thread_id DESC
+            LIMIT ?
+            """,
+            params + (limit + 1,),
+        ).fetchall()
+    threads = [dict(row) for row in rows]
+    next_cursor = None
+    if len(threads) > limit:
+        threads = threads[:limit]
+        next_cursor = encode_cursor(threads[-1]["latest_ts"], threads[-1]["thread_id"])
+    return {"threads": threads, "next_cursor": next_cursor}
+
+@app.get("/threads/{thread_id}")
+@bounded("/threads/{thread_id}", deadline_s=LIST_DEADLINE_S)
+@cached("/threads/{thread_id}")
+def api_thread(thread_id: int):
+    """One conversation's emails, oldest first, each with the Message-ID it replies to."""
+    with read_connection() as con:
+        cur = con.cursor()
+        thread = cur.execute(
+            "SELECT thread_id, root_key, subject, root_email_id, message_count, first_ts, latest_ts FROM threads WHERE thread_id = ?",
+            (thread_id,),
+        ).fetchone()
+        if thread is None:
+            raise HTTPException(status_code=404, detail="thread_not_found")
+        cur.execute(
+            """
+            SELECT e.id, e.date_ts, e.from_email, e.subject, e.snippet, e.message_id, n.parent_key
+            FROM emails e
+            LEFT JOIN thread_nodes n
+              ON n.message_key = IFNULL(NULLIF(e.message_id, ''), printf('<email-%d@maillens.invalid>', e.id))
+            WHERE e.thread_id = ?
+            ORDER BY e.date_ms, e.id
+            """,
+            (thread_id,),
+        )
+        emails = [dict(row) for row in cur.fetchall()]
+    return {**dict(thread), "emails": emails}
+
+
+def _fts_query(q: str) -> str:
+    """Quote each term so addresses, dots and dashes aren't read as FTS5 syntax; a trailing * stays a prefix match."""
+    terms = []
+    for token in q.split():
+        prefix = token.endswith("*")
+        token = token.rstrip("*")
+        if token:
+            terms.append('"' + token.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+@app.get("/search")
+@bounded("/search", deadline_s=SEARCH_DEADLINE_S)
+@cached("/search")
+def api_search(
+    q: str,
+    limit: int = 50,
+    sender: Optional[str] = None,
+    date_from: Optional[int] = None,  # unix ms, inclusive
+    date_to: Optional[int] = None,    # unix ms, exclusive
+    cursor: Optional[str] = None,
+    raw: bool = False,                # pass q through as FTS5 query syntax
+):
+    match = q.strip() if raw else _fts_query(q)
+    if not match:
+        raise HTTPException(status_code=400, detail="empty_query")
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+
+    filters = ["emails_fts MATCH ?"]
+    params: list = [match]
+    if sender and sender.strip():
+        filters.append("e.from_norm = ?")
+        params.append(sender.strip().lower())
+    if date_from is not None:
+        filters.append("e.date_ms >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        filters.append("e.date_ms < ?")
+        params.append(date_to)
+    if cursor:
+        last_score, last_id = _decode(cursor, 2)
+        filters.append(f"({SEARCH_BM25} > ? OR ({SEARCH_BM25} = ? AND e.id > ?))")
+        params += [last_score, last_score, last_id]
+
+    with read_connection() as con:
+        try:
+            rows = con.execute(
+                f"""
+                SELECT e.id, e.date_ts, e.from_email, {SEARCH_BM25} AS score
+                FROM emails_fts
+                JOIN emails e ON e.id = emails_fts.rowid
+                WHERE {" AND ".join(filters)}
+                ORDER BY score, e.id
+                LIMIT ?
+                """,
+                params + [limit + 1],
+            ).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+            # snippets only for the page, not for every match that was ranked
+            highlights = {}
+            if rows:
+                placeholders = ", ".join("?" for _ in rows)
+                cur = con.execute(
+                    f"""
+                    SELECT rowid,
+                           highlight(emails_fts, 0, ?, ?),
+                           snippet(emails_fts, 1, ?, ?, '…', 16)
+                    FROM emails_fts
+                    WHERE emails_fts MATCH ? AND rowid IN ({placeholders})
+                    """,
+                    (*SEARCH_MARK, *SEARCH_MARK, match, *(row["id"] for row in rows)),
+                )
+                highlights = {rid: (subject, snippet) for rid, subject, snippet in cur.fetchall()}
+        except sqlite3.OperationalError:
+            # only reachable with raw=True: malformed FTS5 syntax
+            raise HTTPException(status_code=400, detail="invalid_query")
+
+    emails = []
+    for row in rows:
+        subject, snippet = highlights.get(row["id"], (None, None))
+        emails.append({**dict(row), "subject": subject, "snippet": snippet})
 
-    con = connect()
-    cur = con.cursor()
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1]["score"], rows[-1]["id"])
+    return {"emails": emails, "next_cursor": next_cursor}
 
-    cur.execute(
-        """
-        WITH first_time AS (
-            SELECT from_email
-            FROM emails
-            WHERE from_email IS NOT NULL
-              AND TRIM(from_email) <> ''
-            GROUP BY from_email
-            HAVING COUNT(*) = 1
-        )
-        SELECT COUNT(*) FROM first_time
-        """
-    )
-    unique_senders = cur.fetchone()[0]
 
-    cur.execute(
-        """
-        WITH first_time AS (
-            SELECT from_email
-            FROM emails
-            WHERE from_email IS NOT NULL
-              AND TRIM(from_email) <> ''
-            GROUP BY from_email
-            HAVING COUNT(*) = 1
-        )
-        SELECT COUNT(*) AS total_emails,
-               MAX(date_ts) AS latest_ts
-        FROM emails
-        WHERE from_email IN (SELECT from_email FROM first_time)
-        """
-    )
-    totals_row = cur.fetchone()
-    total_emails = totals_row[0] or 0
-    latest_ts = totals_row[1]
+_SENDER_KEYS = (("latest_ts", True), ("from_email", False))
+_TOP_SENDER_KEYS = (("total_emails", True), ("latest_ts", True), ("from_email", False))
+_RECIPIENT_KEYS = (("total_emails", True), ("latest_ts", True), ("address", False))
+
+
+def _order_by(keys) -> str:
+    return ", ".join(f"{column} {'DESC' if descending else 'ASC'}" for column, descending in keys)
+
 
+def _sender_page(cur, where_sql: str, params: tuple, keys, limit: int, cursor: Optional[str]):
+    """Up to limit + 1 sender_stats rows after `cursor`, and the cursor for the next page."""
+    where = [where_sql] if where_sql else []
+    if cursor:
+        keyset_sql, keyset_params = _keyset_after(keys, _decode(cursor, len(keys)))
+        where.append(keyset_sql)
+        params = params + keyset_params
     cur.execute(
-        """
-        WITH first_time AS (
-            SELECT from_email
-            FROM emails
-            WHERE from_email IS NOT NULL
-              AND TRIM(from_email) <> ''
-            GROUP BY from_email
-            HAVING COUNT(*) = 1
-        )
-        SELECT id, date_ts, from_email, subject, snippet
-        FROM emails
-        WHERE from_email IN (SELECT from_email FROM first_time)
-        ORDER BY date_ts DESC, id DESC
+        f"""
+        SELECT from_email, total_emails, latest_ts
+        FROM sender_stats
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {_order_by(keys)}
         LIMIT ?
         """,
-        (limit,),
+        params + (limit + 1,),
     )
-    emails = [dict(row) for row in cur.fetchall()]
-
+    senders = [dict(row) for row in cur.fetchall()]
+    next_cursor = _key_cursor(senders[limit - 1], keys) if len(senders) > limit else None
+    return senders, next_cursor
+
+
+def _sender_insight(
+    cur,
+    where_sql: str,
+    params: tuple,
+    limit: int,
+    cursor: Optional[str] = None,
+    senders_cursor: Optional[str] = None,
+) -> dict:
+    """Stats, senders and recent emails for the sender_stats rows matching where_sql."""
     cur.execute(
-        """
-        WITH first_time AS (
-            SELECT from_email
-            FROM emails
-            WHERE from_email IS NOT NULL
-              AND TRIM(from_email) <> ''
-            GROUP BY from_email
-            HAVING COUNT(*) = 1
-        )
-        SELECT from_email,
-               COUNT(*) AS total_emails,
-               MAX(date_ts) AS latest_ts
-        FROM emails
-        WHERE from_email IN (SELECT from_email FROM first_time)
-        GROUP BY from_email
-        ORDER BY latest_ts DESC, from_email ASC
-        LIMIT ?
+        f"""
+        SELECT COUNT(*), SUM(total_emails), MAX(latest_ts)
+        FROM sender_stats
+        WHERE {where_sql}
         """,
-        (limit,),
+        params,
     )
-    senders = [dict(row) for row in cur.fetchall()]
+    unique_senders, total_emails, latest_ts = cur.fetchone()
+
+    senders, senders_next_cursor = _sender_page(cur, where_sql, params, _SENDER_KEYS, limit, senders_cursor)
+
+    members_sql = f"SELECT from_email FROM sender_stats WHERE {where_sql}"
+    members_params = params
+    if cursor is None:
+        # the newest `limit` + 1 emails can only come from senders whose
+        # latest_ts reaches the (limit + 1)-th newest latest_ts, so the first
+        # page is bounded to those senders' index ranges
+        cur.execute(
+            f"SELECT latest_ts FROM sender_stats WHERE {where_sql} ORDER BY latest_ts DESC LIMIT 1 OFFSET ?",
+            params + (limit,),
+        )
+        boundary = cur.fetchone()
+        if boundary is not None and boundary[0] is not None:
+            members_sql += " AND latest_ts >= ?"
+            members_params = params + (boundary[0],)
+    emails, next_cursor = _email_page(cur, f"from_email IN ({members_sql})", members_params, limit, cursor)
 
-    con.close()
     return {
         "stats": {
-            "unique_senders": unique_senders,
-            "total_emails": total_emails,
+            "unique_senders": unique_senders or 0,
+            "total_emails": total_emails or 0,
             "latest_ts": latest_ts,
         },
-        "senders": senders,
+        "senders": senders[:limit],
         "emails": emails,
+        "next_cursor": next_cursor,
+        "senders_next_cursor": senders_next_cursor,
     }
 
 
-@app.get("/insights/senders/top")
-def api_insights_top_senders(limit: int = 50):
-    from db.connection import connect
+@app.get("/insights/senders/first-time")
+@bounded("/insights/senders/first-time")
+@cached("/insights/senders/first-time")
+def api_insights_first_time_senders(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    senders_cursor: Optional[str] = None,
+):
+    with read_connection() as con:
+        return _sender_insight(con.cursor(), "total_emails = 1", (), max(1, limit), cursor, senders_cursor)
 
-    con = connect()
-    cur = con.cursor()
 
-    cur.execute(
-        """
-        SELECT from_email,
-               COUNT(*) AS total_emails,
-               MAX(date_ts) AS latest_ts
-        FROM emails
-        WHERE from_email IS NOT NULL
-          AND TRIM(from_email) <> ''
-        GROUP BY from_email
-        ORDER BY total_emails DESC,
-                 latest_ts DESC,
-                 from_email ASC
-        LIMIT ?
-        """,
-        (limit,),
-    )
-    sender_rows = [dict(row) for row in cur.fetchall()]
+@app.get("/insights/senders/top")
+@bounded("/insights/senders/top")
+@cached("/insights/senders/top")
+def api_insights_top_senders(limit: int = 50, senders_cursor: Optional[str] = None):
+    limit = max(1, limit)
+    with read_connection() as con:
+        sender_rows, senders_next_cursor = _sender_page(
+            con.cursor(), "", (), _TOP_SENDER_KEYS, limit, senders_cursor
+        )
+    sender_rows = sender_rows[:limit]
 
     unique_senders = len(sender_rows)
     total_emails = sum(row.get("total_emails") or 0 for row in sender_rows)
     latest_ts_candidates = [row.get("latest_ts") for row in sender_rows if row.get("latest_ts") is not None]
     latest_ts = max(latest_ts_candidates) if latest_ts_candidates else None
 
-    con.close()
     return {
         "stats": {
             "unique_senders": unique_senders,
@@ -244,150 +726,141 @@ def api_insights_top_senders(limit: int = 50):
         },
         "senders": sender_rows,
         "emails": [],
+        "next_cursor": None,
+        "senders_next_cursor": senders_next_cursor,
     }
 
 
-def _parse_recipient_addresses(row) -> list[str]:
-    unique: list[str] = []
-    seen: set[str] = set()
-    for key in ("to_json", "cc_json"):
-        raw = row[key]
-        if not raw:
-            continue
-        try:
-            entries = json.loads(raw)
-        except Exception:
-            continue
-        if isinstance(entries, str):
-            entries = [entries]
-        for value in entries:
-            if not isinstance(value, str):
-                continue
-            clean = value.strip()
-            if clean and clean not in seen:
-                seen.add(clean)
-                unique.append(clean)
-    return unique
-
-
-def _collect_recipient_insight(limit: int, matches_fn):
-    from db.connection import connect
-
-    con = connect()
-    cur = con.cursor()
+def _collect_recipient_insight(
+    limit: int,
+    min_count: int,
+    max_count: int | None = None,
+    cursor: Optional[str] = None,
+    recipients_cursor: Optional[str] = None,
+):
+    if max_count is None:
+        where_sql = "recipient_count >= ?"
+        params: tuple = (min_count,)
+    else:
+        where_sql = "recipient_count BETWEEN ? AND ?"
+        params = (min_count, max_count)
+
+    with read_connection() as con:
+        return _recipient_insight(con.cursor(), where_sql, params, limit, cursor, recipients_cursor)
+
+
+def _recipient_insight(
+    cur,
+    where_sql: str,
+    params: tuple,
+    limit: int,
+    cursor: Optional[str] = None,
+    recipients_cursor: Optional[str] = None,
+) -> dict:
     cur.execute(
-        """
-        SELECT id, date_ts, from_email, subject, snippet, to_json, cc_json
-        FROM emails
-        ORDER BY date_ts DESC, id DESC
-        """
+        f"SELECT COUNT(*), MAX(date_ts) FROM emails WHERE {where_sql}",
+        params,
     )
-    rows = cur.fetchall()
-    con.close()
+    total_emails, latest_ts = cur.fetchone()
 
-    recipients: dict[str, dict[str, int | None]] = {}
-    emails: list[dict] = []
-    total_emails = 0
-    latest_ts: int | None = None
+    emails, next_cursor = _email_page(cur, where_sql, params, limit, cursor)
 
-    for row in rows:
-        addresses = _parse_recipient_addresses(row)
-        count = len(addresses)
-        if count == 0 or not matches_fn(count):
-            continue
-
-        total_emails += 1
-        ts = row["date_ts"]
-        if ts is not None:
-            latest_ts = ts if latest_ts is None else max(latest_ts, ts)
-
-        if len(emails) < limit:
-            emails.append(
-                {
-                    "id": row["id"],
-                    "date_ts": row["date_ts"],
-                    "from_email": row["from_email"],
-                    "subject": row["subject"],
-                    "snippet": row["snippet"],
-                }
-            )
-
-        for address in addresses:
-            entry = recipients.setdefault(
-                address,
-                {
-                    "total_emails": 0,
-                    "latest_ts": None,
-                },
-            )
-            entry["total_emails"] = int(entry["total_emails"]) + 1
-            if ts is not None:
-                latest_entry_ts = entry["latest_ts"]
-                entry["latest_ts"] = ts if latest_entry_ts is None else max(int(latest_entry_ts), ts)
-
-    sorted_recipients = sorted(
-        (
-            {
-                "address": address,
-                "total_emails": int(values["total_emails"]),
-                "latest_ts": values["latest_ts"],
-            }
-            for address, values in recipients.items()
-        ),
-        key=lambda item: (
-            -item["total_emails"],
-            -(item["latest_ts"] or 0),
-            item["address"],
-        ),
-    )[:limit]
+    recipients_sql = f"""
+        SELECT r.address AS address,
+               COUNT(*) AS total_emails,
+               MAX(e.date_ts) AS latest_ts
+        FROM emails e
+        JOIN email_recipients r ON r.email_id = e.id
+        WHERE e.{where_sql}
+        GROUP BY r.address
+    """
+    cur.execute(f"SELECT COUNT(*) FROM ({recipients_sql})", params)
+    unique_recipients = cur.fetchone()[0]
+
+    keyset_sql, keyset_params = "", ()
+    if recipients_cursor:
+        keyset_sql, keyset_params = _keyset_after(_RECIPIENT_KEYS, _decode(recipients_cursor, len(_RECIPIENT_KEYS)))
+        keyset_sql = f"WHERE {keyset_sql}"
+    cur.execute(
+        f"""
+        SELECT * FROM ({recipients_sql})
+        {keyset_sql}
+        ORDER BY {_order_by(_RECIPIENT_KEYS)}
+        LIMIT ?
+        """,
+        params + keyset_params + (limit + 1,),
+    )
+    recipients = [dict(row) for row in cur.fetchall()]
+    recipients_next_cursor = None
+    if len(recipients) > limit:
+        recipients = recipients[:limit]
+        recipients_next_cursor = _key_cursor(recipients[-1], _RECIPIENT_KEYS)
 
     return {
         "stats": {
-            "unique_recipients": len(recipients),
-            "total_emails": total_emails,
+            "unique_recipients": unique_recipients,
+            "total_emails": total_emails or 0,
             "latest_ts": latest_ts,
         },
-        "recipients": sorted_recipients,
+        "recipients": recipients,
         "emails": emails,
+        "next_cursor": next_cursor,
+        "recipients_next_cursor": recipients_next_cursor,
     }
 
 
 @app.get("/insights/recipients/count-type")
-def api_insights_recipient_count_type(mode: str = Query("single"), limit: int = 50):
+@bounded("/insights/recipients/count-type")
+@cached("/insights/recipients/count-type")
+def api_insights_recipient_count_type(
+    mode: str = Query("single"),
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    recipients_cursor: Optional[str] = None,
+):
     normalized = (mode or "").strip().lower()
     if normalized not in {"single", "multiple"}:
         raise HTTPException(status_code=400, detail="invalid_mode")
 
     if normalized == "single":
-        matcher = lambda count: count == 1
+        bounds = (1, 1)
     else:
-        matcher = lambda count: count >= 2
+        bounds = (2, None)
 
-    return _collect_recipient_insight(limit=max(1, limit), matches_fn=matcher)
+    return _collect_recipient_insight(max(1, limit), *bounds, cursor, recipients_cursor)
 
 
 @app.get("/insights/recipients/distribution")
-def api_insights_recipient_distribution(bucket: str = Query("small"), limit: int = 50):
+@bounded("/insights/recipients/distribution")
+@cached("/insights/recipients/distribution")
+def api_insights_recipient_distribution(
+    bucket: str = Query("small"),
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    recipients_cursor: Optional[str] = None,
+):
     normalized = (bucket or "").strip().lower()
     if normalized == "small":
-        matcher = lambda count: 2 <= count <= 5
+        bounds = (2, 5)
     elif normalized == "medium":
-        matcher = lambda count: 6 <= count <= 20
+        bounds = (6, 20)
     elif normalized == "large":
-        matcher = lambda count: count >= 21
+        bounds = (21, None)
     else:
         raise HTTPException(status_code=400, detail="invalid_bucket")
 
-    return _collect_recipient_insight(limit=max(1, limit), matches_fn=matcher)
+    return _collect_recipient_insight(max(1, limit), *bounds, cursor, recipients_cursor)
 
 
 @app.get("/insights/senders/by-address")
+@bounded("/insights/senders/by-address")
+@cached("/insights/senders/by-address")
 def api_insights_senders_by_address(
     address: Optional[List[str]] = Query(default=None),
     limit: int = 50,
+    cursor: Optional[str] = None,
+    senders_cursor: Optional[str] = None,
 ):
-    from db.connection import connect
-
     addresses = [entry.strip() for entry in (address or []) if entry and entry.strip()]
     if not addresses:
         return {
@@ -398,6 +871,8 @@ def api_insights_senders_by_address(
             },
             "senders": [],
             "emails": [],
+            "next_cursor": None,
+            "senders_next_cursor": None,
         }
 
     patterns = []
@@ -408,179 +883,228 @@ def api_insights_senders_by_address(
                 pattern = f"{pattern}%"
         patterns.append(pattern)
 
-    predicate_parts = ["LOWER(from_email) LIKE ?" for _ in patterns]
-    predicate_sql = " OR ".join(predicate_parts)
-    where_sql = (
-        "WHERE from_email IS NOT NULL "
-        "AND TRIM(from_email) <> '' "
-        f"AND ({predicate_sql})"
-    )
-
-    con = connect()
-    cur = con.cursor()
-
-    pattern_tuple = tuple(patterns)
-
-    cur.execute(
-        f"SELECT COUNT(DISTINCT from_email) FROM emails {where_sql}",
-        pattern_tuple,
-    )
-    unique_senders = cur.fetchone()[0]
-
-    cur.execute(
-        f"SELECT COUNT(*) AS total_emails, MAX(date_ts) AS latest_ts FROM emails {where_sql}",
-        pattern_tuple,
-    )
-    totals_row = cur.fetchone()
-    total_emails = totals_row[0] or 0
-    latest_ts = totals_row[1]
-
-    cur.execute(
-        f"""
-        SELECT id, date_ts, from_email, subject, snippet
-        FROM emails
-        {where_sql}
-        ORDER BY date_ts DESC, id DESC
-        LIMIT ?
-        """,
-        pattern_tuple + (limit,),
-    )
-    emails = [dict(row) for row in cur.fetchall()]
-
-    cur.execute(
-        f"""
-        SELECT from_email,
-               COUNT(*) AS total_emails,
-               MAX(date_ts) AS latest_ts
-        FROM emails
-        {where_sql}
-        GROUP BY from_email
-        ORDER BY latest_ts DESC, from_email ASC
-        LIMIT ?
-        """,
-        pattern_tuple + (limit,),
-    )
-    senders = [dict(row) for row in cur.fetchall()]
+    predicate_sql = " OR ".join("address_norm LIKE ?" for _ in patterns)
 
-    con.close()
-    return {
-        "stats": {
-            "unique_senders": unique_senders,
-            "total_emails": total_emails,
-            "latest_ts": latest_ts,
-        },
-        "senders": senders,
-        "emails": emails,
-    }
+    with read_connection() as con:
+        return _sender_insight(
+            con.cursor(), f"({predicate_sql})", tuple(patterns), max(1, limit), cursor, senders_cursor
+        )
 
 
 @app.get("/insights/senders/dormant")
+@bounded("/insights/senders/dormant")
 def api_insights_senders_dormant(
     limit: int = 50,
     inactive_days: int = DEFAULT_DORMANT_INACTIVE_DAYS,
+    cursor: Optional[str] = None,
+    senders_cursor: Optional[str] = None,
 ):
-    from db.connection import connect
-
     if inactive_days <= 0:
         inactive_days = DEFAULT_DORMANT_INACTIVE_DAYS
 
-    cutoff_seconds = int(time.time()) - inactive_days * SECONDS_IN_DAY
+    now = int(time.time())
+    now -= now % DORMANT_CUTOFF_GRANULARITY_S
+    cutoff_seconds = now - inactive_days * SECONDS_IN_DAY
     cutoff_millis = cutoff_seconds * 1000
+    return _dormant_senders(cutoff_millis, max(1, limit), cursor, senders_cursor)
 
-    con = connect()
-    cur = con.cursor()
-
-    normalized_ts = "CASE WHEN date_ts IS NULL THEN NULL WHEN date_ts > 1000000000000 THEN date_ts ELSE date_ts * 1000 END"
 
-    cur.execute(
-        f"""
-        WITH eligible AS (
-            SELECT from_email,
-                   MAX({normalized_ts}) AS latest_ts
-            FROM emails
-            WHERE from_email IS NOT NULL
-              AND TRIM(from_email) <> ''
-            GROUP BY from_email
-            HAVING latest_ts IS NOT NULL AND latest_ts < ?
+@cached("/insights/senders/dormant")
+def _dormant_senders(cutoff_millis: int, limit: int, cursor: Optional[str], senders_cursor: Optional[str]):
+    # sender_stats.latest_ts is already normalized to milliseconds
+    with read_connection() as con:
+        return _sender_insight(
+            con.cursor(), "latest_ts IS NOT NULL AND latest_ts < ?", (cutoff_millis,), limit, cursor, senders_cursor
         )
-        SELECT COUNT(*) FROM eligible
-        """,
-        (cutoff_millis,),
-    )
-    unique_senders = cur.fetchone()[0]
 
-    cur.execute(
-        f"""
-        WITH eligible AS (
-            SELECT from_email
-            FROM emails
-            WHERE from_email IS NOT NULL
-              AND TRIM(from_email) <> ''
-            GROUP BY from_email
-            HAVING MAX({normalized_ts}) IS NOT NULL AND MAX({normalized_ts}) < ?
-        )
-        SELECT COUNT(*) AS total_emails,
-               MAX({normalized_ts}) AS latest_ts
-        FROM emails
-        WHERE from_email IN (SELECT from_email FROM eligible)
-        """,
-        (cutoff_millis,),
-    )
-    totals_row = cur.fetchone()
-    total_emails = (totals_row[0] or 0) if totals_row else 0
-    latest_ts = totals_row[1] if totals_row else None
 
-    cur.execute(
-        """
-        WITH eligible AS (
-            SELECT from_email
-            FROM emails
-            WHERE from_email IS NOT NULL
-              AND TRIM(from_email) <> ''
-            GROUP BY from_email
-            HAVING MAX(CASE WHEN date_ts IS NULL THEN NULL WHEN date_ts > 1000000000000 THEN date_ts ELSE date_ts * 1000 END) IS NOT NULL
-              AND MAX(CASE WHEN date_ts IS NULL THEN NULL WHEN date_ts > 1000000000000 THEN date_ts ELSE date_ts * 1000 END) < ?
-        )
-        SELECT id, date_ts, from_email, subject, snippet
-        FROM emails
-        WHERE from_email IN (SELECT from_email FROM eligible)
-        ORDER BY date_ts DESC, id DESC
-        LIMIT ?
-        """,
-        (cutoff_millis, limit),
-    )
-    emails = [dict(row) for row in cur.fetchall()]
+_DUPLICATE_KEYS = (("wasted_bytes", True), ("sha256", False))
 
-    cur.execute(
-        f"""
-        WITH eligible AS (
-            SELECT from_email
-            FROM emails
-            WHERE from_email IS NOT NULL
-              AND TRIM(from_email) <> ''
-            GROUP BY from_email
-            HAVING MAX({normalized_ts}) IS NOT NULL AND MAX({normalized_ts}) < ?
+
+def _attachment_stats(cur) -> dict:
+    # two statements so each is answered from a covering index
+    cur.execute("SELECT COUNT(*), SUM(bytes) FROM attachments")
+    total, total_bytes = cur.fetchone()
+    cur.execute("SELECT COUNT(*) FROM (SELECT DISTINCT email_id FROM attachments)")
+    emails = cur.fetchone()[0]
+    return {"total": total, "bytes": total_bytes or 0, "emails": emails}
+
+
+def _bucket_start(day: int, granularity: str) -> date:
+    start = EPOCH + timedelta(days=day)
+    if granularity == "week":
+        return start - timedelta(days=start.weekday())  # weeks start on Monday
+    if granularity == "month":
+        return start.replace(day=1)
+    return start
+
+
+@app.get("/insights/timeline")
+@bounded("/insights/timeline")
+@cached("/insights/timeline")
+def api_insights_timeline(
+    granularity: str = Query("month"),
+    sender: Optional[str] = None,
+    domain: Optional[str] = None,
+    date_from: Optional[int] = None,  # unix ms, inclusive; both rounded out to whole UTC days
+    date_to: Optional[int] = None,    # unix ms, exclusive
+):
+    """Mail volume per day, week or month from daily_volume, optionally for one sender or domain."""
+    normalized = (granularity or "").strip().lower()
+    if normalized not in {"day", "week", "month"}:
+        raise HTTPException(status_code=400, detail="invalid_granularity")
+
+    # sender wins over domain; either way one index is walked in day order
+    sender_key = (sender or "").strip().lower() or None
+    domain_key = None if sender_key else (domain or "").strip().lower().lstrip("@") or None
+    if sender_key:
+        where, params = ["sender = ?"], [sender_key]
+    elif domain_key:
+        where, params = ["sender_domain = ?"], [domain_key]
+    else:
+        where, params = ["1"], []
+    if date_from is not None:
+        where.append("day >= ?")
+        params.append(date_from // DAY_MS)
+    if date_to is not None:
+        where.append("day < ?")
+        params.append(-(-date_to // DAY_MS))
+    with read_connection() as con:
+        rows = con.execute(
+            f"""
+            SELECT day, SUM(count), SUM(bytes)
+            FROM daily_volume
+            WHERE {" AND ".join(where)}
+            GROUP BY day
+            ORDER BY day
+            """,
+            params,
+        ).fetchall()
+
+    buckets: dict[date, list[int]] = {}
+    for day, count, size in rows:
+        entry = buckets.setdefault(_bucket_start(day, normalized), [0, 0])
+        entry[0] += count
+        entry[1] += size
+    series = [
+        {
+            "start": start.isoformat(),
+            "start_ms": (start - EPOCH).days * DAY_MS,
+            "count": count,
+            "bytes": size,
+        }
+        for start, (count, size) in buckets.items()
+    ]
+    return {
+        "granularity": normalized,
+        "sender": sender_key,
+        "domain": domain_key,
+        "totals": {"count": sum(b["count"] for b in series), "bytes": sum(b["bytes"] for b in series)},
+        "buckets": series,  # only periods with mail, oldest first
+    }
+
+
+@app.get("/insights/attachments/largest")
+@bounded("/insights/attachments/largest")
+@cached("/insights/attachments/largest")
+def api_insights_attachments_largest(limit: int = 50, cursor: Optional[str] = None):
+    """Attachments by decoded size, biggest first; walks ix_att_bytes."""
+    limit = max(1, limit)
+    keyset, params = "a.bytes IS NOT NULL", ()
+    if cursor:
+        keyset, params = "(a.bytes, a.id) < (?, ?)", _decode(cursor, 2)
+    with read_connection() as con:
+        cur = con.cursor()
+        cur.execute(
+            f"""
+            SELECT a.id, a.email_id, a.filename, a.mime_major || '/' || a.mime_minor AS mime_type,
+                   a.bytes, a.sha256, e.date_ts, e.from_email, e.subject
+            FROM attachments a
+            JOIN emails e ON e.id = a.email_id
+            WHERE {keyset}
+            ORDER BY a.bytes DESC, a.id DESC
+            LIMIT ?
+            """,
+            params + (limit + 1,),
         )
-        SELECT from_email,
-               COUNT(*) AS total_emails,
-               MAX({normalized_ts}) AS latest_ts
-        FROM emails
-        WHERE from_email IN (SELECT from_email FROM eligible)
-        GROUP BY from_email
-        ORDER BY latest_ts DESC, from_email ASC
-        LIMIT ?
-        """,
-        (cutoff_millis, limit),
-    )
-    senders = [dict(row) for row in cur.fetchall()]
+        attachments = [dict(row) for row in cur.fetchall()]
+        next_cursor = None
+        if len(attachments) > limit:
+            attachments = attachments[:limit]
+            next_cursor = encode_cursor(attachments[-1]["bytes"], attachments[-1]["id"])
+        return {"stats": _attachment_stats(cur), "attachments": attachments, "next_cursor": next_cursor}
+
+
+@app.get("/insights/attachments/types")
+@bounded("/insights/attachments/types")
+@cached("/insights/attachments/types")
+def api_insights_attachments_types(limit: int = 50):
+    """Count and total size per MIME type, from the covering ix_att_mime_bytes."""
+    with read_connection() as con:
+        cur = con.cursor()
+        cur.execute(
+            """
+            SELECT mime_major || '/' || mime_minor AS mime_type, COUNT(*) AS count, SUM(bytes) AS bytes
+            FROM attachments
+            GROUP BY mime_major, mime_minor
+            ORDER BY bytes DESC, count DESC, mime_type
+            LIMIT ?
+            """,
+            (max(1, limit),),
+        )
+        types = [dict(row) for row in cur.fetchall()]
+        return {"stats": _attachment_stats(cur), "types": types}
+
+
+@app.get("/insights/attachments/duplicates")
+@bounded("/insights/attachments/duplicates")
+@cached("/insights/attachments/duplicates")
+def api_insights_attachments_duplicates(limit: int = 50, cursor: Optional[str] = None):
+    """Identical payloads stored more than once, by bytes that the extra copies take up."""
+    limit = max(1, limit)
+    # grouped straight off ix_att_sha, which holds (sha256, bytes)
+    groups_sql = """
+        SELECT sha256, COUNT(*) AS copies, MAX(bytes) AS bytes, (COUNT(*) - 1) * MAX(bytes) AS wasted_bytes
+        FROM attachments
+        WHERE sha256 IS NOT NULL
+        GROUP BY sha256
+        HAVING COUNT(*) > 1
+    """
+    where, params = "", ()
+    if cursor:
+        keyset_sql, params = _keyset_after(_DUPLICATE_KEYS, _decode(cursor, len(_DUPLICATE_KEYS)))
+        where = f"WHERE {keyset_sql}"
+    with read_connection() as con:
+        cur = con.cursor()
+        cur.execute(f"SELECT COUNT(*), SUM(wasted_bytes) FROM ({groups_sql})")
+        groups, wasted = cur.fetchone()
+        cur.execute(
+            f"SELECT * FROM ({groups_sql}) {where} ORDER BY {_order_by(_DUPLICATE_KEYS)} LIMIT ?",
+            params + (limit + 1,),
+        )
+        duplicates = [dict(row) for row in cur.fetchall()]
+        next_cursor = None
+        if len(duplicates) > limit:
+            duplicates = duplicates[:limit]
+            next_cursor = _key_cursor(duplicates[-1], _DUPLICATE_KEYS)
+
+        if duplicates:
+            by_hash = {d["sha256"]: d for d in duplicates}
+            for d in duplicates:
+                d["filenames"], d["email_ids"] = [], []
+            placeholders = ", ".join("?" for _ in by_hash)
+            cur.execute(
+                f"SELECT sha256, filename, email_id FROM attachments WHERE sha256 IN ({placeholders}) ORDER BY id",
+                tuple(by_hash),
+            )
+            for sha, filename, email_id in cur.fetchall():
+                entry = by_hash[sha]
+                if filename not in entry["filenames"]:
+                    entry["filenames"].append(filename)
+                entry["email_ids"].append(email_id)
 
-    con.close()
     return {
-        "stats": {
-            "unique_senders": unique_senders,
-            "total_emails": total_emails,
-            "latest_ts": latest_ts,
-        },
-        "senders": senders,
-        "emails": emails,
+        "stats": {"groups": groups, "wasted_bytes": wasted or 0},
+        "duplicates": duplicates,
+        "next_cursor": next_cursor,
     }
@@ -0,0 +1,21 @@
+# services/worker/tests/conftest.py
+import sys
+from pathlib import Path
+
+import pytest
+
+# the worker's modules import each other from services/worker (db.*, ingest.*, utils.*)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db.connection as dbconn  # noqa: E402
+from db.init_db import init_db  # noqa: E402
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Point the worker at an empty, initialised database for the test."""
+    dbconn.close_all()
+    monkeypatch.setattr(dbconn, "DB_PATH", tmp_path / "maillens.db")
+    init_db()
+    yield dbconn.DB_PATH
+    dbconn.close_all()
@@ -0,0 +1,118 @@
+# services/worker/tests/test_api.py
+import os
+import re
+
+from fastapi.testclient import TestClient
+import pytest
+
+from bench.corpus import CorpusSpec, _emlx, generate
+from db.connection import read_connection, write_connection
+from ingest.emlx import ingest_emlx_folder
+from main import app
+from utils.cache import results
+
+MESSAGES = 240
+
+
+@pytest.fixture
+def corpus(tmp_path) -> str:
+    folder = str(tmp_path / "mail")
+    generate(folder, CorpusSpec(messages=MESSAGES, senders=40, seed=3))
+    return folder
+
+
+@pytest.fixture
+def client(fresh_db, corpus):
+    ingest_emlx_folder(corpus)
+    results.clear()
+    with TestClient(app) as client:
+        yield client
+
+
+def _walk(client, path: str, items: str, cursor_param: str = "cursor", next_key: str = "next_cursor", **params):
+    """Every item of a keyset-paged endpoint, following its cursor to the end."""
+    seen, cursor = [], None
+    while True:
+        query = {**params, **({cursor_param: cursor} if cursor else {})}
+        page = client.get(path, params=query)
+        assert page.status_code == 200, page.text
+        body = page.json()
+        seen += body[items]
+        cursor = body[next_key]
+        if cursor is None:
+            return seen
+
+
+def _volume() -> list[tuple]:
+    with read_connection() as con:
+        return [tuple(row) for row in con.execute("SELECT * FROM daily_volume ORDER BY sender, day")]
+
+
+def test_email_pages_cover_every_email_once_in_order(client):
+    # undated emails sort after every dated one, and the cursor crosses into them
+    with write_connection() as con:
+        con.execute("UPDATE emails SET date_ts = NULL WHERE id % 10 = 0")
+    emails = _walk(client, "/emails", "emails", limit=17)
+
+    assert len(emails) == len({e["id"] for e in emails}) == MESSAGES
+    keys = [(e["date_ts"] is not None, e["date_ts"] or 0, e["id"]) for e in emails]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_thread_and_sender_pages_match_one_big_page(client):
+    threads = _walk(client, "/threads", "threads", limit=13)
+    assert threads == client.get("/threads", params={"limit": MESSAGES}).json()["threads"]
+    assert sum(t["message_count"] for t in threads) == MESSAGES
+
+    senders = _walk(
+        client, "/insights/senders/top", "senders", "senders_cursor", "senders_next_cursor", limit=7
+    )
+    assert senders == client.get("/insights/senders/top", params={"limit": 1000}).json()["senders"]
+    assert sum(s["total_emails"] for s in senders) == MESSAGES
+
+
+def test_bad_cursor_is_a_400(client):
+    response = client.get("/emails", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400 and response.json()["detail"] == "invalid_cursor"
+
+
+def test_search_pages_match_one_ranked_page(client):
+    everything = client.get("/search", params={"q": "meeting", "limit": 200}).json()
+    assert everything["next_cursor"] is None and len(everything["emails"]) > 20
+
+    pages = _walk(client, "/search", "emails", q="meeting", limit=9)
+    assert [e["id"] for e in pages] == [e["id"] for e in everything["emails"]]
+    assert all("<mark>" in (e["subject"] or "") + (e["snippet"] or "") for e in pages)
+
+
+def test_cache_serves_hits_until_a_commit(client, corpus):
+    first = client.get("/stats").json()
+    hits = results.stats()["hits"]
+    assert client.get("/stats").json() == first
+    assert results.stats()["hits"] == hits + 1
+
+    generate(os.path.join(corpus, "more"), CorpusSpec(messages=10, seed=4))
+    ingest_emlx_folder(corpus)
+    assert client.get("/stats").json()["total"] == first["total"] + 10
+    assert results.stats()["invalidations"] >= 1
+
+
+def test_rollups_follow_updates_and_prunes(client, corpus):
+    timeline = client.get("/insights/timeline", params={"granularity": "day"}).json()
+    assert timeline["totals"]["count"] == MESSAGES
+
+    paths = sorted(os.path.join(root, f) for root, _, fs in os.walk(corpus) for f in fs if f.endswith(".emlx"))
+    os.remove(paths[0])
+    with open(paths[1], "rb") as fh:
+        length, _, rest = fh.read().partition(b"\n")
+    raw = re.sub(rb"^From: .*$", b"From: new@example.com", rest[:int(length)], count=1, flags=re.MULTILINE)
+    with open(paths[1], "wb") as fh:
+        fh.write(_emlx(raw))
+    result = ingest_emlx_folder(corpus, prune=True)
+    assert (result["updated"], result["pruned"]) == (1, 1)
+
+    kept = _volume()
+    assert client.post("/db/rebuild/rollups").status_code == 200
+    assert _volume() == kept
+    assert client.get("/insights/timeline", params={"sender": "new@example.com"}).json()["totals"]["count"] == 1
+    assert client.get("/insights/timeline").json()["totals"]["count"] == MESSAGES - 1
@@ -0,0 +1,42 @@
+# services/worker/tests/test_executor.py
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+import pytest
+
+from main import app
+from utils import executor
+from utils.cache import results
+
+
+@pytest.fixture
+def client(fresh_db):
+    results.clear()
+    with TestClient(app) as client:
+        yield client
+
+
+@contextmanager
+def _saturated():
+    """Hold every read slot (workers and queue), as a burst of slow analytics would."""
+    taken = 0
+    while executor._slots.acquire(blocking=False):
+        taken += 1
+    try:
+        yield
+    finally:
+        for _ in range(taken):
+            executor._slots.release()
+
+
+def test_cache_hit_answers_while_the_read_pool_is_full(client):
+    warm = client.get("/stats")
+    assert warm.status_code == 200
+
+    with _saturated():
+        hit = client.get("/stats")
+        miss = client.get("/emails")
+
+    assert hit.status_code == 200 and hit.json() == warm.json()
+    assert miss.status_code == 503 and miss.json()["detail"] == "read_queue_full"
+    assert client.get("/emails").status_code == 200
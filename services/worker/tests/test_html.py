@@ -0,0 +1,27 @@
+# services/worker/tests/test_html.py
+from pathlib import Path
+
+import pytest
+
+from utils.text import HTML_TEXT_CAP, html_to_text
+
+FIXTURES = sorted((Path(__file__).parent / "fixtures" / "html").glob("*.html"))
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=lambda p: p.stem)
+def test_stdlib_extractor_matches_bs4(path):
+    html = path.read_text(encoding="utf-8")
+    expected = _normalize(html_to_text(html, extractor="bs4"))[:HTML_TEXT_CAP]
+    assert expected
+    assert html_to_text(html, extractor="stdlib") == expected
+
+
+def test_long_text_is_capped_like_bs4():
+    html = "<p>" + "Lorem ipsum dolor sit amet. " * 20_000 + "</p>"
+    expected = _normalize(html_to_text(html, extractor="bs4"))[:HTML_TEXT_CAP]
+    assert html_to_text(html, extractor="stdlib") == expected
+    assert len(expected) == HTML_TEXT_CAP
@@ -0,0 +1,144 @@
+# services/worker/tests/test_ingest.py
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import hashlib
+import os
+import quopri
+import random
+
+from bench.corpus import CorpusSpec, _emlx, generate
+from db.connection import read_connection, write_connection
+from ingest.emlx import ingest_emlx_folder
+from ingest.mbox import _checkpoint_key, ingest_mbox
+
+
+def _message(n: int, *, in_reply_to: str = "", references: str = "", body: str = "", parts=()) -> bytes:
+    msg = MIMEMultipart() if parts else MIMEText(body or f"Body of message {n}.")
+    if parts:
+        msg.attach(MIMEText(body or f"Body of message {n}."))
+        for part in parts:
+            msg.attach(part)
+    msg["From"] = f"Sender {n % 3} <sender{n % 3}@example.com>"
+    msg["To"] = "me@example.com"
+    msg["Subject"] = f"Message {n}"
+    msg["Date"] = f"Mon, {n + 1:02d} Mar 2020 10:00:00 +0000"
+    msg["Message-ID"] = f"<{n}@test.invalid>"
+    if in_reply_to:
+        msg["In-Reply-To"] = in_reply_to
+    if references:
+        msg["References"] = references
+    return msg.as_bytes()
+
+
+def _write(folder, name: str, raw: bytes) -> str:
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, name)
+    with open(path, "wb") as fh:
+        fh.write(_emlx(raw))
+    return path
+
+
+def _counts(result: dict) -> tuple[int, int, int]:
+    return result["inserted"], result["updated"], result["unchanged"]
+
+
+def test_manifest_skips_updates_and_prunes(fresh_db, tmp_path):
+    folder = str(tmp_path / "mail")
+    paths = [_write(folder, f"{n}.emlx", _message(n)) for n in range(5)]
+    assert _counts(ingest_emlx_folder(folder)) == (5, 0, 0)
+    assert _counts(ingest_emlx_folder(folder)) == (0, 0, 5)
+
+    # new content is an update; a touched file with the same content only refreshes its entry
+    _write(folder, "0.emlx", _message(0, body="Edited body."))
+    os.utime(paths[1], ns=(0, os.stat(paths[1]).st_mtime_ns + 10**9))
+    os.remove(paths[4])
+    result = ingest_emlx_folder(folder, prune=True)
+    assert _counts(result) == (0, 1, 3)
+    assert (result["missing"], result["pruned"]) == (1, 1)
+
+    with read_connection() as con:
+        uids = [row[0] for row in con.execute("SELECT source_uid FROM emails ORDER BY source_uid")]
+        manifest = [row[0] for row in con.execute("SELECT source_uid FROM ingest_manifest ORDER BY source_uid")]
+        (matches,) = con.execute("SELECT COUNT(*) FROM emails_fts WHERE emails_fts MATCH 'edited'").fetchone()
+    assert uids == manifest == sorted(paths[:4])
+    assert matches == 1
+
+
+def test_rows_stored_before_the_manifest_count_as_unchanged(fresh_db, tmp_path):
+    folder = str(tmp_path / "mail")
+    for n in range(5):
+        _write(folder, f"{n}.emlx", _message(n))
+    ingest_emlx_folder(folder)
+    with write_connection() as con:
+        con.execute("DELETE FROM ingest_manifest")
+
+    assert _counts(ingest_emlx_folder(folder)) == (0, 0, 5)
+    with read_connection() as con:
+        assert con.execute("SELECT COUNT(*) FROM ingest_manifest").fetchone()[0] == 5
+
+
+def test_mbox_resumes_from_each_files_checkpoint(fresh_db, tmp_path):
+    folder = tmp_path / "mbox"
+    generate(str(folder / "a.mbox"), CorpusSpec(messages=30, format="mbox", seed=1))
+    generate(str(folder / "b.mbox"), CorpusSpec(messages=20, format="mbox", seed=2))
+    # one batch spans both files; each still gets its own resume point
+    result = ingest_mbox(str(folder), batch_size=500)
+    assert (result["total"], result["inserted"]) == (50, 50)
+    with read_connection() as con:
+        offsets = dict(con.execute("SELECT key, value FROM meta WHERE key LIKE 'mbox_offset:%'").fetchall())
+    assert offsets == {
+        _checkpoint_key(str(folder / name)): str(os.path.getsize(folder / name)) for name in ("a.mbox", "b.mbox")
+    }
+
+    assert ingest_mbox(str(folder))["total"] == 0
+    generate(str(tmp_path / "more.mbox"), CorpusSpec(messages=5, format="mbox", seed=3))
+    with open(folder / "b.mbox", "ab") as fh:
+        fh.write((tmp_path / "more.mbox").read_bytes())
+    result = ingest_mbox(str(folder))
+    assert (result["total"], result["inserted"]) == (5, 5)
+
+
+def test_attachment_hash_streams_each_transfer_encoding(fresh_db, tmp_path):
+    rng = random.Random(7)
+    binary = rng.randbytes(300_000)  # several hash chunks of base64
+    text = "".join(f"line {i}: café = {'x' * (i % 90)}\n" for i in range(5_000))
+    parts = [
+        MIMEApplication(binary, "octet-stream"),
+        MIMEText(text, "plain", "utf-8"),
+        MIMEApplication(b"short", "octet-stream"),
+    ]
+    parts[1].replace_header("Content-Transfer-Encoding", "quoted-printable")
+    parts[1].set_payload(quopri.encodestring(text.encode()).decode())
+    for i, part in enumerate(parts):
+        part.add_header("Content-Disposition", "attachment", filename=f"file{i}")
+    folder = str(tmp_path / "mail")
+    _write(folder, "0.emlx", _message(0, parts=parts))
+    ingest_emlx_folder(folder)
+
+    with read_connection() as con:
+        stored = con.execute("SELECT filename, bytes, sha256 FROM attachments ORDER BY filename").fetchall()
+    expected = [binary, text.encode(), b"short"]
+    assert [tuple(row) for row in stored] == [
+        (f"file{i}", len(data), hashlib.sha256(data).hexdigest()) for i, data in enumerate(expected)
+    ]
+
+
+def test_replies_before_their_parent_join_one_thread(fresh_db, tmp_path):
+    folder = str(tmp_path / "mail")
+    # the reply to a reply arrives first, then its parent, then the root
+    _write(folder, "2.emlx", _message(2, in_reply_to="<1@test.invalid>", references="<0@test.invalid> <1@test.invalid>"))
+    ingest_emlx_folder(folder)
+    _write(folder, "1.emlx", _message(1, in_reply_to="<0@test.invalid>"))
+    ingest_emlx_folder(folder)
+    _write(folder, "0.emlx", _message(0))
+    _write(folder, "9.emlx", _message(9))
+    ingest_emlx_folder(folder)
+
+    with read_connection() as con:
+        threads = con.execute("SELECT thread_id, message_count, subject FROM threads ORDER BY message_count").fetchall()
+        members = con.execute(
+            "SELECT subject FROM emails WHERE thread_id = ? ORDER BY date_ms", (threads[-1]["thread_id"],)
+        ).fetchall()
+    assert [(row["message_count"], row["subject"]) for row in threads] == [(1, "Message 9"), (3, "Message 0")]
+    assert [row[0] for row in members] == ["Message 0", "Message 1", "Message 2"]
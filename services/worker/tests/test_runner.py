@@ -0,0 +1,54 @@
+# services/worker/tests/test_runner.py
+import time
+
+from bench.corpus import CorpusSpec, generate
+from db.connection import read_connection
+from db.jobs import ACTIVE_STATES, get_job, list_jobs
+from ingest import runner
+
+JOB_TIMEOUT_S = 60
+
+
+def _wait_idle():
+    deadline = time.monotonic() + JOB_TIMEOUT_S
+    while runner.is_running() or list_jobs(states=ACTIVE_STATES, limit=1):
+        assert time.monotonic() < deadline, f"jobs still running: {runner.running_jobs()}"
+        time.sleep(0.05)
+
+
+def test_concurrent_jobs_with_a_parse_pool(fresh_db, tmp_path):
+    emlx_dir = str(tmp_path / "emlx")
+    mbox_path = str(tmp_path / "corpus.mbox")
+    generate(emlx_dir, CorpusSpec(messages=300, seed=1))
+    generate(mbox_path, CorpusSpec(messages=300, format="mbox", seed=2))
+    assert runner.MAX_RUNNING_JOBS >= 2  # the default runs different sources side by side
+
+    # the emlx job parses in a process pool while the mbox job runs on another thread
+    emlx_job, _ = runner.submit_emlx(emlx_dir, workers=2, batch_size=50)
+    mbox_job, _ = runner.submit_mbox(mbox_path, batch_size=50)
+    assert sorted(runner.running_jobs()) == [emlx_job.job_id, mbox_job.job_id]
+    _wait_idle()
+
+    emlx_job, mbox_job = get_job(emlx_job.job_id), get_job(mbox_job.job_id)
+    assert (emlx_job.state, emlx_job.done) == ("done", 300), emlx_job.error
+    assert (mbox_job.state, mbox_job.done) == ("done", 300), mbox_job.error
+    # the two really overlapped
+    assert emlx_job.started_ts <= mbox_job.finished_ts and mbox_job.started_ts <= emlx_job.finished_ts
+    with read_connection() as con:
+        counts = dict(con.execute("SELECT source, COUNT(*) FROM emails GROUP BY source").fetchall())
+    assert counts == {"emlx": 300, "mbox": 300}
+
+
+def test_a_single_slot_queues_the_second_job(fresh_db, tmp_path, monkeypatch):
+    emlx_dir = str(tmp_path / "emlx")
+    mbox_path = str(tmp_path / "corpus.mbox")
+    generate(emlx_dir, CorpusSpec(messages=50, seed=1))
+    generate(mbox_path, CorpusSpec(messages=50, format="mbox", seed=2))
+    monkeypatch.setattr(runner, "MAX_RUNNING_JOBS", 1)
+
+    first, _ = runner.submit_emlx(emlx_dir, workers=2)
+    second, _ = runner.submit_mbox(mbox_path)
+    assert runner.running_jobs() == [first.job_id]
+    assert get_job(second.job_id).state == "queued"
+    _wait_idle()
+    assert [get_job(job.job_id).state for job in (first, second)] == ["done", "done"]
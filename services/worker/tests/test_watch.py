@@ -0,0 +1,91 @@
+# services/worker/tests/test_watch.py
+import os
+import time
+
+from bench.corpus import CorpusSpec, _emlx, generate
+from db.connection import read_connection
+from db.jobs import get_job
+from ingest import runner
+from ingest.emlx import ingest_emlx_folder
+from ingest.runner import submit_emlx
+from ingest.watch import Changes, add_watch, remove_watch, sync_changes
+
+SYNC_TIMEOUT_S = 20
+
+
+def _emlx_files(folder: str) -> list[str]:
+    return sorted(os.path.join(root, f) for root, _, fs in os.walk(folder) for f in fs if f.endswith(".emlx"))
+
+
+def _email_count() -> int:
+    with read_connection() as con:
+        return con.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+
+
+def _rewrite(path: str, subject: bytes):
+    with open(path, "rb") as fh:
+        length, _, rest = fh.read().partition(b"\n")
+    raw = rest[:int(length)].replace(b"\nSubject: ", b"\nSubject: " + subject + b" ", 1)
+    with open(path, "wb") as fh:
+        fh.write(_emlx(raw))
+
+
+def test_sync_changes_writes_new_changed_and_gone_files(fresh_db, tmp_path):
+    root = str(tmp_path / "mail")
+    generate(root, CorpusSpec(messages=20, seed=1))
+    ingest_emlx_folder(root)
+    old = _emlx_files(root)
+
+    generate(str(tmp_path / "more"), CorpusSpec(messages=1, seed=9))
+    new = os.path.join(os.path.dirname(old[0]), "new.emlx")
+    os.rename(_emlx_files(str(tmp_path / "more"))[0], new)
+    _rewrite(old[0], b"Edited")
+    os.remove(old[1])
+
+    result = sync_changes(root, Changes(files=frozenset({new, old[0], old[1], old[2]})))
+    assert (result["inserted"], result["updated"], result["unchanged"], result["pruned"]) == (1, 1, 1, 1)
+    assert _email_count() == 20
+
+    # a directory-level change relists the folder; nothing left to do
+    result = sync_changes(root, Changes(dirs=frozenset({os.path.dirname(new)})))
+    assert (result["inserted"], result["updated"], result["pruned"]) == (0, 0, 0)
+    assert result["unchanged"] == 20
+
+
+def test_a_watch_writes_new_mail(fresh_db, tmp_path):
+    root = str(tmp_path / "mail")
+    generate(root, CorpusSpec(messages=10, seed=1))
+    _, catch_up = add_watch(root)
+    try:
+        deadline = time.monotonic() + SYNC_TIMEOUT_S
+        while get_job(catch_up).state != "done":
+            assert time.monotonic() < deadline, get_job(catch_up)
+            time.sleep(0.05)
+        assert _email_count() == 10
+
+        generate(str(tmp_path / "more"), CorpusSpec(messages=3, seed=9))
+        folder = os.path.dirname(_emlx_files(root)[0])
+        for i, path in enumerate(_emlx_files(str(tmp_path / "more"))):
+            os.rename(path, os.path.join(folder, f"new{i}.emlx"))
+        while _email_count() != 13:
+            assert time.monotonic() < deadline, "watch did not pick up the new files"
+            time.sleep(0.05)
+    finally:
+        remove_watch(root)
+
+
+def test_removing_a_watch_cancels_only_its_own_catch_up(fresh_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(runner, "MAX_RUNNING_JOBS", 0)  # keep every job queued
+    watched, ingested = str(tmp_path / "watched"), str(tmp_path / "ingested")
+    os.makedirs(watched)
+    os.makedirs(ingested)
+
+    # a folder already being ingested: the watch reuses that job rather than owning it
+    started, _ = submit_emlx(ingested)
+    _, reused = add_watch(ingested)
+    _, catch_up = add_watch(watched)
+    assert reused == started.job_id
+
+    assert remove_watch(watched) and remove_watch(ingested)
+    assert get_job(catch_up).state == "cancelled"
+    assert get_job(started.job_id).state == "queued"
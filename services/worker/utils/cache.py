@@ -0,0 +1,141 @@
+# services/worker/utils/cache.py
+from collections import OrderedDict
+import functools
+import json
+from threading import Lock
+from typing import Callable
+
+from db.connection import data_version
+from .executor import query_cancelled
+
+MAX_ENTRIES = 512
+MAX_BYTES = 32 * 1024 * 1024  # estimated from the JSON size of cached results
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class ResultCache:
+    """
+    LRU cache of endpoint results, valid for one database generation.
+
+    Every lookup compares the stored generation with PRAGMA data_version, so
+    any commit (an ingest batch, a rebuild, another process) drops the whole
+    cache on the next request instead of serving stale numbers.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._generation: int | None = None
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _sync_generation(self, generation: int):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+
+    def _lookup(self, key, count_miss: bool) -> tuple[int, bool, object]:
+        generation = data_version()
+        with self._lock:
+            self._sync_generation(generation)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return generation, True, entry[0]
+            if count_miss:
+                self.misses += 1
+        return generation, False, None
+
+    def peek(self, key) -> tuple[bool, object]:
+        """(True, value) for a current entry, else (False, None); the miss is counted by get_or_compute."""
+        _, hit, value = self._lookup(key, count_miss=False)
+        return hit, value
+
+    def get_or_compute(self, key, compute: Callable):
+        generation, hit, value = self._lookup(key, count_miss=True)
+        if hit:
+            return value
+
+        value = compute()
+        if query_cancelled():
+            return value  # cut short by its deadline, may be partial
+        try:
+            size = len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return value  # not JSON-shaped, don't cache
+        if size > self.max_bytes:
+            return value
+
+        with self._lock:
+            # a commit may have landed while computing; don't file the result under the new generation
+            if generation != self._generation:
+                return value
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "generation": self._generation,
+            }
+
+
+results = ResultCache()
+
+
+def cached(endpoint: str):
+    """
+    Cache a handler's return value per (endpoint, arguments) in `results`.
+    wrapper.cached_result(*args, **kwargs) looks a call up without computing
+    it; @bounded uses it to answer hits on the event loop.
+    """
+    def decorator(fn):
+        def _key(args, kwargs):
+            return (endpoint, _freeze(args), _freeze(kwargs))
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return results.get_or_compute(_key(args, kwargs), lambda: fn(*args, **kwargs))
+
+        wrapper.cached_result = lambda *args, **kwargs: results.peek(_key(args, kwargs))
+        return wrapper
+    return decorator
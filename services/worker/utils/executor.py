@@ -0,0 +1,137 @@
+# services/worker/utils/executor.py
+"""
+Bounded, cancellable execution for read endpoints.
+
+Heavy handlers (insights, search, listings) run on a dedicated pool of
+READ_WORKERS threads instead of Starlette's shared threadpool, so a slow
+scan never holds up cheap routes like /progress. At most READ_QUEUE calls
+wait for a thread; beyond that requests are rejected with 503.
+
+Each call carries a deadline. SQLite's progress handler on the thread's read
+connection checks it every PROGRESS_OPS virtual machine steps and aborts the
+statement once it has passed, or once the client has gone away.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import inspect
+import os
+import threading
+import time
+
+from fastapi import HTTPException, Request
+
+from db.connection import read_connection
+from . import metrics
+
+READ_WORKERS = int(os.environ.get("MAILLENS_READ_WORKERS", 4))
+READ_QUEUE = int(os.environ.get("MAILLENS_READ_QUEUE", 32))  # calls waiting for a thread before 503s
+DEFAULT_DEADLINE_S = float(os.environ.get("MAILLENS_QUERY_DEADLINE_S", 15))
+PROGRESS_OPS = 20_000  # SQLite VM steps between deadline checks, well under a millisecond
+DISCONNECT_POLL_S = 0.1
+
+_executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="read")
+_slots = threading.BoundedSemaphore(READ_WORKERS + READ_QUEUE)
+_local = threading.local()
+_state_lock = threading.Lock()
+_state = {"running": 0, "queued": 0}
+
+
+class _Deadline:
+    __slots__ = ("expires", "reason")
+
+    def __init__(self, seconds: float):
+        self.expires = time.monotonic() + seconds
+        self.reason = ""  # set once: "timeout" or "disconnected"
+
+    def expired(self) -> bool:
+        if not self.reason and time.monotonic() > self.expires:
+            self.reason = "timeout"
+        return bool(self.reason)
+
+
+def _check() -> int:
+    # SQLite progress handler: non-zero aborts the running statement with "interrupted"
+    deadline = getattr(_local, "deadline", None)
+    return 1 if deadline is not None and deadline.expired() else 0
+
+
+def query_cancelled() -> bool:
+    """True inside a bounded call whose deadline passed (or client left); its results are partial."""
+    deadline = getattr(_local, "deadline", None)
+    return deadline is not None and bool(deadline.reason)
+
+
+def _run(deadline: _Deadline, fn, args, kwargs):
+    with _state_lock:
+        _state["queued"] -= 1
+        _state["running"] += 1
+    _local.deadline = deadline
+    try:
+        if deadline.expired():
+            return None  # waited out its deadline in the queue
+        with read_connection() as con:
+            con.set_progress_handler(_check, PROGRESS_OPS)
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            if deadline.reason:
+                return None  # "interrupted", possibly wrapped by the handler; reported as the reason
+            raise
+        finally:
+            with read_connection() as con:
+                con.set_progress_handler(None, 0)
+    finally:
+        _local.deadline = None
+        with _state_lock:
+            _state["running"] -= 1
+
+
+def bounded(route: str, deadline_s: float = DEFAULT_DEADLINE_S):
+    """
+    Run a sync handler on the read pool under a deadline; 503 when the queue
+    is full, 504 when the deadline passes. Goes between @app.get and @cached:
+    a cache hit is answered on the event loop and never takes a slot.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        request_param = inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+        cached_result = getattr(fn, "cached_result", None)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, request: Request, **kwargs):
+            if cached_result is not None:
+                hit, value = cached_result(*args, **kwargs)
+                if hit:
+                    return value
+            if not _slots.acquire(blocking=False):
+                metrics.inc(metrics.QUERIES_STOPPED, route=route, reason="rejected")
+                raise HTTPException(status_code=503, detail="read_queue_full", headers={"Retry-After": "1"})
+            with _state_lock:
+                _state["queued"] += 1
+            deadline = _Deadline(deadline_s)
+            future = _executor.submit(_run, deadline, fn, args, kwargs)
+            # the slot is held until the thread is done, even if we stop waiting
+            future.add_done_callback(lambda _: _slots.release())
+            waiter = asyncio.wrap_future(future)
+            while not waiter.done():
+                await asyncio.wait({waiter}, timeout=DISCONNECT_POLL_S)
+                if not waiter.done() and not deadline.reason and await request.is_disconnected():
+                    deadline.reason = "disconnected"
+            result = waiter.result()
+            if deadline.reason:
+                metrics.inc(metrics.QUERIES_STOPPED, route=route, reason=deadline.reason)
+                if deadline.reason == "timeout":
+                    raise HTTPException(status_code=504, detail="query_timeout")
+                raise HTTPException(status_code=499, detail="client_disconnected")
+            return result
+
+        # FastAPI reads parameters from the signature; add the request it should pass in
+        wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), request_param])
+        return wrapper
+    return decorator
+
+
+def stats() -> dict:
+    with _state_lock:
+        return {"workers": READ_WORKERS, "queue": READ_QUEUE, **_state}
@@ -0,0 +1,158 @@
+# services/worker/utils/metrics.py
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+from time import perf_counter
+
+# seconds; spans a fast header decode up to a slow SQLite batch
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = "maillens_ingest_stage_seconds"
+MESSAGES_TOTAL = "maillens_ingest_messages_total"
+HTTP_SECONDS = "maillens_http_request_duration_seconds"
+QUERIES_STOPPED = "maillens_read_queries_stopped_total"
+
+_HELP = {
+    STAGE_SECONDS: "Time per message (per batch for sqlite_flush) spent in each ingest stage.",
+    MESSAGES_TOTAL: "Messages handled by ingest, by outcome.",
+    HTTP_SECONDS: "Request latency by route.",
+    QUERIES_STOPPED: "Read calls not answered, by route and reason (rejected, timeout, disconnected).",
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_histograms: dict[str, dict[tuple, Histogram]] = {}
+_counters: dict[str, dict[tuple, float]] = {}
+_gauges: dict[str, dict[tuple, float]] = {}
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def observe(name: str, seconds: float, **labels):
+    key = _labels(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = Histogram()
+        hist.observe(seconds)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    key = _labels(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+
+
+def set_gauge(name: str, value: float, **labels):
+    with _lock:
+        _gauges.setdefault(name, {})[_labels(labels)] = value
+
+
+# Per-message stage timings. Parsing may run in a pool process, so stages are
+# collected locally and shipped back with the row (see ingest/pipeline.py).
+_local = threading.local()
+
+
+@contextmanager
+def stage(name: str):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        times = getattr(_local, "times", None)
+        if times is None:
+            times = _local.times = {}
+        times[name] = times.get(name, 0.0) + (perf_counter() - start)
+
+
+def take_stage_times() -> dict[str, float]:
+    times = getattr(_local, "times", None) or {}
+    _local.times = {}
+    return times
+
+
+class StageTimings:
+    """Totals for one ingest run, mirrored into the process-wide histograms."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self._lock = threading.Lock()
+        self._totals: dict[str, list] = {}  # stage -> [count, total_s, max_s]
+        self.started = perf_counter()
+
+    def record(self, times: dict[str, float]):
+        for name, seconds in times.items():
+            observe(STAGE_SECONDS, seconds, source=self.source, stage=name)
+        with self._lock:
+            for name, seconds in times.items():
+                total = self._totals.get(name)
+                if total is None:
+                    self._totals[name] = [1, seconds, seconds]
+                else:
+                    total[0] += 1
+                    total[1] += seconds
+                    total[2] = max(total[2], seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            stages = {
+                name: {
+                    "count": count,
+                    "total_s": round(total, 3),
+                    "avg_ms": round(total / count * 1000, 3),
+                    "max_ms": round(peak * 1000, 3),
+                }
+                for name, (count, total, peak) in sorted(self._totals.items(), key=lambda kv: -kv[1][1])
+            }
+        return {"elapsed_s": round(perf_counter() - self.started, 3), "stages": stages}
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: list[str] = []
+    with _lock:
+        for kind, family in (("counter", _counters), ("gauge", _gauges)):
+            for name, series in sorted(family.items()):
+                if name in _HELP:
+                    lines.append(f"# HELP {name} {_HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(_histograms.items()):
+            if name in _HELP:
+                lines.append(f"# HELP {name} {_HELP[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {hist.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+    return "\n".join(lines) + "\n"
@@ -1,40 +1,205 @@
 # services/worker/utils/progress.py
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+import threading
 from threading import Lock
+import time
+from typing import Callable
 
-_progress = {
+_IDLE = {
     "kind": "idle",     # emlx | mbox | imap | ...
-    "total": 0,
+    "total": 0,         # best known total; grows with discovered until discovery completes
+    "discovered": 0,
+    "discovery_complete": True,
     "done": 0,
     "status": "idle",   # idle | running | done | cancelled | error
     "note": "",
     "error": ""
 }
 _lock = Lock()
+_version = 0  # bumped on every change, lets watchers skip identical snapshots
+_watchers: set[Callable[[], None]] = set()
 
-def reset(kind: str, total: int):
-    with _lock:
-        _progress.update(kind=kind, total=total, done=0, status="running", note="", error="")
+RATE_SAMPLE_EVERY_S = 0.5
+
+
+def _changed():
+    # caller holds _lock; watchers must not block
+    global _version
+    _version += 1
+    for notify in _watchers:
+        notify()
+
+
+class Progress:
+    """
+    Progress of one ingest job. Jobs run on their own threads and bind their
+    tracker there (see bind()), so the module-level reset/step/... calls made
+    deep inside the ingest code land on the right job.
+    """
+
+    def __init__(self):
+        self._progress = dict(_IDLE)
+        self._samples: deque[tuple[float, int]] = deque(maxlen=20)  # (monotonic, done), ~10s throughput window
+
+    def reset(self, kind: str, total: int | None = None):
+        # total=None means the work list is still being discovered
+        known = total is not None
+        with _lock:
+            self._progress.update(
+                kind=kind,
+                total=total or 0,
+                discovered=total or 0,
+                discovery_complete=known,
+                done=0,
+                status="running",
+                note="",
+                error="",
+            )
+            self._samples.clear()
+            self._samples.append((time.monotonic(), 0))
+            _changed()
+
+    def discovered(self, count: int = 1):
+        with _lock:
+            self._progress["discovered"] += count
+            self._progress["total"] = self._progress["discovered"]
+            _changed()
+
+    def discovery_complete(self):
+        with _lock:
+            self._progress["discovery_complete"] = True
+            self._progress["total"] = self._progress["discovered"]
+            _changed()
+
+    def step(self, note: str = ""):
+        with _lock:
+            self._progress["done"] += 1
+            if note:
+                self._progress["note"] = note
+            now = time.monotonic()
+            if not self._samples or now - self._samples[-1][0] >= RATE_SAMPLE_EVERY_S:
+                self._samples.append((now, self._progress["done"]))
+            _changed()
+
+    def finish(self):
+        with _lock:
+            self._progress["status"] = "done"
+            self._progress["discovery_complete"] = True
+            _changed()
+
+    def cancel(self):
+        with _lock:
+            self._progress["status"] = "cancelled"
+            self._progress["note"] = ""
+            _changed()
+
+    def fail(self, msg: str):
+        with _lock:
+            self._progress["status"] = "error"
+            self._progress["error"] = msg
+            _changed()
+
+    def get(self) -> dict:
+        with _lock:
+            snapshot = dict(self._progress)
+            rate = 0.0
+            if snapshot["status"] == "running" and self._samples:
+                since, done_then = self._samples[0]
+                elapsed = time.monotonic() - since
+                if elapsed > 0:
+                    rate = (snapshot["done"] - done_then) / elapsed
+        eta = None
+        if rate > 0 and snapshot["discovery_complete"]:
+            eta = max(0.0, (snapshot["total"] - snapshot["done"]) / rate)
+        snapshot["rate"] = round(rate, 1)  # messages per second over the last ~10s
+        snapshot["eta_seconds"] = None if eta is None else round(eta, 1)
+        return snapshot
+
+
+_default = Progress()  # for ingest code run outside a job (CLI, benchmarks)
+_bound = threading.local()
+
+
+def current() -> Progress:
+    return getattr(_bound, "progress", None) or _default
+
+
+@contextmanager
+def bind(progress: Progress):
+    """Route this thread's reset/step/... calls to `progress` for the block."""
+    previous = getattr(_bound, "progress", None)
+    _bound.progress = progress
+    try:
+        yield progress
+    finally:
+        _bound.progress = previous
+
+
+def reset(kind: str, total: int | None = None):
+    current().reset(kind, total)
+
+def discovered(count: int = 1):
+    current().discovered(count)
+
+def discovery_complete():
+    current().discovery_complete()
 
 def step(note: str = ""):
-    with _lock:
-        _progress["done"] += 1
-        if note:
-            _progress["note"] = note
+    current().step(note)
 
 def finish():
-    with _lock:
-        _progress["status"] = "done"
+    current().finish()
 
 def cancel():
-    with _lock:
-        _progress["status"] = "cancelled"
-        _progress["note"] = ""
+    current().cancel()
 
 def fail(msg: str):
-    with _lock:
-        _progress["status"] = "error"
-        _progress["error"] = msg
+    current().fail(msg)
 
 def get():
-    with _lock:
-        return dict(_progress)
+    return current().get()
+
+def version() -> int:
+    return _version
+
+
+class Watcher:
+    """
+    Wakes an asyncio consumer when progress changes. However many steps land
+    in between, each wait() costs the ingest thread at most one loop wakeup.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._event = asyncio.Event()
+        self._armed = True
+
+    def _notify(self):
+        if self._armed:
+            self._armed = False
+            try:
+                self._loop.call_soon_threadsafe(self._event.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+    def __enter__(self):
+        with _lock:
+            _watchers.add(self._notify)
+        return self
+
+    def __exit__(self, *exc):
+        with _lock:
+            _watchers.discard(self._notify)
+
+    async def wait(self, timeout: float) -> bool:
+        """True if progress changed, False on timeout."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            changed = True
+        except asyncio.TimeoutError:
+            changed = False
+        self._event.clear()
+        self._armed = True
+        return changed
@@ -1,8 +1,83 @@
 import hashlib
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+import os
+
+# "stdlib" streams through html.parser; "bs4" builds a BeautifulSoup tree (slow, kept as a fallback)
+HTML_EXTRACTOR = os.environ.get("MAILLENS_HTML_EXTRACTOR", "stdlib")
+HTML_INPUT_CAP = 2_000_000  # characters of HTML looked at per part
+HTML_TEXT_CAP = 100_000     # stop once this much text is out; plenty for snippet and FTS
+_FEED_CHUNK = 64 * 1024
+
+# same set BeautifulSoup's get_text() leaves out
+_SKIP_TAGS = frozenset({"script", "style", "template"})
+
+
+class _Enough(Exception):
+    pass
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self, cap: int):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self._size = 0
+        self._cap = cap
+        self._skip_depth = 0
+        self._separate = False
+
+    # text on either side of markup is separated, like get_text(" "); text
+    # split only by a feed() chunk boundary is not
+    def handle_starttag(self, tag, attrs):
+        self._separate = True
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        self._separate = True
+        if tag in _SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_comment(self, data):
+        self._separate = True
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._separate:
+            self.parts.append(" ")
+            self._separate = False
+        self.parts.append(data)
+        self._size += len(data)
+        if self._size >= self._cap:
+            raise _Enough
+
+
+def _html_to_text_stdlib(html: str) -> str:
+    html = html[:HTML_INPUT_CAP]
+    parser = _TextExtractor(HTML_TEXT_CAP)
+    try:
+        for start in range(0, len(html), _FEED_CHUNK):
+            parser.feed(html[start:start + _FEED_CHUNK])
+        parser.close()
+    except _Enough:
+        pass
+    return " ".join("".join(parser.parts).split())[:HTML_TEXT_CAP]
+
+
+def _html_to_text_bs4(html: str) -> str:
+    from bs4 import BeautifulSoup
 
-def html_to_text(html: str) -> str:
     return BeautifulSoup(html or "", "html.parser").get_text(" ").strip()
 
+
+def html_to_text(html: str, extractor: str | None = None) -> str:
+    if (extractor or HTML_EXTRACTOR) == "bs4":
+        return _html_to_text_bs4(html)
+    try:
+        return _html_to_text_stdlib(html or "")
+    except Exception:
+        # html.parser is lenient, but never lose a body over it
+        return _html_to_text_bs4(html)
+
 def sha256_text(s: str) -> str:
-    return hashlib.sha256((s or "").encode("utf-8", "ignore")).hexdigest()
\ No newline at end of file
+    return hashlib.sha256((s or "").encode("utf-8", "ignore")).hexdigest()